@@ -1,11 +0,0 @@
-async def setup(self):
-    # Existing setup code...
-    
-    # Add feed URLs initialization
-    self.feed_urls = [
-        # Add your RSS feed URLs here
-        "https://example.com/feed.xml",
-        # ...
-    ]
-    
-    # Rest of setup code... 
\ No newline at end of file
@@ -0,0 +1,96 @@
+import hashlib
+import html
+import json
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from metrics import counter, gauge
+from prompts import PROMPT_VERSION
+
+ANALYSIS_CACHE_KEY = "analysis:cache:{}"
+
+# Fields that describe the article an analysis was made for rather than the analysis itself
+ARTICLE_FIELDS = ("article_id", "timestamp")
+
+CACHE_LOOKUPS = counter("analysis_cache_lookups_total", "Analysis cache lookups by result", ["result"])
+CACHE_HIT_RATIO = gauge("analysis_cache_hit_ratio", "Share of analysis cache lookups that were hits")
+
+_TAGS = re.compile(r"<[^>]+>")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Article text reduced to what the model sees: no markup, case or spacing differences"""
+    text = html.unescape(_TAGS.sub(" ", text or ""))
+    return _SPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def content_key(article: Dict[str, Any], model_id: str, prompt_version: str = PROMPT_VERSION) -> str:
+    """Cache key for an article's analysis: a hash of its normalized text, the model and the prompt
+
+    Articles with the same title and content share a key whatever their id,
+    source or link; a different model or prompt version gives a new key.
+    """
+    material = "\x1f".join((
+        model_id,
+        prompt_version,
+        normalize_text(article.get("title", "")),
+        normalize_text(article.get("content", ""))
+    ))
+    return ANALYSIS_CACHE_KEY.format(hashlib.sha256(material.encode("utf-8")).hexdigest())
+
+
+def _hit_ratio() -> float:
+    hits, misses = CACHE_LOOKUPS.value(result="hit"), CACHE_LOOKUPS.value(result="miss")
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+CACHE_HIT_RATIO.set_function(_hit_ratio)
+
+
+class AnalysisCache:
+    """Analyses in Redis keyed by content, so repeated articles skip the model
+
+    Entries expire `ttl` seconds after they were last used (every hit
+    renews the TTL), independently of the article TTL, so content that keeps
+    coming back stays cached and one-off content ages out. Entries of a
+    previous model or prompt version are never looked up again and expire
+    the same way. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, redis, model_id: str, ttl: int):
+        self.redis = redis
+        self.model_id = model_id
+        self.ttl = ttl
+
+    def key(self, article: Dict[str, Any]) -> str:
+        return content_key(article, self.model_id)
+
+    async def get(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The cached analysis for this article's content, re-addressed to the article, or None"""
+        try:
+            raw = await self.redis.getex(self.key(article), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Analysis cache lookup failed: {str(e)}")
+            raw = None
+        if raw is None:
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+        CACHE_LOOKUPS.inc(result="hit")
+        return self.readdress(json.loads(raw), article)
+
+    @staticmethod
+    def readdress(analysis: Dict[str, Any], article: Dict[str, Any]) -> Dict[str, Any]:
+        """A copy of another article's analysis, addressed to this article"""
+        return {**analysis, "article_id": article["id"], "timestamp": article.get("timestamp"), "cached": True}
+
+    async def set(self, article: Dict[str, Any], analysis: Dict[str, Any]) -> None:
+        entry = {field: value for field, value in analysis.items() if field not in ARTICLE_FIELDS}
+        try:
+            await self.redis.set(self.key(article), json.dumps(entry), ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Analysis cache write failed: {str(e)}")
@@ -0,0 +1,118 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+def create_prompt(article_data: Dict[str, Any]) -> str:
+    """Create prompt using model's format"""
+    return f"""<|system|>Use only the information to answer the question</s>
+<|user|>Analyze this financial article:
+
+Title: {article_data['title']}
+Content: {article_data['content']}
+
+Provide:
+1. Summary (2-3 sentences)
+2. Market Impact
+3. Trading Ideas
+4. Key Assets
+5. Risk Level</s>
+<|assistant|>"""
+
+
+class AnalyzerModel:
+    """A causal LM loaded once and reused for every analysis
+
+    This is the model lifecycle behind the Modal ModelService, kept free of
+    Modal so the same code runs anywhere, e.g. with a tiny CPU model in tests.
+    `torch_dtype` is the name of a torch dtype ("float16" on GPU).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_length: int = 512,
+        max_new_tokens: int = 512,
+        device_map: Optional[str] = "auto",
+        torch_dtype: str = "float16"
+    ):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.max_new_tokens = max_new_tokens
+        self.device_map = device_map
+        self.torch_dtype = torch_dtype
+        self.tokenizer = None
+        self.model = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> None:
+        """Load tokenizer and weights; later calls are no-ops"""
+        if self.is_loaded:
+            return
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+
+        start_time = time.time()
+        logger.info(f"Loading tokenizer for {self.model_name}...")
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+        # Batched generation pads on the left so every prompt ends where generation starts
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        logger.info(f"Loading model {self.model_name}...")
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_name,
+            device_map=self.device_map,
+            torch_dtype=getattr(torch, self.torch_dtype),
+            low_cpu_mem_usage=True
+        )
+        model.eval()
+        self.tokenizer, self.model = tokenizer, model
+        logger.info(f"Model loaded in {time.time() - start_time:.1f}s")
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Generate analyses for a batch of prompts in one model.generate call"""
+        import torch
+
+        self.load()
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=self.max_length)
+        inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                temperature=0.7,
+                top_p=0.9,
+                top_k=50,
+                num_beams=1,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+
+        # Only the generated tokens: the prompts are echoed at the start of every output
+        prompt_length = inputs["input_ids"].shape[1]
+        return self.tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
+
+    def analyze_article(self, article_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.analyze_batch([article_data])[0]
+
+    def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        start_time = time.time()
+        analyses = self.generate([create_prompt(article) for article in articles])
+        elapsed_time = time.time() - start_time
+        return [
+            {
+                "article_id": article["id"],
+                "timestamp": article["timestamp"],
+                "analysis": analysis,
+                "model": self.model_name,
+                "version": "1.0",
+                "processing_time": elapsed_time
+            }
+            for article, analysis in zip(articles, analyses)
+        ]
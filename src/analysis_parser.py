@@ -0,0 +1,127 @@
+"""Structured analyses: the model's text split into the sections the prompt asks for
+
+Backends return the generated text, which for some models starts with an
+echo of the prompt. `structure_analysis` drops the echo and replaces the
+text with one field per section, the risk level as a RiskLevel name:
+
+    {"summary": ..., "market_impact": ..., "trading_ideas": ...,
+     "assets": ["BTC", "S&P 500"], "risk": "medium", "risk_reason": ...}
+"""
+import re
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+
+class RiskLevel(IntEnum):
+    """Risk level of an analysis, ordered so filters can compare levels"""
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+    @classmethod
+    def parse(cls, text: Any) -> Optional["RiskLevel"]:
+        """The first risk level named in text ("moderate" counts as medium)"""
+        if not isinstance(text, str):
+            return None
+        match = _RISK_WORD.search(text)
+        if not match:
+            return None
+        word = match.group(1).lower()
+        return cls.MEDIUM if word == "moderate" else cls[word.upper()]
+
+    @classmethod
+    def of(cls, analysis: Any) -> Optional["RiskLevel"]:
+        """Risk level of a structured analysis, or of the text of an unstructured one"""
+        if not isinstance(analysis, dict):
+            return None
+        if "risk" in analysis:
+            return cls.parse(analysis["risk"])
+        match = _RISK_STATED.search(analysis.get("analysis") or "")
+        return cls.parse(match.group(1)) if match else None
+
+
+# Section headings start a line and end with a colon, a dash or the line; they
+# may be numbered, in markdown emphasis or followed by the prompt's
+# instructions in brackets ("1. Summary (2-3 sentences):")
+SECTIONS = {
+    "summary": "summary",
+    "market impact": "market_impact",
+    "trading ideas": "trading_ideas",
+    "key assets": "assets",
+    "assets": "assets",
+    "risk level": "risk",
+    "risk": "risk",
+}
+
+# Where prompts end, for models that echo them before the analysis
+PROMPT_ENDS = ("<|assistant|>", "Keep responses short and focused.")
+
+_HEADING = re.compile(
+    r"^[\s#*]*(?:\d+[.)]\s*)?[*_]*(summary|market impact|trading ideas|key assets|assets|risk level|risk)[*_]*"
+    r"(?:\s*\([^)\n]*\))?[*_]*(?:\s*[:\-–][*_]*[ \t]*|[ \t]*$)",
+    re.IGNORECASE | re.MULTILINE
+)
+_RISK_WORD = re.compile(r"\b(low|medium|moderate|high)\b", re.IGNORECASE)
+_RISK_STATED = re.compile(r"risk(?:\s+level)?\W{0,5}(low|medium|moderate|high)", re.IGNORECASE)
+_NO_ASSETS = {"none", "none identified", "n/a", "na", "-"}
+
+
+def strip_prompt(text: str) -> str:
+    """The text after the last echoed end of a prompt, if any"""
+    for marker in PROMPT_ENDS:
+        index = text.rfind(marker)
+        if index != -1:
+            text = text[index + len(marker):]
+    return text.replace("</s>", "").strip()
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip(" \t\n*_-")
+
+
+def _split_assets(text: str) -> List[str]:
+    assets = []
+    for item in re.split(r"[,;\n]|\band\b", text):
+        item = _clean(re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", item)).rstrip(".")
+        if item and item.lower() not in _NO_ASSETS and item not in assets:
+            assets.append(item)
+    return assets
+
+
+def parse_analysis(text: str) -> Dict[str, Any]:
+    """Sections of an analysis as fields; a missing summary is the text before the first heading"""
+    text = strip_prompt(text)
+    headings = list(_HEADING.finditer(text))
+    sections: Dict[str, str] = {}
+    for heading, following in zip(headings, headings[1:] + [None]):
+        field = SECTIONS[re.sub(r"\s+", " ", heading.group(1).lower())]
+        body = text[heading.end():following.start() if following else len(text)]
+        sections.setdefault(field, body)  # Repeated headings: the model rambling on
+
+    risk_text = _clean(sections.get("risk", ""))
+    risk = RiskLevel.parse(risk_text)
+    if "risk" not in sections:
+        stated = _RISK_STATED.search(text)
+        risk = RiskLevel.parse(stated.group(1)) if stated else None
+    # Text before the first heading (all of it without headings) summarizes best
+    preamble = text[:headings[0].start()] if headings else text
+    return {
+        "summary": _clean(sections.get("summary", preamble)),
+        "market_impact": _clean(sections.get("market_impact", "")),
+        "trading_ideas": _clean(sections.get("trading_ideas", "")),
+        "assets": _split_assets(sections.get("assets", "")),
+        "risk": risk.name.lower() if risk else None,
+        "risk_reason": _clean(_RISK_WORD.sub("", risk_text, count=1)).lstrip(" ,.:;–-") if risk else risk_text,
+    }
+
+
+def structure_analysis(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """A backend result with its analysis text replaced by the parsed sections
+
+    Results that are already structured are returned unchanged.
+    """
+    if not result or not isinstance(result.get("analysis"), str):
+        return result
+    structured = {key: value for key, value in result.items() if key != "analysis"}
+    structured.update(parse_analysis(result["analysis"]))
+    return structured
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from metrics import (
+    ANALYSES, ANALYSES_SHED, ANALYSIS_BACKLOG_AGE_SECONDS, ANALYSIS_QUEUE_DEPTH, ANALYSIS_QUEUE_WAIT_SECONDS,
+    ANALYZER_BUDGET_SPENT
+)
+from redis_client import article_score
+
+# Articles waiting for analysis: a ZSET of article IDs by priority score, a
+# hash of the queued (and claimed) items, and a ZSET of their enqueue times
+ANALYSIS_SCHEDULE_KEY = "analysis:schedule"
+ANALYSIS_ITEMS_KEY = "analysis:items"
+ANALYSIS_ENQUEUED_KEY = "analysis:enqueued"
+
+# Lists used by the first, first-in-first-out version of the queue; recover() moves their items over
+LEGACY_QUEUE_KEYS = ("analysis:queue", "analysis:processing")
+
+# Score penalty for items past their deadline, ranking them below every fresh item
+LATE_PENALTY = 10 ** 10
+
+
+def priority_boost(article: Dict[str, Any], priorities: Dict[str, float]) -> float:
+    """Largest configured boost (in seconds) of the article's source, categories or assets"""
+    if not priorities:
+        return 0.0
+    keys = [article.get("source") or ""]
+    keys.extend(
+        category.get("term", "") if isinstance(category, dict) else category
+        for category in article.get("categories") or []
+    )
+    keys.extend(article.get("assets") or [])
+    return max((priorities.get(key.strip().lower(), 0.0) for key in keys if key), default=0.0)
+
+
+class AnalysisQueue:
+    """Durable, prioritized queue of articles awaiting analysis
+
+    Articles are claimed newest first, where a configured priority for a
+    source, category or asset counts as that many seconds of recency (so
+    `coindesk.com=600` ranks its articles as if 10 minutes newer). Articles
+    published more than `deadline` seconds ago are past their deadline: by
+    default they are kept but only analyzed once no fresh article is waiting,
+    or with `deadline_action="drop"` dropped when claimed. The queue holds at most
+    `max_backlog` articles; beyond that the lowest ranked are shed.
+
+    Claimed items stay stored until acknowledged, so analyses in flight when
+    a worker dies are recovered on the next start. An article is queued at
+    most once; enqueueing it again updates it in place.
+    """
+
+    def __init__(
+        self,
+        redis,
+        priorities: Optional[Dict[str, float]] = None,
+        deadline: float = 0,
+        deadline_action: str = "downgrade",
+        max_backlog: int = 0,
+        schedule_key: str = ANALYSIS_SCHEDULE_KEY,
+        items_key: str = ANALYSIS_ITEMS_KEY,
+        enqueued_key: str = ANALYSIS_ENQUEUED_KEY
+    ):
+        if deadline_action not in ("drop", "downgrade"):
+            raise ValueError(f"Unknown deadline action '{deadline_action}' (expected drop or downgrade)")
+        self.redis = redis
+        self.priorities = {key.lower(): value for key, value in (priorities or {}).items()}
+        self.deadline = deadline
+        self.deadline_action = deadline_action
+        self.max_backlog = max_backlog
+        self.schedule_key = schedule_key
+        self.items_key = items_key
+        self.enqueued_key = enqueued_key
+
+    def score(self, article: Dict[str, Any], now: Optional[float] = None) -> float:
+        """Rank of an article in the queue; higher is claimed first"""
+        now = now or time.time()
+        published = min(article_score(article), now)  # Future-dated entries get no head start
+        score = published + priority_boost(article, self.priorities)
+        return score - LATE_PENALTY if self.is_late(article, now) else score
+
+    def is_late(self, article: Dict[str, Any], now: Optional[float] = None) -> bool:
+        return bool(self.deadline) and (now or time.time()) - article_score(article) > self.deadline
+
+    async def enqueue(self, article: Dict[str, Any], attempts: int = 0) -> None:
+        now = time.time()
+        item = json.dumps({"article": article, "attempts": attempts, "enqueued_at": now})
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.items_key, article["id"], item)
+            pipe.zadd(self.enqueued_key, {article["id"]: now}, nx=True)
+            pipe.zadd(self.schedule_key, {article["id"]: self.score(article, now)})
+            pipe.zcard(self.schedule_key)
+            *_, depth = await pipe.execute()
+        ANALYSIS_QUEUE_DEPTH.set(depth)
+        if self.max_backlog and depth > self.max_backlog:
+            await self._shed(depth - self.max_backlog)
+
+    async def _shed(self, count: int) -> None:
+        """Drop the lowest ranked queued articles"""
+        shed = [article_id for article_id, _ in await self.redis.zpopmin(self.schedule_key, count)]
+        if shed:
+            await self._forget(shed)
+            ANALYSES_SHED.inc(len(shed), reason="overflow")
+            logger.warning(f"Analysis backlog over {self.max_backlog}, shed {len(shed)} articles")
+
+    async def _forget(self, article_ids: Iterable[str]) -> None:
+        article_ids = list(article_ids)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.items_key, *article_ids)
+            pipe.zrem(self.enqueued_key, *article_ids)
+            await pipe.execute()
+
+    async def claim(self, timeout: float = 5) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Wait up to timeout seconds for the highest ranked item; returns (article ID, item)
+
+        Items past their deadline are dropped or downgraded on the way.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            popped = await self.redis.bzpopmax(self.schedule_key, remaining)
+            if popped is None:
+                return None
+            _, article_id, score = popped
+            raw = await self.redis.hget(self.items_key, article_id)
+            if raw is None:  # Acknowledged meanwhile, e.g. a duplicate of a finished item
+                continue
+            item = json.loads(raw)
+            article = item["article"]
+
+            if self.is_late(article):
+                if self.deadline_action == "drop":
+                    await self._forget([article_id])
+                    ANALYSES_SHED.inc(reason="expired")
+                    logger.info(f"Dropped analysis of article {article_id}: past its {self.deadline:.0f}s deadline")
+                    continue
+                if float(score) > -LATE_PENALTY / 2:
+                    # Went past its deadline while queued: put it back below every fresh article
+                    await self.redis.zadd(self.schedule_key, {article_id: self.score(article)})
+                    ANALYSES_SHED.inc(reason="downgraded")
+                    continue
+
+            ANALYSIS_QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - item.get("enqueued_at", time.time())))
+            return article_id, item
+
+    async def ack(self, article_id: str) -> None:
+        await self._forget([article_id])
+
+    async def recover(self) -> int:
+        """Requeue items claimed by a stopped consumer, and items left in the legacy lists"""
+        recovered = 0
+        for key in LEGACY_QUEUE_KEYS:
+            while (raw := await self.redis.rpop(key)) is not None:
+                item = json.loads(raw)
+                await self.enqueue(item["article"], item.get("attempts", 0))
+                recovered += 1
+
+        stored = await self.redis.hgetall(self.items_key)
+        queued = set(await self.redis.zrange(self.schedule_key, 0, -1))
+        for article_id, raw in stored.items():
+            if article_id not in queued:
+                await self.redis.zadd(self.schedule_key, {article_id: self.score(json.loads(raw)["article"])})
+                recovered += 1
+        if recovered:
+            logger.warning(f"Recovered {recovered} unfinished analyses")
+        return recovered
+
+    async def depth(self) -> int:
+        return await self.redis.zcard(self.schedule_key)
+
+    async def backlog(self) -> Dict[str, Any]:
+        """Queue depth and the age of the oldest waiting (or running) item"""
+        depth = await self.depth()
+        oldest = await self.redis.zrange(self.enqueued_key, 0, 0, withscores=True)
+        age = max(0.0, time.time() - oldest[0][1]) if oldest else 0.0
+        ANALYSIS_QUEUE_DEPTH.set(depth)
+        ANALYSIS_BACKLOG_AGE_SECONDS.set(age)
+        return {"depth": depth, "oldest_age_seconds": round(age, 3)}
+
+
+class AnalysisBudget:
+    """Cost budget of one analyzer backend over a sliding hour
+
+    Every analysis costs `cost`; `wait()` holds a worker back while the
+    analyses of the last hour have spent `hourly_budget`, then reserves the
+    cost, so concurrent workers can't overshoot. A reservation that finds no
+    work is given back with `refund()`. A budget of 0 is unlimited.
+    """
+
+    WINDOW = 3600
+
+    def __init__(self, backend: str, hourly_budget: float = 0, cost: float = 1):
+        self.backend = backend
+        self.hourly_budget = hourly_budget
+        self.cost = cost
+        self._spent: Deque[Tuple[float, float]] = deque()  # (monotonic time, cost)
+        self._spent_total = 0.0
+
+    def _expire(self, now: float) -> None:
+        while self._spent and self._spent[0][0] <= now - self.WINDOW:
+            self._spent_total -= self._spent.popleft()[1]
+
+    @property
+    def spent(self) -> float:
+        self._expire(time.monotonic())
+        return self._spent_total
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether one more analysis would go over the budget (one always fits an unspent budget)"""
+        spent = self.spent
+        return bool(self.hourly_budget and self._spent) and spent + self.cost > self.hourly_budget
+
+    def reserve(self) -> bool:
+        """Reserve the cost of one analysis, if it fits in the budget"""
+        if self.exhausted:
+            return False
+        self._spent.append((time.monotonic(), self.cost))
+        self._spent_total += self.cost
+        return True
+
+    async def wait(self) -> None:
+        """Return once one more analysis fits in the budget, with its cost reserved"""
+        while not self.reserve():
+            await asyncio.sleep(self._spent[0][0] + self.WINDOW - time.monotonic())
+
+    def refund(self) -> None:
+        """Give back the latest reservation"""
+        if self._spent:
+            self._spent_total -= self._spent.pop()[1]
+
+    def charge(self) -> None:
+        """Count a reserved analysis as spent"""
+        ANALYZER_BUDGET_SPENT.inc(self.cost, backend=self.backend)
+
+
+class AnalysisWorkerPool:
+    """A fixed number of workers draining the analysis queue
+
+    Every analysis is bounded by `timeout`; failed or timed out ones are
+    requeued until `max_attempts`, then dropped. `on_result(article, analysis)`
+    runs for each successful analysis. With a budget, workers only claim
+    work the budget can pay for. The queue depth and backlog age are
+    reported every `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        queue: AnalysisQueue,
+        analyze: Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]],
+        on_result: Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]],
+        concurrency: int = 2,
+        timeout: float = 120,
+        max_attempts: int = 3,
+        budget: Optional[AnalysisBudget] = None,
+        report_interval: float = 5
+    ):
+        self.queue = queue
+        self.analyze = analyze
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self.report_interval = report_interval
+
+    async def run(self) -> None:
+        await self.queue.recover()
+        logger.info(f"Starting {self.concurrency} analysis workers")
+        await asyncio.gather(self._report(), *(self._worker(i) for i in range(self.concurrency)))
+
+    async def _report(self) -> None:
+        while True:
+            try:
+                await self.queue.backlog()
+            except Exception as e:
+                logger.error(f"Could not read the analysis backlog: {str(e)}")
+            await asyncio.sleep(self.report_interval)
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            if self.budget is not None:
+                await self.budget.wait()
+            try:
+                claimed = await self.queue.claim()
+            except Exception as e:
+                logger.error(f"Analysis worker {number} could not read the queue: {str(e)}")
+                claimed = None
+                await asyncio.sleep(1)
+            if claimed is None:
+                if self.budget is not None:
+                    self.budget.refund()
+                continue
+            if self.budget is not None:
+                self.budget.charge()
+            try:
+                await self.process(*claimed)
+            except Exception as e:
+                logger.error(f"Analysis worker {number} failed to handle a result: {str(e)}")
+
+    async def process(self, article_id: str, item: Dict[str, Any]) -> None:
+        article = item["article"]
+        try:
+            analysis = await asyncio.wait_for(self.analyze(article), self.timeout)
+            outcome = "ok" if analysis else "error"
+        except asyncio.TimeoutError:
+            analysis, outcome = None, "timeout"
+        except Exception as e:
+            logger.error(f"Analysis of article {article['id']} failed: {str(e)}")
+            analysis, outcome = None, "error"
+        ANALYSES.inc(outcome=outcome)
+
+        if analysis:
+            try:
+                await self.on_result(article, analysis)
+            finally:
+                await self.queue.ack(article_id)
+        elif item.get("attempts", 0) + 1 < self.max_attempts:
+            # Requeueing replaces the stored item, so it is not acknowledged
+            logger.warning(f"Analysis of article {article['id']} ended with {outcome}, requeueing")
+            await self.queue.enqueue(article, item.get("attempts", 0) + 1)
+        else:
+            logger.error(f"Giving up on analysis of article {article['id']} after {self.max_attempts} attempts")
+            await self.queue.ack(article_id)
@@ -0,0 +1,639 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import random
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+from loguru import logger
+
+from analysis_queue import AnalysisBudget
+from config import (
+    ANALYZER_CONCURRENCY, ANALYZER_COST, ANALYZER_HEDGE_DELAY_MS, ANALYZER_HOURLY_BUDGET, ANALYZER_HEDGE_QUANTILE, ANALYZER_MAX_HEDGE_RATIO, KAGGLE_MODEL, KAGGLE_SERVER_URL, MODAL_MODEL_NAME, STUB_LATENCY_MS, STUB_LATENCY_JITTER_MS,
+    VLLM_HOST, VLLM_MODEL, VLLM_MAX_TOKENS, VLLM_TEMPERATURE
+)
+from metrics import ANALYZER_ERROR_EWMA, ANALYZER_HEDGES, ANALYZER_LATENCY_EWMA_SECONDS, ANALYZER_ROUTED
+from prompts import PROMPT_VERSION, build_prompt
+
+
+class AnalyzerBackend:
+    """A model service that turns an article into an analysis
+
+    `analyze` returns a dict with at least `article_id` and `analysis`, or
+    raises; `connect` prepares clients and may be called more than once.
+    `model` names the model behind the backend; analyses are cached per
+    `model_id`, so changing it invalidates cached analyses. Backends with
+    `streams` set implement `analyze_stream`, yielding the analysis text as
+    the model generates it; others yield it in one piece.
+    """
+    name = "base"
+    model = "base"
+    streams = False
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    async def connect(self) -> None:
+        pass
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Any]:
+        """Analyze several articles in one model call, one result (or Exception) per article
+
+        Backends without a batch endpoint analyze the articles concurrently.
+        """
+        return await asyncio.gather(*(self.analyze(article) for article in articles), return_exceptions=True)
+
+    async def analyze_stream(self, article: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield the analysis text as it is generated
+
+        Backends that can't stream yield the whole analysis once it is done.
+        """
+        result = await self.analyze(article)
+        if result and result.get("analysis"):
+            yield result["analysis"]
+
+    async def analyze_streaming(
+        self,
+        article: Dict[str, Any],
+        on_text: Callable[[str], Awaitable[None]]
+    ) -> Optional[Dict[str, Any]]:
+        """Stream an analysis, passing each piece of text to on_text, and return the complete result
+
+        Leading whitespace is dropped, so the pieces add up to the result's analysis;
+        a stream without text gives None, like a failed analysis. Backends that
+        can't stream pass the whole analysis on once and return their result as is.
+        """
+        if not self.streams:
+            result = await self.analyze(article)
+            if result and result.get("analysis"):
+                await on_text(result["analysis"])
+            return result
+
+        started = time.time()
+        parts = []
+        async for text in self.analyze_stream(article):
+            if not parts:
+                text = text.lstrip()
+                if not text:
+                    continue
+            parts.append(text)
+            await on_text(text)
+        if not parts:
+            return None
+        return self._result(article, "".join(parts).rstrip(), self.model, started)
+
+    async def close(self) -> None:
+        pass
+
+    def _result(self, article: Dict[str, Any], analysis: str, model: str, started: float) -> Dict[str, Any]:
+        return {
+            "article_id": article["id"],
+            "timestamp": article.get("timestamp"),
+            "analysis": analysis,
+            "model": model,
+            "backend": self.name,
+            "prompt_version": PROMPT_VERSION,
+            "processing_time": time.time() - started
+        }
+
+
+class ModalBackend(AnalyzerBackend):
+    """The ModelService class deployed with modal_analyzer.py"""
+    name = "modal"
+
+    def __init__(
+        self,
+        app_name: str = "financial-news-analyzer",
+        class_name: str = "ModelService",
+        model: str = MODAL_MODEL_NAME
+    ):
+        self.app_name = app_name
+        self.class_name = class_name
+        self.model = model
+        self.service = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        async with self._connect_lock:
+            if self.service is None:
+                self.service = await asyncio.to_thread(self._lookup)
+
+    def _lookup(self):
+        import modal  # Heavy import, only needed by the worker that analyzes
+        return modal.Cls.from_name(self.app_name, self.class_name)()
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        await self.connect()
+        # The async variant keeps the event loop free during the remote call
+        result = await self.service.analyze_article.remote.aio(article)
+        if result:
+            result.setdefault("backend", self.name)
+        return result
+
+    async def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Any]:
+        await self.connect()
+        results = await self.service.analyze_batch.remote.aio(articles)
+        for result in results:
+            if result:
+                result.setdefault("backend", self.name)
+        return results
+
+
+class _HTTPBackend(AnalyzerBackend):
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def connect(self) -> None:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        await self.connect()
+        async with self.session.post(f"{self.base_url}{path}", json=payload) as response:
+            if response.status != 200:
+                raise RuntimeError(f"{self.name} backend returned {response.status}: {(await response.text())[:200]}")
+            return await response.json()
+
+    async def _stream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """POST and yield the JSON events of a server-sent event response until [DONE]
+
+        Raises on an error event or a stream that ends without [DONE], so a
+        failed generation isn't mistaken for a short one.
+        """
+        await self.connect()
+        async with self.session.post(f"{self.base_url}{path}", json=payload) as response:
+            if response.status != 200:
+                raise RuntimeError(f"{self.name} backend returned {response.status}: {(await response.text())[:200]}")
+            async for line in response.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[len(b"data:"):].strip()
+                if data == b"[DONE]":
+                    return
+                event = json.loads(data)
+                if isinstance(event, dict) and "error" in event:
+                    raise RuntimeError(f"{self.name} backend stream failed: {str(event['error'])[:200]}")
+                yield event
+        raise RuntimeError(f"{self.name} backend stream ended before [DONE]")
+
+
+class VLLMBackend(_HTTPBackend):
+    """A vLLM (or any OpenAI-compatible) completions server"""
+    name = "vllm"
+    streams = True
+
+    def __init__(self, base_url: str, model: str, max_tokens: int = 512, temperature: float = 0.5):
+        super().__init__(base_url)
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started = time.time()
+        data = await self._post("/v1/completions", {
+            "model": self.model,
+            "prompt": build_prompt(article),
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        })
+        return self._result(article, data["choices"][0]["text"].strip(), data.get("model", self.model), started)
+
+    async def analyze_stream(self, article: Dict[str, Any]) -> AsyncIterator[str]:
+        async for event in self._stream("/v1/completions", {
+            "model": self.model,
+            "prompt": build_prompt(article),
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "stream": True
+        }):
+            for choice in event.get("choices", []):
+                yield choice.get("text", "")
+
+    async def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Any]:
+        # The completions API takes a list of prompts and batches them on the server
+        started = time.time()
+        data = await self._post("/v1/completions", {
+            "model": self.model,
+            "prompt": [build_prompt(article) for article in articles],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        })
+        texts = {choice["index"]: choice["text"].strip() for choice in data["choices"]}
+        return [
+            self._result(article, texts[i], data.get("model", self.model), started)
+            if i in texts else RuntimeError(f"No completion returned for article {article['id']}")
+            for i, article in enumerate(articles)
+        ]
+
+
+class KaggleBackend(_HTTPBackend):
+    """The FastAPI server from kaggle/model_server.ipynb"""
+    name = "kaggle"
+    streams = True
+
+    def __init__(self, base_url: str, model: str = KAGGLE_MODEL):
+        super().__init__(base_url)
+        self.model = model
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started = time.time()
+        data = await self._post("/analyze", self._payload(article))
+        return self._result(article, data["analysis"], data.get("model", self.model), started)
+
+    async def analyze_stream(self, article: Dict[str, Any]) -> AsyncIterator[str]:
+        async for event in self._stream("/analyze_stream", self._payload(article)):
+            yield event.get("text", "")
+
+    async def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Any]:
+        started = time.time()
+        data = await self._post("/analyze_batch", {"articles": [self._payload(article) for article in articles]})
+        return [
+            self._result(article, result["analysis"], result.get("model", self.model), started)
+            for article, result in zip(articles, data["analyses"])
+        ]
+
+    @staticmethod
+    def _payload(article: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: article.get(field) or "" for field in ("id", "title", "content", "source", "timestamp")}
+
+
+class StubBackend(AnalyzerBackend):
+    """Local deterministic analyses with configurable latency, for offline load tests and benchmarks
+
+    The same article always gets the same analysis and the same latency.
+    """
+    name = "stub"
+    model = "stub"
+    streams = True
+
+    RISK_LEVELS = ("Low", "Medium", "High")
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 0, per_item_ms: float = 0, max_concurrency: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_item_ms = per_item_ms  # Extra latency per article in a batch
+        # Model calls running at once, like the accelerators behind a real backend (0: unlimited)
+        self.max_concurrency = max_concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        if not self.max_concurrency:
+            yield
+            return
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._slots:
+            yield
+
+    async def _occupy(self, latency_ms: float) -> None:
+        async with self._slot():
+            await asyncio.sleep(latency_ms / 1000)
+
+    @staticmethod
+    def _digest(article: Dict[str, Any]) -> bytes:
+        return hashlib.blake2b(f"{article['id']}:{article.get('title', '')}".encode("utf-8"), digest_size=8).digest()
+
+    def _latency_ms(self, article: Dict[str, Any]) -> float:
+        return self.latency_ms + random.Random(self._digest(article)).uniform(0, self.jitter_ms)
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started = time.time()
+        await self._occupy(self._latency_ms(article) + self.per_item_ms)
+        return self._stub_result(article, started)
+
+    async def analyze_stream(self, article: Dict[str, Any]) -> AsyncIterator[str]:
+        # The article's latency spread evenly over its words, like a model generating tokens
+        tokens = re.findall(r"\S+\s*", self._stub_text(article))
+        delay = (self._latency_ms(article) + self.per_item_ms) / 1000 / len(tokens)
+        async with self._slot():
+            for token in tokens:
+                await asyncio.sleep(delay)
+                yield token
+
+    async def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Any]:
+        # Like a model call: one fixed cost for the batch plus a small cost per article
+        started = time.time()
+        await self._occupy(max(self._latency_ms(article) for article in articles) + self.per_item_ms * len(articles))
+        return [self._stub_result(article, started) for article in articles]
+
+    def _stub_text(self, article: Dict[str, Any]) -> str:
+        risk = self.RISK_LEVELS[self._digest(article)[0] % len(self.RISK_LEVELS)]
+        assets = ", ".join(article.get("assets") or []) or "None identified"
+        return (
+            f"1. Summary: {article.get('title', '')}\n"
+            f"2. Market Impact: Stub analysis, no market impact assessed.\n"
+            f"3. Trading Ideas: None.\n"
+            f"4. Key Assets: {assets}\n"
+            f"5. Risk Level: {risk}"
+        )
+
+    def _stub_result(self, article: Dict[str, Any], started: float) -> Dict[str, Any]:
+        return self._result(article, self._stub_text(article), "stub", started)
+
+
+class _BackendStats:
+    """Moving averages of one backend's latency and failure rate, and its recent latencies"""
+
+    ALPHA = 0.2
+    MIN_SAMPLES = 10  # Before this many calls, percentiles are not trusted
+
+    def __init__(self, window: int = 100):
+        self.latency: Optional[float] = None
+        self.errors = 0.0
+        self.recent: deque = deque(maxlen=window)
+
+    def record(self, latency: Optional[float]) -> None:
+        """Record a call that took `latency` seconds, or failed (None)"""
+        self.errors += self.ALPHA * ((latency is None) - self.errors)
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.latency + self.ALPHA * (latency - self.latency)
+            self.recent.append(latency)
+
+    @property
+    def expected(self) -> float:
+        """Expected seconds to an answer, counting failures as retries
+
+        Untried backends come first and backends that never answered last.
+        """
+        if self.latency is None:
+            return float("inf") if self.errors else 0.0
+        return self.latency / max(1 - self.errors, 0.05)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        if len(self.recent) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+
+class RouterBackend(AnalyzerBackend):
+    """Routes each call to the backend expected to answer first, hedging slow calls
+
+    Backends are ranked by their latency moving average, inflated by their
+    failure rate. A call that has not answered within the chosen backend's
+    `hedge_quantile` latency (or `hedge_delay_ms` until it has enough
+    history) is also sent to the next backend; the first answer wins and the
+    other call is cancelled. Hedging is skipped while more than
+    `max_hedge_ratio` of recent calls were hedged, so slow periods don't
+    double the cost. A failed call fails over to the next backend.
+    Single and batch calls are tracked separately. Streamed analyses prefer
+    backends that stream, falling back to the others' whole analyses; they
+    fail over until their first text is out, and are not hedged.
+
+    Limits apply per routed backend, by name: `concurrency` caps its calls in
+    flight (backends with every slot taken rank after those with one free)
+    and `budgets` its spend, charged for every call including hedges;
+    backends over budget are skipped.
+    """
+    name = "router"
+
+    def __init__(
+        self,
+        backends: Sequence[AnalyzerBackend],
+        hedge_quantile: float = ANALYZER_HEDGE_QUANTILE,
+        hedge_delay_ms: float = ANALYZER_HEDGE_DELAY_MS,
+        max_hedge_ratio: float = ANALYZER_MAX_HEDGE_RATIO,
+        concurrency: Optional[Dict[str, int]] = None,
+        budgets: Optional[Dict[str, AnalysisBudget]] = None
+    ):
+        self.backends = list(backends)
+        self.model = "+".join(backend.model_id for backend in self.backends)
+        self.streams = any(backend.streams for backend in self.backends)
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay_ms / 1000
+        self.max_hedge_ratio = max_hedge_ratio
+        self.hedge_ratio = 0.0  # Moving average of hedged calls
+        self._stats: Dict[tuple, _BackendStats] = {}  # By backend and call kind
+        self.concurrency = dict(concurrency or {})
+        self.budgets = dict(budgets or {})
+        self._slots = {name: asyncio.Semaphore(limit) for name, limit in self.concurrency.items()}
+        self._in_flight: Dict[str, int] = {}  # Calls started, by backend name, including those waiting for a slot
+
+    def stats(self, backend: AnalyzerBackend, kind: str) -> _BackendStats:
+        key = (id(backend), kind)
+        if key not in self._stats:
+            self._stats[key] = _BackendStats()
+        return self._stats[key]
+
+    def ranked(self, kind: str, streaming: bool = False) -> List[AnalyzerBackend]:
+        def key(backend: AnalyzerBackend) -> tuple:
+            expected = self.stats(backend, kind).expected
+            busy = self._in_flight.get(backend.name, 0) >= self.concurrency.get(backend.name, float("inf"))
+            # Streaming backends first, unless they never answered or are busy
+            return expected == float("inf"), busy, streaming and not backend.streams, expected
+
+        backends = [
+            backend for backend in self.backends
+            if backend.name not in self.budgets or not self.budgets[backend.name].exhausted
+        ]
+        return sorted(backends, key=key)
+
+    def _candidates(self, kind: str, streaming: bool = False) -> List[AnalyzerBackend]:
+        backends = self.ranked(kind, streaming)
+        if not backends:
+            raise RuntimeError("Every analyzer backend is over its hourly budget")
+        return backends
+
+    async def connect(self) -> None:
+        # One unreachable backend must not keep the others from serving
+        results = await asyncio.gather(*(backend.connect() for backend in self.backends), return_exceptions=True)
+        for backend, result in zip(self.backends, results):
+            if isinstance(result, Exception):
+                logger.error(f"Router could not connect to {backend.name} backend: {str(result)}")
+
+    async def close(self) -> None:
+        await asyncio.gather(*(backend.close() for backend in self.backends), return_exceptions=True)
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._route("single", lambda backend: backend.analyze(article))
+
+    async def analyze_batch(self, articles: List[Dict[str, Any]]) -> List[Any]:
+        return await self._route("batch", lambda backend: backend.analyze_batch(articles))
+
+    async def analyze_stream(self, article: Dict[str, Any]) -> AsyncIterator[str]:
+        error: Optional[Exception] = None
+        for backend in self._candidates("stream", streaming=True):
+            ANALYZER_ROUTED.inc(backend=backend.name)
+            latency = None
+            sent = False
+            self._claim(backend)
+            try:
+                async with self._slot(backend):
+                    started = time.perf_counter()
+                    async for text in backend.analyze_stream(article):
+                        sent = True
+                        yield text
+                if sent:
+                    latency = time.perf_counter() - started
+            except Exception as e:
+                if sent:
+                    raise  # Another backend's text can't follow this one's
+                error = e
+            finally:
+                self._release(backend)
+                self._record(backend, "stream", latency)
+            if sent:
+                return
+        if error is not None:
+            raise error
+
+    async def analyze_streaming(
+        self,
+        article: Dict[str, Any],
+        on_text: Callable[[str], Awaitable[None]]
+    ) -> Optional[Dict[str, Any]]:
+        error: Optional[Exception] = None
+        for backend in self._candidates("stream", streaming=True):
+            sent = False
+
+            async def forward(text: str) -> None:
+                nonlocal sent
+                sent = True
+                await on_text(text)
+
+            ANALYZER_ROUTED.inc(backend=backend.name)
+            self._claim(backend)
+            try:
+                result = await self._call(backend, "stream", lambda backend: backend.analyze_streaming(article, forward))
+            except Exception as e:
+                if sent:
+                    raise  # Another backend's text can't follow this one's
+                error = e
+                continue
+            finally:
+                self._release(backend)
+            if result is not None or sent:
+                return result
+        if error is not None:
+            raise error
+        return None
+
+    def _record(self, backend: AnalyzerBackend, kind: str, latency: Optional[float]) -> None:
+        stats = self.stats(backend, kind)
+        stats.record(latency)
+        ANALYZER_ERROR_EWMA.set(stats.errors, backend=backend.name)
+        if stats.latency is not None:
+            ANALYZER_LATENCY_EWMA_SECONDS.set(stats.latency, backend=backend.name)
+
+    def _claim(self, backend: AnalyzerBackend) -> None:
+        """Count a call to the backend as started, before it gets a slot, so concurrent rankings see it"""
+        self._in_flight[backend.name] = self._in_flight.get(backend.name, 0) + 1
+
+    def _release(self, backend: AnalyzerBackend) -> None:
+        self._in_flight[backend.name] -= 1
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, backend: AnalyzerBackend):
+        """Hold one of the backend's call slots, after charging the call to its budget"""
+        budget = self.budgets.get(backend.name)
+        if budget is not None:
+            if not budget.reserve():
+                raise RuntimeError(f"The {backend.name} analyzer backend is over its hourly budget")
+            budget.charge()
+        slots = self._slots.get(backend.name)
+        if slots is None:
+            yield
+        else:
+            async with slots:
+                yield
+
+    async def _call(self, backend: AnalyzerBackend, kind: str, call: Callable[[AnalyzerBackend], Awaitable[Any]]) -> Any:
+        async with self._slot(backend):
+            return await self._timed(backend, kind, call)
+
+    async def _timed(self, backend: AnalyzerBackend, kind: str, call: Callable[[AnalyzerBackend], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await call(backend)
+        except asyncio.CancelledError:
+            raise  # A lost hedge says nothing about the backend
+        except Exception:
+            self._record(backend, kind, None)
+            raise
+        self._record(backend, kind, time.perf_counter() - started if result is not None else None)
+        return result
+
+    async def _route(self, kind: str, call: Callable[[AnalyzerBackend], Awaitable[Any]]) -> Any:
+        ranked = iter(self._candidates(kind))
+        pending: Dict[asyncio.Task, AnalyzerBackend] = {}
+
+        def start() -> Optional[AnalyzerBackend]:
+            backend = next(ranked, None)
+            if backend is not None:
+                ANALYZER_ROUTED.inc(backend=backend.name)
+                self._claim(backend)
+                task = asyncio.create_task(self._call(backend, kind, call))
+                task.add_done_callback(lambda _, backend=backend: self._release(backend))
+                pending[task] = backend
+            return backend
+
+        primary = start()
+        hedge_after: Optional[float] = self.stats(primary, kind).percentile(self.hedge_quantile) or self.hedge_delay
+        hedge: Optional[AnalyzerBackend] = None
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slow: hedge once, unless too many calls were hedged lately
+                    hedge_after = None
+                    if self.hedge_ratio < self.max_hedge_ratio:
+                        hedge = start()
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None and task.result() is not None:
+                        if hedge is not None:
+                            ANALYZER_HEDGES.inc(result="won" if backend is hedge else "lost")
+                        return task.result()
+                    error = task.exception() or error
+                if not pending:
+                    hedge_after = None
+                    start()  # Fail over to the next backend
+            if error is not None:
+                raise error
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            self.hedge_ratio += _BackendStats.ALPHA * ((hedge is not None) - self.hedge_ratio)
+
+
+def create_backend(name: str) -> AnalyzerBackend:
+    """Build a backend by name, configured from config.py; a comma-separated list builds a router"""
+    name = name.lower()
+    if name == "modal":
+        return ModalBackend()
+    if name == "vllm":
+        return VLLMBackend(VLLM_HOST, VLLM_MODEL, VLLM_MAX_TOKENS, VLLM_TEMPERATURE)
+    if name == "kaggle":
+        return KaggleBackend(KAGGLE_SERVER_URL, KAGGLE_MODEL)
+    if name == "stub":
+        return StubBackend(STUB_LATENCY_MS, STUB_LATENCY_JITTER_MS)
+    if "," in name:
+        backends = [create_backend(backend.strip()) for backend in name.split(",") if backend.strip()]
+        names = {backend.name for backend in backends}
+        return RouterBackend(
+            backends,
+            concurrency={backend: int(limit) for backend, limit in ANALYZER_CONCURRENCY.items() if backend in names},
+            budgets={
+                backend: AnalysisBudget(backend, ANALYZER_HOURLY_BUDGET.get(backend, 0), ANALYZER_COST.get(backend, 1))
+                for backend in names
+            }
+        )
+    raise ValueError(f"Unknown analyzer backend '{name}' (expected modal, vllm, kaggle or stub)")
@@ -1,34 +1,150 @@
-import modal
 from loguru import logger
-from typing import Dict, Any, Optional
+from typing import Awaitable, Callable, Dict, Any, Optional
+import asyncio
 import time
 
+from analysis_cache import AnalysisCache
+from analysis_parser import structure_analysis
+from analyzer_backends import AnalyzerBackend, create_backend
+from batching import MicroBatcher, TokenCoalescer
+from config import (
+    ANALYZER_BACKEND, ANALYSIS_BATCH_SIZE, ANALYSIS_BATCH_WINDOW_MS, ANALYSIS_STREAMING, ANALYSIS_DELTA_INTERVAL_MS
+)
+from metrics import ANALYZER_FIRST_TOKEN_SECONDS
+
+# Receives (text, offset) pieces of an analysis being generated
+DeltaCallback = Callable[[str, int], Awaitable[None]]
+
 class ArticleAnalyzer:
-    def __init__(self):
-        self.stub = modal.Stub.from_name("financial-news-analyzer")
-        self.model = self.stub.ModelService()
-        logger.info("ArticleAnalyzer initialized with Modal")
+    """Analyzes articles with the configured backend (ANALYZER_BACKEND)
+
+    Construction is cheap; backends import their clients and connect in
+    `connect()`, which can run in the background while the service is
+    already serving. With a batch size above one, concurrent analyses are
+    micro-batched into the backend's batch endpoint. With a cache, articles
+    whose content was analyzed before by the same model and prompt are
+    answered from it without calling the backend. Callers passing `on_delta`
+    get the text as it is generated, in coalesced pieces, from backends that
+    stream (unless `streaming` is off); those analyses are not batched.
+    Results carry the analysis as structured sections (see analysis_parser).
+    """
+
+    def __init__(
+        self,
+        backend: Optional[AnalyzerBackend] = None,
+        batch_size: int = ANALYSIS_BATCH_SIZE,
+        batch_window_ms: float = ANALYSIS_BATCH_WINDOW_MS,
+        cache: Optional[AnalysisCache] = None,
+        streaming: bool = ANALYSIS_STREAMING,
+        delta_interval_ms: float = ANALYSIS_DELTA_INTERVAL_MS
+    ):
+        self.backend = backend or create_backend(ANALYZER_BACKEND)
+        self.cache = cache
+        self.streaming = streaming and self.backend.streams
+        self.delta_interval_ms = delta_interval_ms
+        # Analyses running per cache key, shared by articles with the same content
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.batcher = (
+            MicroBatcher(self.backend.analyze_batch, batch_size, batch_window_ms)
+            if batch_size > 1 else None
+        )
+
+    async def connect(self) -> None:
+        start_time = time.time()
+        await self.backend.connect()
+        logger.info(f"ArticleAnalyzer connected to {self.backend.name} backend in {time.time() - start_time:.2f}s")
+
+    async def close(self) -> None:
+        await self.backend.close()
 
-    async def analyze_article(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Analyze article using Modal service"""
+    async def analyze_article(
+        self,
+        article: Dict[str, Any],
+        on_delta: Optional[DeltaCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Analyze article using the configured backend"""
         start_time = time.time()
         logger.info(f"Starting analysis for article: {article['id']} - {article['title'][:50]}...")
-        
+
         try:
-            result = self.model.analyze_article.remote(article)
-            
+            if self.cache is None:
+                result = await self._analyze(article, on_delta)
+            else:
+                result = await self._analyze_cached(article, on_delta)
+                if result and result.get("cached"):
+                    logger.info(f"Analysis for article {article['id']} served from cache")
+                    return result
+
             if result:
                 elapsed_time = time.time() - start_time
                 logger.info(
                     f"Analysis completed for article {article['id']} in {elapsed_time:.2f}s\n"
                     f"Title: {article['title'][:50]}...\n"
-                    f"Analysis Preview: {result['analysis'][:200]}..."
+                    f"Summary: {result['summary'][:200]}..."
                 )
                 return result
             else:
                 logger.error("Analysis failed: No result returned")
                 return None
-                
+
         except Exception as e:
-            logger.error(f"Error analyzing article: {str(e)}")
-            return None 
\ No newline at end of file
+            logger.error(f"Error analyzing article with {self.backend.name}: {str(e)}")
+            return None
+
+    async def _analyze(self, article: Dict[str, Any], on_delta: Optional[DeltaCallback] = None) -> Optional[Dict[str, Any]]:
+        if on_delta is not None and self.streaming:
+            result = await self._analyze_streaming(article, on_delta)
+        elif self.batcher is not None:
+            result = await self.batcher.submit(article)
+        else:
+            result = await self.backend.analyze(article)
+        return structure_analysis(result)
+
+    async def _analyze_streaming(self, article: Dict[str, Any], on_delta: DeltaCallback) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        coalescer = TokenCoalescer(on_delta, self.delta_interval_ms)
+        first = True
+
+        async def on_text(text: str) -> None:
+            nonlocal first
+            if first:
+                ANALYZER_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, backend=self.backend.name)
+                first = False
+            await coalescer.add(text)
+
+        result = await self.backend.analyze_streaming(article, on_text)
+        await coalescer.flush()
+        return result
+
+    async def _analyze_cached(
+        self,
+        article: Dict[str, Any],
+        on_delta: Optional[DeltaCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Answer from the cache, join a running analysis of the same content, or run and cache one"""
+        key = self.cache.key(article)
+        if key not in self._in_flight:
+            cached = await self.cache.get(article)
+            if cached:
+                return structure_analysis(cached)  # Entries cached before analyses were structured
+
+        shared = self._in_flight.get(key)
+        if shared is not None:
+            result = await asyncio.shield(shared)
+            return self.cache.readdress(result, article) if result else None
+
+        task = asyncio.create_task(self._analyze_and_store(article, on_delta))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so a caller that times out does not cancel it for the others
+        return await asyncio.shield(task)
+
+    async def _analyze_and_store(
+        self,
+        article: Dict[str, Any],
+        on_delta: Optional[DeltaCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        result = await self._analyze(article, on_delta)
+        if result:
+            await self.cache.set(article, result)
+        return result
@@ -0,0 +1,150 @@
+"""Deterministic asset tagging of articles at ingest
+
+An Aho-Corasick automaton over the words of every asset name ("bitcoin",
+"shiba inu", ...) finds all names in one pass over an article, however many
+assets the dictionary holds. Tickers are matched as cashtags ("$SOL") or
+upper-case words ("SOL"), so common words that double as tickers ("sol",
+"link", "dot") don't tag articles. The dictionary is a JSON file mapping each
+ticker to its names, reloaded when it changes:
+
+    {"BTC": ["bitcoin", "btc"], "SHIB": ["shiba inu"]}
+"""
+import json
+import os
+import re
+import string
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+# Ticker -> names matched case-insensitively; a name that is the ticker itself
+# tags lower-case mentions too, so only unambiguous tickers are listed as names
+DEFAULT_ASSETS: Dict[str, List[str]] = {
+    "BTC": ["bitcoin", "btc", "xbt"],
+    "ETH": ["ethereum", "ether", "eth"],
+    "USDT": ["tether", "usdt"],
+    "USDC": ["usd coin", "usdc"],
+    "BNB": ["binance coin", "bnb"],
+    "SOL": ["solana"],
+    "XRP": ["xrp"],
+    "DOGE": ["dogecoin", "doge"],
+    "ADA": ["cardano"],
+    "TRX": ["tron"],
+    "TON": ["toncoin"],
+    "AVAX": ["avalanche"],
+    "SHIB": ["shiba inu", "shib"],
+    "DOT": ["polkadot"],
+    "LINK": ["chainlink"],
+    "LTC": ["litecoin", "ltc"],
+    "BCH": ["bitcoin cash", "bch"],
+    "MATIC": ["polygon", "matic"],
+    "XLM": ["stellar", "xlm"],
+    "ATOM": ["cosmos"],
+    "NEAR": ["near protocol"],
+    "UNI": ["uniswap"],
+    "APT": ["aptos"],
+    "ARB": ["arbitrum"],
+    "OP": ["optimism"],
+    "SUI": ["sui"],
+    "PEPE": ["pepe"],
+    "XMR": ["monero", "xmr"],
+}
+
+_TAGS = re.compile(r"<[^>]+>")
+# Punctuation and whitespace become spaces, except the "$" of cashtags;
+# str.translate and str.split tokenize far faster than a regex
+_SEPARATORS = str.maketrans(dict.fromkeys(
+    string.punctuation.replace("$", "") + "\t\n\r\f\v\xa0\u2018\u2019\u201c\u201d\u2013\u2014\u2026", " "
+))
+
+
+class _Automaton:
+    """Aho-Corasick automaton over word sequences"""
+
+    def __init__(self, patterns: Iterable[Tuple[Sequence[str], str]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Set[str]] = [set()]
+        for words, label in patterns:
+            state = 0
+            for word in words:
+                if word not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][word] = len(self.goto) - 1
+                state = self.goto[state][word]
+            self.output[state].add(label)
+
+        # Breadth-first, so each state's failure state is final before its children need it
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for word, child in self.goto[state].items():
+                queue.append(child)
+                if state:
+                    fallback = self.fail[state]
+                    while fallback and word not in self.goto[fallback]:
+                        fallback = self.fail[fallback]
+                    self.fail[child] = self.goto[fallback].get(word, 0)
+                self.output[child] |= self.output[self.fail[child]]
+
+    def search(self, words: Iterable[str]) -> Set[str]:
+        goto, fail, output = self.goto, self.fail, self.output
+        root = goto[0]
+        found: Set[str] = set()
+        state = 0
+        for word in words:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = (goto[state] if state else root).get(word, 0)
+            if state and output[state]:
+                found |= output[state]
+        return found
+
+
+class AssetTagger:
+    """Tags articles with the tickers of the assets they mention"""
+
+    def __init__(self, assets: Optional[Dict[str, List[str]]] = None, path: str = ""):
+        self.path = path
+        self._mtime: Optional[float] = None
+        self._build(assets or DEFAULT_ASSETS)
+        if path:
+            self.reload()
+
+    def _build(self, assets: Dict[str, List[str]]) -> None:
+        patterns = [(name.lower().split(), ticker.upper()) for ticker, names in assets.items() for name in names]
+        patterns.extend(([f"${ticker.lower()}"], ticker.upper()) for ticker in assets)
+        # Swapped together, so a tag call never sees a half-built dictionary
+        self._tables = (_Automaton(patterns), {ticker.lower(): ticker.upper() for ticker in assets})
+
+    def reload(self) -> bool:
+        """Rebuild from the dictionary file if it changed; keeps the current one on errors"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            with open(self.path) as f:
+                assets = json.load(f)
+            self._build(assets)
+            self._mtime = mtime
+            logger.info(f"Loaded {len(assets)} assets from {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"Could not load asset dictionary from {self.path}: {str(e)}")
+            return False
+
+    def tag_text(self, text: str) -> List[str]:
+        automaton, tickers = self._tables
+        text = f" {_TAGS.sub(' ', text).translate(_SEPARATORS)} "
+        words = text.lower().split()
+        found = automaton.search(words)
+        # Bare tickers only count in upper case; the few candidates are checked in the original text
+        for word in tickers.keys() & set(words):
+            if f" {tickers[word]} " in text:
+                found.add(tickers[word])
+        return sorted(found)
+
+    def tag(self, article: Dict[str, Any]) -> List[str]:
+        """Tickers mentioned in the article's title or content"""
+        return self.tag_text(f"{article.get('title', '')}\n{article.get('content', '')}")
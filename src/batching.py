@@ -0,0 +1,115 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+
+from metrics import histogram
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE = histogram(
+    "analysis_batch_size", "Articles per analyzer batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects concurrent requests into batches for a batch-capable model
+
+    A batch is sent when `max_batch` items are waiting or `window_ms` after
+    its first item arrived, whichever comes first. `process_batch` must
+    return one result per item, in order; an Exception in place of a result
+    is raised to that item's caller only, and if the whole call fails every
+    caller in the batch gets its exception.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[T]], Awaitable[List[R]]],
+        max_batch: int = 8,
+        window_ms: float = 200
+    ):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = set()
+
+    async def submit(self, item: T) -> R:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up (e.g. timed out) while waiting are left out of the batch
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        BATCH_SIZE.observe(len(batch))
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch of {len(batch)} returned {len(results)} results")
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class TokenCoalescer:
+    """Coalesces streamed text into fewer, larger deltas
+
+    `emit(text, offset)` receives the first chunk at once (so clients see
+    output at the first token) and from then on whatever accumulated, at
+    most once per `interval_ms`; `offset` is the position of `text` in the
+    full output. Call `flush()` when the stream ends.
+    """
+
+    def __init__(self, emit: Callable[[str, int], Awaitable[None]], interval_ms: float = 250):
+        self.emit = emit
+        self.interval = interval_ms / 1000
+        self.offset = 0
+        self._buffer: List[str] = []
+        self._last_emit: Optional[float] = None
+
+    async def add(self, text: str) -> None:
+        if not text:
+            return
+        self._buffer.append(text)
+        now = time.monotonic()
+        if self._last_emit is None or now - self._last_emit >= self.interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._last_emit = time.monotonic()
+        offset, self.offset = self.offset, self.offset + len(text)
+        await self.emit(text, offset)
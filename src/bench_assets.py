@@ -0,0 +1,53 @@
+"""Asset tagging benchmark: articles tagged per second
+
+Tags synthetic articles shaped like ingested ones (a 200 character title and
+500 characters of content) with the built-in dictionary, or a larger one
+padded with made-up assets to show the cost doesn't grow with its size.
+
+    python src/bench_assets.py --articles 20000 --extra-assets 5000
+"""
+import argparse
+import random
+import time
+
+from assets import DEFAULT_ASSETS, AssetTagger
+
+WORDS = (
+    "the market price rose fell after traders investors said on monday analysts expect a "
+    "rally selloff amid inflation data from exchange flows while funds added"
+).split()
+MENTIONS = ["Bitcoin", "BTC", "$ETH", "Ether", "Solana", "XRP", "Shiba Inu", "Chainlink", "DOGE"]
+
+
+def make_article(rng: random.Random) -> dict:
+    def text(length: int) -> str:
+        words = []
+        while sum(len(w) + 1 for w in words) < length:
+            words.append(rng.choice(MENTIONS) if rng.random() < 0.05 else rng.choice(WORDS))
+        return " ".join(words)[:length]
+    return {"title": text(200), "content": text(500)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--extra-assets", type=int, default=0, help="Made-up assets added to the dictionary")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    assets = dict(DEFAULT_ASSETS)
+    assets.update({f"X{i}": [f"token{i} coin", f"xcoin{i}"] for i in range(args.extra_assets)})
+    started = time.perf_counter()
+    tagger = AssetTagger(assets)
+    built = time.perf_counter() - started
+
+    articles = [make_article(rng) for _ in range(args.articles)]
+    started = time.perf_counter()
+    tagged = sum(1 for article in articles if tagger.tag(article))
+    elapsed = time.perf_counter() - started
+    print(f"{len(assets)} assets, automaton built in {built * 1000:.1f} ms")
+    print(f"{args.articles / elapsed:,.0f} articles/s ({elapsed / args.articles * 1e6:.1f} us each, {tagged} tagged)")
+
+
+if __name__ == "__main__":
+    main()
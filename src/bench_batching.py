@@ -0,0 +1,62 @@
+"""Micro-batching benchmark: analysis throughput and latency versus batch window
+
+Runs a burst of articles through ArticleAnalyzer with the local stub backend
+modelling one accelerator: calls run one at a time, and each costs a fixed
+latency plus a small per-article latency, like a model.generate call.
+
+    python src/bench_batching.py --articles 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from analyzer_backends import StubBackend
+from article_analyzer import ArticleAnalyzer
+
+
+async def run_burst(analyzer: ArticleAnalyzer, articles: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)  # Like ANALYSIS_WORKERS
+
+    async def analyze(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await analyzer.analyze_article({"id": f"bench-{i}", "title": f"Article {i}"})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(analyze(i) for i in range(articles)))
+    return time.perf_counter() - started, latencies
+
+
+async def main():
+    from loguru import logger
+    logger.remove()  # Per-article analysis and config logs would dominate the output
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--windows", default="0,25,50,100,200,400", help="Batch windows in ms; 0 disables batching")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Fixed cost of one model call")
+    parser.add_argument("--per-item-ms", type=float, default=10, help="Extra cost per article in a call")
+    parser.add_argument("--accelerators", type=int, default=1, help="Model calls that can run at once")
+    args = parser.parse_args()
+
+    print(f"{'window':>8} {'articles/s':>11} {'p50 ms':>8} {'p95 ms':>8}")
+    for window in (float(w) for w in args.windows.split(",")):
+        backend = StubBackend(
+            latency_ms=args.latency_ms, per_item_ms=args.per_item_ms, max_concurrency=args.accelerators
+        )
+        analyzer = ArticleAnalyzer(backend, batch_size=args.batch_size if window else 1, batch_window_ms=window)
+        elapsed, latencies = await run_burst(analyzer, args.articles, args.concurrency)
+        latencies.sort()
+        print(
+            f"{'off' if not window else f'{window:.0f}ms':>8} {args.articles / elapsed:>11.1f} "
+            f"{statistics.median(latencies) * 1000:>8.0f} {latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Startup benchmark: time from process start to the first successful /articles response
+
+Starts the service (against the Redis configured in the environment), polls
+/articles until it answers with a 2xx, stops it and repeats.
+
+    python src/bench_startup.py --runs 5
+    python src/bench_startup.py --cmd "gunicorn -c src/gunicorn.conf.py"
+"""
+import argparse
+import os
+import shlex
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Optional, Tuple
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def probe(url: str) -> Optional[int]:
+    """Status of a GET, or None while nothing is listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def measure(cmd: str, url: str, timeout: float, interval: float) -> Tuple[Optional[float], Optional[float]]:
+    """Seconds until the first HTTP response and until the first 2xx"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        shlex.split(cmd),
+        cwd=os.path.dirname(SRC_DIR),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    first_response = first_ok = None
+    try:
+        while time.perf_counter() - started < timeout:
+            status = probe(url)
+            elapsed = time.perf_counter() - started
+            if status is not None and first_response is None:
+                first_response = elapsed
+            if status is not None and 200 <= status < 300:
+                first_ok = elapsed
+                break
+            if process.poll() is not None:
+                print(f"Service exited with code {process.returncode}", file=sys.stderr)
+                break
+            time.sleep(interval)
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    return first_response, first_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cmd", default=f"{sys.executable} src/main.py", help="Command starting the service")
+    parser.add_argument("--url", default="http://localhost:8000/articles")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120, help="Give up on a run after this many seconds")
+    parser.add_argument("--interval", type=float, default=0.05, help="Polling interval in seconds")
+    args = parser.parse_args()
+
+    results = []
+    for run in range(1, args.runs + 1):
+        first_response, first_ok = measure(args.cmd, args.url, args.timeout, args.interval)
+        print(
+            f"run {run}: first response "
+            f"{'-' if first_response is None else f'{first_response:.2f}s'}, first 2xx "
+            f"{'timed out' if first_ok is None else f'{first_ok:.2f}s'}"
+        )
+        if first_ok is not None:
+            results.append(first_ok)
+
+    if results:
+        print(f"time-to-first-2xx: median {statistics.median(results):.2f}s, max {max(results):.2f}s "
+              f"over {len(results)}/{args.runs} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from metrics import EVENTS_PUBLISHED
+from subscriptions import EventAttributes, Subscription, SubscriptionIndex
+
+
+def format_frame(payload: str, event_id: Optional[str] = None) -> bytes:
+    """Frame an already serialized JSON payload as an SSE event"""
+    if event_id is None:
+        return f"data: {payload}\n\n".encode("utf-8")
+    return f"id: {event_id}\ndata: {payload}\n\n".encode("utf-8")
+
+
+def encode_event(data: Dict[str, Any], event_id: Optional[str] = None) -> bytes:
+    """Encode an event as an SSE frame"""
+    return format_frame(json.dumps(data), event_id)
+
+
+def parse_event_id(event_id: str) -> Tuple[int, int]:
+    """Parse a `<milliseconds>-<sequence>` event ID into a sortable tuple
+
+    Raises ValueError for IDs this server did not issue.
+    """
+    millis, _, seq = event_id.partition("-")
+    return int(millis), int(seq or 0)
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:  # Subscribed outside a running loop
+        return None
+
+
+class BroadcastEvent(NamedTuple):
+    """A published event, serialized once and shared by every transport"""
+    id: str
+    payload: str  # JSON text, as sent over WebSocket
+    frame: bytes  # SSE framing of the payload
+    attrs: Optional[EventAttributes]
+    offset: int  # Frame bytes published before this event, for pending-bytes accounting
+    transient: bool = False  # Live only, never replayed
+
+
+class SubscriberLagged(Exception):
+    """Raised when a subscriber's cursor has been overwritten by the ring"""
+
+    def __init__(self, missed: int):
+        super().__init__(f"Subscriber fell {missed} events behind")
+        self.missed = missed
+
+
+class Subscriber:
+    """A client reading the hub's ring buffer through its own cursor"""
+
+    def __init__(self, hub: "BroadcastHub", client_id: str):
+        self.hub = hub
+        self.id = client_id
+        self.cursor = hub.head
+        self.task: Optional[asyncio.Task] = _current_task()  # Handler serving this client
+        self.write_started: Optional[float] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of published events this subscriber has not read yet"""
+        return self.hub.head - self.cursor
+
+    @property
+    def pending_bytes(self) -> int:
+        """Size of the frames published but not yet read by this subscriber"""
+        hub = self.hub
+        if self.cursor >= hub.head:
+            return 0
+        oldest = max(hub.head - hub.capacity, self.cursor)
+        return hub.bytes_published - hub.event_at(oldest).offset
+
+    async def write(self, write: Awaitable[Any], timeout: float) -> None:
+        """Run one transport write bounded by timeout, visible to the reaper while it runs"""
+        self.write_started = time.monotonic()
+        try:
+            await asyncio.wait_for(write, timeout)
+        finally:
+            self.write_started = None
+
+    async def next_events(self) -> List[BroadcastEvent]:
+        """Wait for new events and return them
+
+        Returns an empty list once the hub is closed and everything has been read.
+        Raises SubscriberLagged (after moving the cursor to the head) when events
+        were overwritten before this subscriber read them.
+        """
+        hub = self.hub
+        while self.cursor == hub.head:
+            if hub.closed:
+                return []
+            await hub.wait_for_publish()
+        return self.poll_events()
+
+    async def next_frames(self) -> List[bytes]:
+        """Wait for new events and return their encoded SSE frames"""
+        return [event.frame for event in await self.next_events()]
+
+    def poll_events(self) -> List[BroadcastEvent]:
+        """Events published since the last read, without waiting"""
+        hub = self.hub
+        missed = hub.head - self.cursor - hub.capacity
+        if missed > 0:
+            self.cursor = hub.head
+            raise SubscriberLagged(missed)
+
+        events = hub.events_since(self.cursor)
+        self.cursor = hub.head
+        return events
+
+    def skip_through(self, event_id: str) -> None:
+        """Advance the cursor past ring events the client has already received"""
+        last = parse_event_id(event_id)
+        hub = self.hub
+        while self.cursor < hub.head and parse_event_id(hub.event_at(self.cursor).id) <= last:
+            self.cursor += 1
+
+
+class FilteredSubscriber(Subscriber):
+    """A subscriber with a server-side filter
+
+    Instead of scanning the shared ring, it is handed references to the
+    events it matched at publish time, so it only wakes for its own events.
+    """
+
+    def __init__(self, hub: "BroadcastHub", client_id: str, subscription: Subscription):
+        super().__init__(hub, client_id)
+        self.subscription = subscription
+        self._events: Deque[BroadcastEvent] = deque()
+        self._ready = asyncio.Event()
+        self._missed = 0
+        self._pending_bytes = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._events)
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    def deliver(self, event: BroadcastEvent) -> None:
+        if len(self._events) >= self.hub.capacity:
+            # As far behind as an unfiltered client overwritten by the ring
+            self._missed += len(self._events) + 1
+            self._events.clear()
+            self._pending_bytes = 0
+        else:
+            self._events.append(event)
+            self._pending_bytes += len(event.frame)
+        self._ready.set()
+
+    def wake(self) -> None:
+        self._ready.set()
+
+    async def next_events(self) -> List[BroadcastEvent]:
+        while not self._events and not self._missed:
+            if self.hub.closed:
+                return []
+            self._ready.clear()
+            await self._ready.wait()
+        return self.poll_events()
+
+    def poll_events(self) -> List[BroadcastEvent]:
+        if self._missed:
+            missed, self._missed = self._missed, 0
+            self._events.clear()
+            self._pending_bytes = 0
+            raise SubscriberLagged(missed)
+
+        events = list(self._events)
+        self._events.clear()
+        self._pending_bytes = 0
+        return events
+
+    def skip_through(self, event_id: str) -> None:
+        last = parse_event_id(event_id)
+        while self._events and parse_event_id(self._events[0].id) <= last:
+            self._pending_bytes -= len(self._events.popleft().frame)
+
+
+class BroadcastHub:
+    """Fan-out of server events to streaming clients
+
+    Each event is encoded once into a fixed-size ring buffer; subscribers read
+    it through a cursor, so publishing costs one encode regardless of how many
+    clients are connected and a slow client can never grow memory unbounded.
+    Every event carries a monotonic `<milliseconds>-<sequence>` ID so that
+    reconnecting clients can resume from their `Last-Event-ID`. Clients with a
+    server-side filter are found through a SubscriptionIndex and handed the
+    events they match directly.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.head = 0  # Sequence number of the next event to publish
+        self.closed = False
+        self.last_event_id: Optional[str] = None
+        self.bytes_published = 0
+        self._ring: List[Optional[BroadcastEvent]] = [None] * capacity
+        self._subscribers: Dict[str, Subscriber] = {}
+        self._filtered: Dict[str, FilteredSubscriber] = {}
+        self.subscriptions = SubscriptionIndex()
+        self._published = asyncio.Event()
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, client_id: str, subscription: Optional[Subscription] = None) -> Subscriber:
+        if subscription is None or subscription.is_empty:
+            subscriber = Subscriber(self, client_id)
+        else:
+            subscriber = FilteredSubscriber(self, client_id, subscription)
+            self._filtered[client_id] = subscriber
+            self.subscriptions.add(client_id, subscription)
+        self._subscribers[client_id] = subscriber
+        return subscriber
+
+    def subscribers(self) -> List[Subscriber]:
+        return list(self._subscribers.values())
+
+    def unsubscribe(self, client_id: str) -> None:
+        self._subscribers.pop(client_id, None)
+        if self._filtered.pop(client_id, None) is not None:
+            self.subscriptions.remove(client_id)
+
+    def publish(
+        self,
+        payload: str,
+        event_id: Optional[str] = None,
+        attrs: Optional[EventAttributes] = None,
+        transient: bool = False
+    ) -> str:
+        """Frame a serialized event once, append it to the ring and wake subscribers
+
+        IDs issued elsewhere (e.g. by the Redis event history) must be
+        increasing; without one the hub issues the next ID itself. Events
+        without attributes reach every client, filtered or not. Transient
+        events (e.g. analysis deltas) are framed without an ID and are not
+        replayed to reconnecting clients: they share the ID of the event
+        before them, so clients resume from that event.
+        """
+        if transient:
+            event_id = self.last_event_id or "0-0"
+            frame = format_frame(payload)
+        else:
+            if event_id is None:
+                event_id = self._next_event_id()
+            frame = format_frame(payload, event_id)
+            self.last_event_id = event_id
+        event = BroadcastEvent(event_id, payload, frame, attrs, self.bytes_published, transient)
+        self._ring[self.head % self.capacity] = event
+        self.head += 1
+        self.bytes_published += len(frame)
+        EVENTS_PUBLISHED.inc()
+        self._wake()
+        if self._filtered:
+            for client_id in self.subscriptions.match(attrs):
+                self._filtered[client_id].deliver(event)
+        logger.debug(f"Published event {event_id} ({len(event.frame)} bytes) to {len(self._subscribers)} clients")
+        return event_id
+
+    def events_since(self, cursor: int) -> List[BroadcastEvent]:
+        """Events from cursor up to the head (cursor must still be in the ring)"""
+        return [self._ring[seq % self.capacity] for seq in range(cursor, self.head)]
+
+    def event_at(self, seq: int) -> BroadcastEvent:
+        return self._ring[seq % self.capacity]
+
+    def replay_after(self, event_id: str, subscription: Optional[Subscription] = None) -> Optional[List[bytes]]:
+        """Frames published after event_id, or None if the ring no longer covers it
+
+        Transient events are left out: they are only of use live.
+        """
+        oldest = max(self.head - self.capacity, 0)
+        if oldest == self.head:
+            return None
+
+        last = parse_event_id(event_id)
+        if last < parse_event_id(self.event_at(oldest).id):
+            return None
+
+        cursor = self.head
+        while cursor > oldest and parse_event_id(self.event_at(cursor - 1).id) > last:
+            cursor -= 1
+        return [
+            event.frame for event in self.events_since(cursor)
+            if not event.transient and (subscription is None or subscription.matches(event.attrs))
+        ]
+
+    def _next_event_id(self) -> str:
+        millis = int(time.time() * 1000)
+        if self.last_event_id is not None:
+            last_millis, last_seq = parse_event_id(self.last_event_id)
+            if millis <= last_millis:
+                return f"{last_millis}-{last_seq + 1}"
+        return f"{millis}-0"
+
+    async def wait_for_publish(self) -> None:
+        await self._published.wait()
+
+    def stale_subscribers(self, max_pending_bytes: int, write_timeout: float) -> List[Subscriber]:
+        """Subscribers that stopped reading or are stuck in a write"""
+        now = time.monotonic()
+        return [
+            subscriber for subscriber in self._subscribers.values()
+            if subscriber.pending_bytes > max_pending_bytes
+            or (subscriber.write_started is not None and now - subscriber.write_started > write_timeout)
+        ]
+
+    async def reap(self, interval: float, max_pending_bytes: int, write_timeout: float) -> None:
+        """Periodically disconnect dead or stalled clients by cancelling their handlers"""
+        while True:
+            await asyncio.sleep(interval)
+            for subscriber in self.stale_subscribers(max_pending_bytes, write_timeout):
+                logger.warning(
+                    f"Reaping client {subscriber.id} - {subscriber.pending_bytes} bytes pending, "
+                    f"writing: {subscriber.write_started is not None}"
+                )
+                self.unsubscribe(subscriber.id)
+                if subscriber.task is not None:
+                    subscriber.task.cancel()
+
+    def close(self) -> None:
+        """Stop the hub; subscribers drain what is left and then get no more frames"""
+        self.closed = True
+        self._wake()
+        for subscriber in self._filtered.values():
+            subscriber.wake()
+
+    async def drain(self, timeout: float) -> None:
+        """After close(), wait for client handlers to finish and cancel the ones that do not"""
+        tasks = [s.task for s in self._subscribers.values() if s.task is not None and not s.task.done()]
+        if not tasks:
+            return
+        _, stuck = await asyncio.wait(tasks, timeout=timeout)
+        for task in stuck:
+            task.cancel()
+        logger.info(f"Drained {len(tasks) - len(stuck)} clients, cancelled {len(stuck)}")
+
+    def _wake(self) -> None:
+        # Swap in a fresh event so waiters registered from now on block again
+        published, self._published = self._published, asyncio.Event()
+        published.set()
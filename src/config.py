@@ -2,31 +2,17 @@ import os
 from loguru import logger
 from typing import List
 
-# Print current working directory for debugging
-logger.info(f"Current working directory: {os.getcwd()}")
-
-# Log environment variables before loading .env
-logger.info("Environment variables before loading .env:")
-logger.info(f"REDIS_PORT (from env): {os.getenv('REDIS_PORT', '6379')}")
-
-# Load environment variables from .env file
+# Load environment variables from the .env file; variables already set in the
+# environment (e.g. by the deployment) take precedence over it
 env_path = os.path.join(os.getcwd(), ".env")
-logger.info(f"Looking for .env file at: {env_path}")
+logger.debug(f"Looking for .env file at: {env_path}")
 
 if os.path.exists(env_path):
-    # Clear existing environment variables
-    if 'REDIS_PORT' in os.environ:
-        logger.warning(f"Clearing existing REDIS_PORT from environment: {os.environ['REDIS_PORT']}")
-        del os.environ['REDIS_PORT']
-    
     with open(env_path) as f:
         for line in f:
-            if line.strip() and not line.startswith('#'):
+            if line.strip() and not line.startswith('#') and '=' in line:
                 key, value = line.strip().split('=', 1)
-                os.environ[key] = value
-
-# Log environment variables after loading .env
-logger.info(f"Environment REDIS_PORT after loading .env: {os.getenv('REDIS_PORT', '6379')}")
+                os.environ.setdefault(key.strip(), value.strip())
 
 # Redis Configuration
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
@@ -90,6 +76,103 @@ MAX_RETRY_DELAY = 300  # seconds
 # Buffer Configuration
 ARTICLES_BUFFER_SIZE = int(os.getenv('ARTICLES_BUFFER_SIZE', '15'))  # Reduce buffer size
 
+# Number of encoded SSE events kept for fan-out; clients further behind are resynced
+BROADCAST_RING_SIZE = int(os.getenv('BROADCAST_RING_SIZE', '256'))
+
+# Events kept in Redis for Last-Event-ID resume, and the largest gap replayed
+# before a reconnecting client gets a full snapshot instead
+EVENT_HISTORY_SIZE = int(os.getenv('EVENT_HISTORY_SIZE', '1000'))
+EVENT_REPLAY_LIMIT = int(os.getenv('EVENT_REPLAY_LIMIT', '500'))
+
+# WebSocket delivery: events arriving within the window of a busy stream are
+# coalesced into one batched frame (up to WS_MAX_BATCH events)
+WS_COALESCE_WINDOW_MS = int(os.getenv('WS_COALESCE_WINDOW_MS', '50'))
+WS_MAX_BATCH = int(os.getenv('WS_MAX_BATCH', '100'))
+
+# Multi-worker mode: the feed-polling leader's Redis lease; a crashed leader is
+# replaced within one lease
+LEADER_LEASE_MS = int(os.getenv('LEADER_LEASE_MS', '10000'))
+
+# Analysis pipeline: articles are analyzed off the ingestion path by a pool of
+# workers draining a Redis queue; each call is bounded by the timeout and failed
+# analyses are retried up to the attempt limit
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '8'))
+ANALYSIS_TIMEOUT = float(os.getenv('ANALYSIS_TIMEOUT', '120'))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_MAX_ATTEMPTS', '3'))
+
+def _parse_mapping(value: str) -> dict:
+    """Parse "key=number,key=number" settings into a dict with lower-case keys"""
+    mapping = {}
+    for entry in value.split(','):
+        key, _, number = entry.partition('=')
+        if key.strip() and number.strip():
+            mapping[key.strip().lower()] = float(number)
+    return mapping
+
+# Analysis scheduling: newest articles are analyzed first, and a source,
+# category or asset listed in ANALYSIS_PRIORITIES counts as that many seconds
+# newer (e.g. "coindesk.com=600,btc=300"). Articles published more than
+# ANALYSIS_DEADLINE seconds ago are dropped or downgraded (analyzed only when
+# nothing fresher waits); 0 disables the deadline. At most ANALYSIS_MAX_BACKLOG
+# articles wait, the lowest ranked being shed beyond that.
+ANALYSIS_PRIORITIES = _parse_mapping(os.getenv('ANALYSIS_PRIORITIES', ''))
+ANALYSIS_DEADLINE = float(os.getenv('ANALYSIS_DEADLINE', str(6 * 3600)))
+ANALYSIS_DEADLINE_ACTION = os.getenv('ANALYSIS_DEADLINE_ACTION', 'downgrade')
+ANALYSIS_MAX_BACKLOG = int(os.getenv('ANALYSIS_MAX_BACKLOG', '1000'))
+
+# Per-backend limits, as "backend=number" lists: concurrent analyses (default
+# ANALYSIS_WORKERS), cost per analysis (default 1) and cost allowed per hour
+# (default unlimited), e.g. ANALYZER_HOURLY_BUDGET="modal=500". With several
+# backends, each routed backend gets its own limits; "router" sets the workers
+ANALYZER_CONCURRENCY = _parse_mapping(os.getenv('ANALYZER_CONCURRENCY', ''))
+ANALYZER_COST = _parse_mapping(os.getenv('ANALYZER_COST', ''))
+ANALYZER_HOURLY_BUDGET = _parse_mapping(os.getenv('ANALYZER_HOURLY_BUDGET', ''))
+
+# Asset tagging: JSON file mapping tickers to names (e.g. {"BTC": ["bitcoin"]}),
+# reloaded when it changes; the built-in dictionary is used without one
+ASSET_DICTIONARY_PATH = os.getenv('ASSET_DICTIONARY_PATH', '')
+
+# Relevance triage: new articles are scored by a cheap local model and only
+# those scoring at least their topic's threshold are analyzed, e.g.
+# TRIAGE_THRESHOLDS="crypto=0.3,default=0.5". TRIAGE_MODEL_PATH points at a
+# model trained with `python triage.py train`; without one, keyword weights
+# are used.
+TRIAGE_ENABLED = os.getenv('TRIAGE_ENABLED', 'true').lower() == 'true'
+TRIAGE_THRESHOLDS = _parse_mapping(os.getenv('TRIAGE_THRESHOLDS', 'crypto=0.3,cdd=0.6,freelancing=0.6,default=0.5'))
+TRIAGE_MODEL_PATH = os.getenv('TRIAGE_MODEL_PATH', '')
+
+# Local NLP labels: when enabled, every new article gets a summary and a
+# sentiment from two small CPU models, run in batches of up to NLP_BATCH_SIZE
+# on NLP_THREADS threads (at least two)
+NLP_ENGINE_ENABLED = os.getenv('NLP_ENGINE_ENABLED', 'false').lower() == 'true'
+NLP_SUMMARY_MODEL = os.getenv('NLP_SUMMARY_MODEL', 'mrm8488/t5-base-finetuned-summarize-news')
+NLP_SENTIMENT_MODEL = os.getenv('NLP_SENTIMENT_MODEL', 'mrm8488/deberta-v3-ft-financial-news-sentiment-analysis')
+NLP_BATCH_SIZE = int(os.getenv('NLP_BATCH_SIZE', '16'))
+NLP_BATCH_WINDOW_MS = float(os.getenv('NLP_BATCH_WINDOW_MS', '500'))
+NLP_THREADS = int(os.getenv('NLP_THREADS', '2'))
+
+# Concurrent analyses are sent to the backend in batches of up to
+# ANALYSIS_BATCH_SIZE, waiting at most the window for a batch to fill; a batch
+# size of 1 disables batching. Batches can only be as large as ANALYSIS_WORKERS.
+ANALYSIS_BATCH_SIZE = int(os.getenv('ANALYSIS_BATCH_SIZE', '8'))
+ANALYSIS_BATCH_WINDOW_MS = float(os.getenv('ANALYSIS_BATCH_WINDOW_MS', '200'))
+
+# Backends that can stream (vllm, kaggle, stub) send the analysis text to
+# clients as `analysis_delta` events while it is generated, at most one per
+# article per delta interval, instead of batching; the `analysis` event with
+# the full result follows as before
+ANALYSIS_STREAMING = os.getenv('ANALYSIS_STREAMING', 'true').lower() == 'true'
+ANALYSIS_DELTA_INTERVAL_MS = float(os.getenv('ANALYSIS_DELTA_INTERVAL_MS', '250'))
+
+# Client connection lifecycle: idle streams get a heartbeat comment so proxies keep
+# them open and dead peers surface as failed writes; a write that does not finish
+# within the timeout, or a client with more unread bytes than the cap, is dropped
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', '15'))
+CLIENT_WRITE_TIMEOUT = float(os.getenv('CLIENT_WRITE_TIMEOUT', '10'))
+CLIENT_MAX_PENDING_BYTES = int(os.getenv('CLIENT_MAX_PENDING_BYTES', str(1024 * 1024)))
+CLIENT_REAP_INTERVAL = float(os.getenv('CLIENT_REAP_INTERVAL', '5'))
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', '5'))
+
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_RETENTION = "1 day"  # Limit log file retention
@@ -106,14 +189,66 @@ def is_cloudflare_feed(feed_url: str) -> bool:
     """Check if a feed URL is from a Cloudflare-protected domain"""
     return any(domain in feed_url for domain in CLOUDFLARE_PROTECTED_DOMAINS)
 
+def feed_topic(feed_url: str) -> str:
+    """The topic set a feed belongs to, for per-topic triage thresholds"""
+    for topic, feeds in (('crypto', Crypto), ('cdd', CDD), ('freelancing', Freelancing), ('biltp2p', BiltP2P)):
+        if feed_url in feeds:
+            return topic
+    return 'default'
+
+LOGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+_logging_configured = False
+
+def configure_logging() -> None:
+    """Add the rotating log file sink; safe to call more than once per process"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    logger.add(
+        os.path.join(LOGS_DIR, "feed_poller_{time}.log"),
+        rotation="24h",
+        retention=LOG_RETENTION,
+        level=LOG_LEVEL
+    )
+    _logging_configured = True
+
 # Log configured values
-logger.info(f"Configured REDIS_PORT: {REDIS_PORT}") 
+logger.debug(f"Configured REDIS_PORT: {REDIS_PORT}")
+
+# Analyzer backend: modal, vllm (OpenAI-compatible server), kaggle (the
+# kaggle/model_server.ipynb server) or stub (local, deterministic). A list
+# (e.g. "modal,vllm") routes each analysis to the backend answering fastest
+ANALYZER_BACKEND = os.getenv('ANALYZER_BACKEND', 'modal')
+
+# Routing across several backends: a call not answered within this latency
+# quantile of its backend (or ANALYZER_HEDGE_DELAY_MS before there is enough
+# history) is also sent to the next best backend, while at most
+# ANALYZER_MAX_HEDGE_RATIO of recent calls were hedged
+ANALYZER_HEDGE_QUANTILE = float(os.getenv('ANALYZER_HEDGE_QUANTILE', '0.95'))
+ANALYZER_HEDGE_DELAY_MS = float(os.getenv('ANALYZER_HEDGE_DELAY_MS', '30000'))
+ANALYZER_MAX_HEDGE_RATIO = float(os.getenv('ANALYZER_MAX_HEDGE_RATIO', '0.1'))
 
-# Add these lines to config.py
 VLLM_HOST = os.getenv('VLLM_HOST', 'http://localhost:8000')
+VLLM_MODEL = os.getenv('VLLM_MODEL', 'cxllin/Llama2-7b-Finance')
 VLLM_MAX_TOKENS = int(os.getenv('VLLM_MAX_TOKENS', '512'))
 VLLM_TEMPERATURE = float(os.getenv('VLLM_TEMPERATURE', '0.5')) 
 
+KAGGLE_SERVER_URL = os.getenv('KAGGLE_SERVER_URL', 'http://localhost:8000')
+
+# Models served by the Modal app and the Kaggle server; they identify cached
+# analyses, so set them to match the deployed model
+MODAL_MODEL_NAME = os.getenv('MODAL_MODEL_NAME', 'curiousily/Llama-3-8B-Instruct-Finance-RAG')
+KAGGLE_MODEL = os.getenv('KAGGLE_MODEL', 'cxllin/Llama2-7b-Finance')
+
+# Analyses are cached by article content, model and prompt version; an entry
+# expires this many seconds after it was last used (0 disables the cache)
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', str(7 * 86400)))
+
+# Stub backend latency per analysis, plus up to the jitter (deterministic per article)
+STUB_LATENCY_MS = float(os.getenv('STUB_LATENCY_MS', '50'))
+STUB_LATENCY_JITTER_MS = float(os.getenv('STUB_LATENCY_JITTER_MS', '0'))
+
 # Resource optimization settings
 MAX_CONCURRENT_FEEDS = int(os.getenv('MAX_CONCURRENT_FEEDS', '3'))  # Limit concurrent processing 
 
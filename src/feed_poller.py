@@ -1,9 +1,8 @@
 import asyncio
 import aiohttp
-import feedparser
 import json
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from loguru import logger
 from typing import Dict, Any, List, Optional
 import os
@@ -17,19 +16,46 @@ from config import (
     POLLING_INTERVAL,
     INITIAL_RETRY_DELAY,
     MAX_RETRY_DELAY,
-    LOG_LEVEL,
     ARTICLES_BUFFER_SIZE,
     CLOUDFLARE_POLLING_INTERVAL,
     is_cloudflare_feed,
-    VLLM_HOST
+    feed_topic,
+    configure_logging,
+    ANALYSIS_WORKERS,
+    ANALYSIS_TIMEOUT,
+    ANALYSIS_MAX_ATTEMPTS,
+    ANALYSIS_CACHE_TTL,
+    ANALYSIS_PRIORITIES,
+    ANALYSIS_DEADLINE,
+    ANALYSIS_DEADLINE_ACTION,
+    ANALYSIS_MAX_BACKLOG,
+    ANALYZER_CONCURRENCY,
+    ANALYZER_COST,
+    ANALYZER_HOURLY_BUDGET,
+    TRIAGE_ENABLED,
+    TRIAGE_THRESHOLDS,
+    TRIAGE_MODEL_PATH,
+    ASSET_DICTIONARY_PATH,
+    NLP_ENGINE_ENABLED,
+    NLP_BATCH_SIZE
 )
 from redis_client import RedisClient
+from analysis_cache import AnalysisCache
+from assets import AssetTagger
+from analysis_queue import AnalysisBudget, AnalysisQueue, AnalysisWorkerPool
+from analyzer_backends import RouterBackend
 from article_analyzer import ArticleAnalyzer
 from memory_monitor import MemoryMonitor
+from nlp_engine import NLPEngine
+from triage import Triage, load_model
+from metrics import (
+    ANALYZER_IN_FLIGHT, ANALYZER_SECONDS, ARTICLES_SEEN, FEED_FETCHES, FEED_FETCH_SECONDS, FEED_PARSE_SECONDS
+)
 
 class FeedPoller:
     def __init__(self, send_to_clients):
         self.send_to_clients = send_to_clients
+        self.buffer_version = 0  # Bumped on every buffer change to invalidate cached responses
         self.article_buffer = []
         self.is_ready = False
         self.redis_client = None  # Will be initialized in setup
@@ -39,32 +65,50 @@ class FeedPoller:
         self.cleanup_interval = 300  # Clean old articles every 5 minutes
         self.last_cleanup = time.time()
         
-        # Create logs directory
-        logs_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-        os.makedirs(logs_dir, exist_ok=True)
-        
-        logger.add(
-            os.path.join(logs_dir, "feed_poller_{time}.log"),
-            rotation="24h",
-            level=LOG_LEVEL
-        )
-        
         logger.info(f"Feed Poller initialized with {len(self.feed_urls)} feeds")
 
-        self.analyzer = ArticleAnalyzer(VLLM_HOST)
-        logger.info(f"Article analyzer initialized with vLLM at {VLLM_HOST}")
+        # Connects lazily; poll_feeds starts connecting it in the background
+        self.analyzer = ArticleAnalyzer()
+        self.asset_tagger = AssetTagger(path=ASSET_DICTIONARY_PATH)
+        self.triage = Triage(load_model(TRIAGE_MODEL_PATH), TRIAGE_THRESHOLDS) if TRIAGE_ENABLED else None
 
         self.memory_monitor = MemoryMonitor()
 
+        # Local summary and sentiment of every new article, off the ingestion path
+        self.nlp_engine = NLPEngine() if NLP_ENGINE_ENABLED else None
+        self.to_label: asyncio.Queue = asyncio.Queue(maxsize=NLP_BATCH_SIZE * 16)
+
+    @property
+    def article_buffer(self) -> List[Dict[str, Any]]:
+        return self._article_buffer
+
+    @article_buffer.setter
+    def article_buffer(self, articles: List[Dict[str, Any]]) -> None:
+        self._article_buffer = articles
+        self.buffer_version += 1
+
     async def setup(self):
         """Async initialization"""
         self.redis_client = RedisClient()
         await self.redis_client.setup()
+        self.analysis_queue = AnalysisQueue(
+            self.redis_client.redis,
+            priorities=ANALYSIS_PRIORITIES,
+            deadline=ANALYSIS_DEADLINE,
+            deadline_action=ANALYSIS_DEADLINE_ACTION,
+            max_backlog=ANALYSIS_MAX_BACKLOG
+        )
+        if ANALYSIS_CACHE_TTL > 0:
+            self.analyzer.cache = AnalysisCache(
+                self.redis_client.redis, self.analyzer.backend.model_id, ANALYSIS_CACHE_TTL
+            )
         
         # Initialize buffer from Redis
         if os.getenv('REDIS_CLEAR_ON_START', '').lower() == 'true':
             logger.info("Clearing Redis cache on startup...")
             await self.redis_client.clear_cache()
+            self.article_buffer = []
+            self.is_ready = True
         else:
             # Load existing articles from Redis
             await self.initialize_buffer()
@@ -72,20 +116,26 @@ class FeedPoller:
         logger.info("Feed Poller setup completed")
 
     async def fetch_feed(self, session: aiohttp.ClientSession, feed_url: str, retry_count: int = 0) -> Optional[Dict]:
-        """Fetch a feed with exponential backoff retry logic"""
+        """Fetch and parse a feed with exponential backoff retry logic"""
         MAX_RETRIES = 3
         BASE_DELAY = 90  # Base delay in seconds
         
+        host = feed_url.split('/')[2]
         try:
             # Add brotli support to the session
+            started = time.perf_counter()
             async with session.get(feed_url, headers={'Accept-Encoding': 'gzip, deflate, br'}) as response:
+                content = await response.text()
+                FEED_FETCH_SECONDS.observe(time.perf_counter() - started, host=host)
+                FEED_FETCHES.inc(host=host, status=str(response.status))
                 if response.status == 200:
-                    content = await response.text()
-                    feed = feedparser.parse(content)
-                    return self.process_feed(feed, feed_url)
+                    import feedparser  # Only the polling worker parses feeds
+                    with FEED_PARSE_SECONDS.time(host=host):
+                        return feedparser.parse(content)
                 else:
-                    logger.error(f"❌ Error fetching {feed_url}: {response.status}, {await response.text()}")
+                    logger.error(f"❌ Error fetching {feed_url}: {response.status}, {content}")
         except Exception as e:
+            FEED_FETCHES.inc(host=host, status="error")
             logger.error(f"❌ Error fetching {feed_url}: {str(e)}")
         
         # Handle retry logic
@@ -100,22 +150,18 @@ class FeedPoller:
             return None
 
     async def initialize_buffer(self):
-        """Initialize article buffer from Redis"""
-        print("\n📦 Initializing article buffer from Redis...")
+        """Initialize article buffer from Redis
+
+        The service is ready as soon as this snapshot is loaded, even when it
+        is empty; articles from the first poll arrive as stream events.
+        """
         try:
-            # Get existing articles from Redis
             existing_articles = await self.redis_client.get_recent_articles(ARTICLES_BUFFER_SIZE)
-            if existing_articles:
-                print(f"📦 Found latest article in Redis")
-                self.article_buffer = existing_articles
-                self.is_ready = True
-                print(f"✅ Buffer initialized with latest article from Redis")
-                return
-            else:
-                print("📭 No existing articles found in Redis")
-                self.article_buffer = []
+            self.article_buffer = existing_articles[:self.max_buffer_size]
+            self.is_ready = True
+            logger.info(f"Article buffer initialized with {len(self.article_buffer)} articles from Redis")
         except Exception as e:
-            print(f"❌ Error initializing buffer: {str(e)}")
+            logger.error(f"Error initializing article buffer: {str(e)}")
             self.article_buffer = []
 
     def _parse_date(self, entry: Dict[str, Any]) -> str:
@@ -132,7 +178,7 @@ class FeedPoller:
                     # Ensure timezone info is preserved
                     if parsed_date.tzinfo is None:
                         # If no timezone info, assume UTC
-                        parsed_date = parsed_date.replace(tzinfo=datetime.timezone.utc)
+                        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
                     # Format with timezone info
                     return parsed_date.isoformat()
                 except Exception as e:
@@ -146,7 +192,7 @@ class FeedPoller:
                         continue
         
         # If no valid date found, use current time in UTC
-        current_time = datetime.now(datetime.timezone.utc)
+        current_time = datetime.now(timezone.utc)
         logger.warning(f"No valid date found in entry, using current UTC time: {current_time.isoformat()}")
         return current_time.isoformat()
 
@@ -197,14 +243,21 @@ class FeedPoller:
         if not feed_data or not feed_data.entries:
             return
 
+        if self.asset_tagger.path:
+            self.asset_tagger.reload()
+
         # Process only the most recent entries
+        topic = feed_topic(feed_url)
         new_articles = []
+        to_analyze = set()
         for entry in feed_data.entries[:3]:  # Limit to 3 most recent entries
             article_link = entry.link
             
             # Skip if article exists
             if await self.redis_client.is_article_exists(article_link):
+                ARTICLES_SEEN.inc(result="duplicate")
                 continue
+            ARTICLES_SEEN.inc(result="new")
 
             # Create article data without analysis
             article = {
@@ -222,42 +275,152 @@ class FeedPoller:
             if hasattr(entry, 'tags'):
                 article["categories"] = self._extract_categories(entry)
 
-            # Get analysis separately
-            analysis = await self.analyzer.analyze_article(article)
-            
-            # Store article and analysis separately in Redis
+            article["assets"] = self.asset_tagger.tag(article)
+
+            # Only articles relevant enough are worth an LLM analysis
+            if self.triage:
+                score, relevant = self.triage.evaluate(article, topic)
+                article["triage_score"] = round(score, 3)
+            else:
+                relevant = True
+            if relevant:
+                to_analyze.add(article["id"])
+
+            # Store the article now; its analysis follows from the analysis queue
             await self.redis_client.save_article(article_link, {
                 "article": article,
-                "analysis": analysis
+                "analysis": None
             })
 
             # Keep only article data in buffer
             new_articles.append(article)
 
         if new_articles:
-            # Update buffer with memory constraints
-            self.article_buffer.extend(new_articles)
-            self.article_buffer.sort(
-                key=lambda x: datetime.fromisoformat(x["timestamp"]), 
-                reverse=True
-            )
-            self.article_buffer = self.article_buffer[:self.max_buffer_size]
+            self.add_articles(new_articles)
             
-            # Notify clients with separate article and analysis data
             for article in new_articles:
                 await self.send_to_clients({
                     "type": "article",
                     "data": article
                 })
-                
-                # Send analysis separately if available
-                analysis = await self.redis_client.get_analysis(article["id"])
-                if analysis:
+                if article["id"] in to_analyze:
+                    await self.analysis_queue.enqueue(article)
+                if self.nlp_engine is not None:
+                    try:
+                        self.to_label.put_nowait(article)
+                    except asyncio.QueueFull:
+                        logger.warning(f"Labeling backlog full, article {article['id']} left unlabeled")
+
+    async def run(self) -> None:
+        """Poll feeds and analyze new articles (the leader's work)"""
+        backend = self.analyzer.backend.name
+        budget = None
+        if not isinstance(self.analyzer.backend, RouterBackend):
+            # A router applies the limits of each backend it routes to itself
+            budget = AnalysisBudget(backend, ANALYZER_HOURLY_BUDGET.get(backend, 0), ANALYZER_COST.get(backend, 1))
+        workers = AnalysisWorkerPool(
+            self.analysis_queue,
+            self.analyze,
+            self.publish_analysis,
+            concurrency=int(ANALYZER_CONCURRENCY.get(backend, ANALYSIS_WORKERS)),
+            timeout=ANALYSIS_TIMEOUT,
+            max_attempts=ANALYSIS_MAX_ATTEMPTS,
+            budget=budget
+        )
+        tasks = [self.poll_feeds(), workers.run()]
+        if self.nlp_engine is not None:
+            tasks.append(self.label_articles())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await self.analyzer.close()
+            if self.nlp_engine is not None:
+                self.nlp_engine.close()
+
+    async def label_articles(self) -> None:
+        """Label queued articles with the local models, a batch at a time, then store and send the labels"""
+        while True:
+            articles = [await self.to_label.get()]
+            while not self.to_label.empty() and len(articles) < NLP_BATCH_SIZE:
+                articles.append(self.to_label.get_nowait())
+            try:
+                labels = await self.nlp_engine.label_many(articles)
+                await self.redis_client.save_labels(labels)
+                for article_id, article_labels in labels.items():
                     await self.send_to_clients({
-                        "type": "analysis",
-                        "articleId": article["id"],
-                        "data": analysis
+                        "type": "labels",
+                        "articleId": article_id,
+                        "data": article_labels
                     })
+            except Exception as e:
+                logger.error(f"Error storing labels of {len(articles)} articles: {str(e)}")
+
+    async def publish_analysis(self, article: Dict[str, Any], analysis: Dict[str, Any]) -> None:
+        """Store a finished analysis and send it to clients"""
+        await self.redis_client.save_analysis(article["id"], analysis)
+        await self.send_to_clients({
+            "type": "analysis",
+            "articleId": article["id"],
+            "data": analysis
+        })
+
+    async def _connect_analyzer(self) -> None:
+        try:
+            await self.analyzer.connect()
+        except Exception as e:
+            logger.error(f"Analyzer connection failed, retrying on first analysis: {str(e)}")
+
+    async def analyze(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Run the analyzer on an article, recording its latency"""
+        backend = self.analyzer.backend.name
+        ANALYZER_IN_FLIGHT.inc(backend=backend)
+        started = time.perf_counter()
+        analysis = None
+        try:
+            analysis = await self.analyzer.analyze_article(article, self._delta_publisher(article))
+            return analysis
+        finally:
+            ANALYZER_IN_FLIGHT.dec(backend=backend)
+            ANALYZER_SECONDS.observe(
+                time.perf_counter() - started, backend=backend,
+                outcome="error" if not analysis else "cached" if analysis.get("cached") else "ok"
+            )
+
+    def _delta_publisher(self, article: Dict[str, Any]):
+        """Callback sending pieces of an article's analysis to clients as they are generated
+
+        `offset` is where the text goes in the analysis; 0 starts it over (e.g.
+        on a retry). Failing to send a delta does not fail the analysis.
+        """
+        async def publish_delta(text: str, offset: int) -> None:
+            try:
+                await self.send_to_clients({
+                    "type": "analysis_delta",
+                    "articleId": article["id"],
+                    "data": {"text": text, "offset": offset}
+                })
+            except Exception as e:
+                logger.error(f"Error sending analysis delta for article {article['id']}: {str(e)}")
+
+        return publish_delta
+
+    def add_articles(self, articles: List[Dict[str, Any]]) -> None:
+        """Merge articles into the buffer (ignoring ones already buffered) with memory constraints"""
+        buffered_ids = {article["id"] for article in self.article_buffer}
+        fresh = [article for article in articles if article["id"] not in buffered_ids]
+        if not fresh:
+            return
+        
+        buffer = self.article_buffer + fresh
+        buffer.sort(
+            key=lambda x: datetime.fromisoformat(x["timestamp"]), 
+            reverse=True
+        )
+        self.article_buffer = buffer[:self.max_buffer_size]
+
+    def reset_buffer(self) -> None:
+        """Drop all buffered articles (after the cache was cleared)"""
+        self.article_buffer = []
 
     def _extract_image_url(self, entry: Dict[str, Any]) -> str:
         """Extract image URL from RSS entry"""
@@ -296,7 +459,7 @@ class FeedPoller:
     async def get_initial_articles(self) -> Dict[str, List[Dict[str, Any]]]:
         """Get the buffered articles"""
         if not self.is_ready:
-            print("⏳ Service not ready - still collecting initial articles")
+            logger.info("Service not ready - article buffer not loaded yet")
             return {"articles": [], "status": "initializing"}
             
         logger.info(f"Returning {len(self.article_buffer)} initial articles")
@@ -308,6 +471,8 @@ class FeedPoller:
     async def poll_feeds(self) -> None:
         """Poll RSS feeds at regular intervals with resource optimization"""
         logger.info(f"Starting optimized feed polling with {len(self.feed_urls)} feeds")
+        # Connect the analyzer while the first feeds are being fetched
+        self._analyzer_connecting = asyncio.create_task(self._connect_analyzer())
         
         async with aiohttp.ClientSession() as session:
             while True:
@@ -325,7 +490,7 @@ class FeedPoller:
                         
                         for feed_url in batch:
                             logger.debug(f"Processing feed: {feed_url}")
-                            task = asyncio.create_task(self.fetch_feed(session, feed_url))
+                            task = asyncio.create_task(self.process_feed(session, feed_url))
                             tasks.append(task)
                         
                         # Process batch results
@@ -360,6 +525,7 @@ class FeedPoller:
 
 def main():
     """Main entry point"""
+    configure_logging()
     poller = FeedPoller()
     
     try:
@@ -0,0 +1,16 @@
+# Multi-worker deployment: gunicorn -c src/gunicorn.conf.py
+# Every worker serves the HTTP API and streams; a Redis lease elects the one
+# worker that polls feeds (see leader.py).
+import multiprocessing
+import os
+
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "main:create_app()"
+worker_class = "aiohttp.GunicornWebWorker"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+
+# Give streaming clients time to receive the shutdown event and the leader
+# time to release its lease
+graceful_timeout = 15
+timeout = 60
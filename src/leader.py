@@ -0,0 +1,94 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+# Extend the lease only while we still own it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderElection:
+    """Redis-lease leader election between workers
+
+    The leader holds `key` with a TTL and renews it every third of the lease;
+    followers retry at the same pace, so a crashed leader is replaced within
+    one lease and a cleanly stopped one (which releases the key) within a
+    third of it.
+    """
+
+    def __init__(self, redis, key: str = "poller:leader", lease_ms: int = 10000, worker_id: Optional[str] = None):
+        self.redis = redis
+        self.key = key
+        self.lease_ms = lease_ms
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+
+    async def try_acquire(self) -> bool:
+        """Acquire or renew the lease; returns whether this worker is the leader"""
+        try:
+            if self.is_leader:
+                self.is_leader = bool(await self.redis.eval(_RENEW_SCRIPT, 1, self.key, self.worker_id, self.lease_ms))
+            else:
+                self.is_leader = bool(await self.redis.set(self.key, self.worker_id, nx=True, px=self.lease_ms))
+        except Exception as e:
+            # Without Redis we cannot prove we still hold the lease, so step down
+            logger.error(f"Leader election error: {str(e)}")
+            self.is_leader = False
+        return self.is_leader
+
+    async def release(self) -> None:
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, self.key, self.worker_id)
+        except Exception as e:
+            logger.error(f"Error releasing leader lease: {str(e)}")
+
+    async def run(self, lead: Callable[[], Awaitable[None]]) -> None:
+        """Run `lead()` for as long as this worker holds the lease"""
+        task: Optional[asyncio.Task] = None
+        interval = self.lease_ms / 3000
+        try:
+            while True:
+                if await self.try_acquire():
+                    if task is None:
+                        logger.info(f"Worker {self.worker_id} elected leader")
+                    elif task.done():
+                        logger.error(f"Leader task exited ({task.exception() if not task.cancelled() else 'cancelled'}), restarting")
+                    if task is None or task.done():
+                        task = asyncio.create_task(lead())
+                elif task is not None:
+                    logger.warning(f"Worker {self.worker_id} lost leadership, stopping leader task")
+                    await _cancel(task)
+                    task = None
+                await asyncio.sleep(interval)
+        finally:
+            if task is not None:
+                await _cancel(task)
+            await self.release()
+
+
+async def _cancel(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error(f"Leader task failed: {str(e)}")
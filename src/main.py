@@ -1,24 +1,45 @@
 from feed_poller import FeedPoller
 from loguru import logger
-from config import REDIS_HOST, REDIS_PORT, REDIS_DB, POLLING_INTERVAL, ARTICLES_BUFFER_SIZE
+from config import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB, POLLING_INTERVAL, ARTICLES_BUFFER_SIZE,
+    BROADCAST_RING_SIZE, EVENT_REPLAY_LIMIT, WS_COALESCE_WINDOW_MS, WS_MAX_BATCH,
+    LEADER_LEASE_MS, SSE_HEARTBEAT_INTERVAL, CLIENT_WRITE_TIMEOUT, CLIENT_MAX_PENDING_BYTES,
+    CLIENT_REAP_INTERVAL, SHUTDOWN_DRAIN_TIMEOUT, configure_logging
+)
+from broadcast import BroadcastHub, SubscriberLagged, encode_event, format_frame, parse_event_id
+from subscriptions import EventAttributes, Subscription
+from snapshot import ResponseSnapshot, SnapshotCache
+from redis_client import encode_cursor, decode_cursor
+from leader import LeaderElection
+from metrics import REGISTRY, FANOUT_LAG_SECONDS, gauge, monitor_event_loop
 from aiohttp import web
 from aiohttp.web import middleware
 import asyncio
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import uuid
-from dataclasses import dataclass
-from asyncio import Queue
 from datetime import datetime
 import time
 
-@dataclass(frozen=True)  # Makes the class hashable
-class Client:
-    id: str
-    queue: Queue
+# Query parameters that route /articles through the Redis secondary indexes,
+# and the largest page any /articles query returns
+ARTICLE_FILTERS = ('source', 'category', 'asset', 'since')
+MAX_PAGE_SIZE = 100
+MAX_ANALYSIS_IDS = 200
 
-# Change from set to dict to store client objects
-connected_clients = {}  # Use dict instead of set
+# SSE comment line sent on idle streams
+HEARTBEAT_FRAME = b': ping\n\n'
+
+# Events streamed to clients as they happen but neither stored in the history
+# nor replayed: partial analysis text, superseded by the final `analysis` event
+TRANSIENT_EVENT_TYPES = ('analysis_delta',)
+
+# Gauges sampled from the live app state on every scrape
+STREAM_CLIENTS = gauge("stream_clients", "Connected SSE and WebSocket clients")
+CLIENT_PENDING_EVENTS_MAX = gauge("stream_client_pending_events_max", "Largest unread event backlog of any client")
+CLIENT_PENDING_BYTES_MAX = gauge("stream_client_pending_bytes_max", "Largest unread byte backlog of any client")
+ARTICLE_BUFFER_SIZE = gauge("article_buffer_size", "Articles held in the in-memory buffer")
+RESIDENT_MEMORY = gauge("process_resident_memory_bytes", "Resident memory size of this worker")
 
 @middleware
 async def cors_middleware(request, handler):
@@ -37,28 +58,172 @@ async def cors_middleware(request, handler):
     
     return response
 
-async def send_to_clients(data: Dict[str, Any]):
-    """Send data to all connected clients"""
-    disconnected = []
-    for client_id, client in connected_clients.items():
+def make_send_to_clients(app):
+    """Build the poller's broadcast callback for this app"""
+    async def send_to_clients(data: Dict[str, Any]):
+        """Send data to all connected clients, encoded once for the whole fan-out"""
+        hub = app['hub']
+        attrs = hub.subscriptions.attributes_for(data)
+        if data.get("type") in TRANSIENT_EVENT_TYPES:
+            payload = json.dumps({**data, "timestamp": datetime.utcnow().isoformat()})
+            published = await app['poller'].redis_client.publish_transient_event(
+                payload, attrs.to_json() if attrs is not None else None
+            )
+            if not published:
+                hub.publish(payload, attrs=attrs, transient=True)
+            return
+
+        payload = json.dumps({
+            **data,
+            "buffer_status": {
+                "required": ARTICLES_BUFFER_SIZE,
+                "current": len(app['poller'].article_buffer)
+            },
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        # The Redis history issues the event ID so clients can resume from it, and
+        # every worker's relay picks the event up from there for its own clients
+        event_id = await app['poller'].redis_client.append_event(
+            payload, attrs.to_json() if attrs is not None else None
+        )
+        if event_id is None:
+            # Redis unavailable: at least reach this worker's clients
+            hub.publish(payload, None, attrs)
+
+    return send_to_clients
+
+async def relay_events(app):
+    """Tail the shared event history and fan it out to this worker's clients
+
+    Also keeps this worker's article buffer in step with the leader's, so
+    every worker can serve /articles and /stream whether or not it polls.
+    """
+    poller = app['poller']
+    hub = app['hub']
+    last_id = None
+    
+    while True:
         try:
-            await client.queue.put(data)
+            if last_id is None:
+                # Start from the newest event, once Redis answers
+                last_id = await poller.redis_client.get_latest_event_id()
+            events = await poller.redis_client.read_events(last_id)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Error sending to client {client_id}: {str(e)}")
-            disconnected.append(client_id)
-    
-    # Clean up disconnected clients
-    for client_id in disconnected:
-        connected_clients.pop(client_id, None)
+            logger.error(f"Error reading event history: {str(e)}")
+            await asyncio.sleep(1)
+            continue
+        
+        for event_id, payload, attrs in events:
+            last_id = event_id
+            data = json.loads(payload)
+            if data.get("type") == "article":
+                poller.add_articles([data["data"]])
+            elif data.get("type") == "cache_cleared":
+                poller.reset_buffer()
+            hub.publish(payload, event_id, EventAttributes.from_json(attrs) if attrs else None)
+
+async def relay_transient_events(app):
+    """Fan transient events (analysis deltas) from any worker out to this worker's clients"""
+    hub = app['hub']
+    while True:
+        try:
+            async for payload, attrs in app['poller'].redis_client.transient_events():
+                hub.publish(payload, attrs=EventAttributes.from_json(attrs) if attrs else None, transient=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error relaying transient events: {str(e)}")
+            await asyncio.sleep(1)
+
+def _parse_since(value: str) -> float:
+    """Parse a `since` query value given as epoch seconds or an ISO timestamp"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+async def get_filtered_articles(request):
+    """Serve /articles filtered by source, category, asset and since from the Redis indexes"""
+    poller = request.app['poller']
+    query = request.query
+
+    try:
+        since = _parse_since(query['since']) if query.get('since') else None
+        limit = min(int(query.get('limit', ARTICLES_BUFFER_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return web.json_response({
+            "error": "Invalid 'since' or 'limit' parameter"
+        }, status=400)
+
+    articles = await poller.redis_client.query_articles(
+        source=query.get('source'),
+        category=query.get('category'),
+        asset=query.get('asset'),
+        since=since,
+        limit=max(limit, 1)
+    )
+
+    return web.json_response({
+        "articles": articles,
+        "status": "success",
+        "filters": {key: query[key] for key in ARTICLE_FILTERS if query.get(key)},
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+def _next_cursor(articles, limit: int) -> Optional[str]:
+    """Cursor for the page after `articles`, or None when this page is the last one"""
+    if not articles or len(articles) < limit:
+        return None
+    return encode_cursor(articles[-1])
+
+async def get_article_page(request):
+    """Serve /articles?before=<cursor>&limit= pages of the article history"""
+    poller = request.app['poller']
+    query = request.query
+
+    try:
+        limit = max(min(int(query.get('limit', ARTICLES_BUFFER_SIZE)), MAX_PAGE_SIZE), 1)
+        before = decode_cursor(query['before']) if query.get('before') else None
+    except ValueError:
+        return web.json_response({
+            "error": "Invalid 'before' or 'limit' parameter"
+        }, status=400)
+
+    buffered = poller.article_buffer
+    if before is None and len(buffered) >= limit:
+        # The hot first page comes straight from memory
+        articles = buffered[:limit]
+    else:
+        articles = await poller.redis_client.get_articles_page(before, limit)
+
+    return web.json_response({
+        "articles": articles,
+        "status": "success",
+        "next_cursor": _next_cursor(articles, limit),
+        "timestamp": datetime.utcnow().isoformat()
+    })
 
 async def get_articles(request):
     """Endpoint for initial articles fetch"""
+    if any(request.query.get(key) for key in ARTICLE_FILTERS):
+        return await get_filtered_articles(request)
+    if request.query.get('before') or request.query.get('limit'):
+        return await get_article_page(request)
+
+    # Served from a pre-encoded snapshot that is rebuilt only when the buffer changes
     poller = request.app['poller']
+    snapshot = await request.app['articles_snapshot'].get(
+        (poller.buffer_version, poller.is_ready),
+        lambda: build_articles_snapshot(poller)
+    )
+    return snapshot.response(request)
+
+async def build_articles_snapshot(poller) -> ResponseSnapshot:
+    """Encode the /articles response for the current article buffer"""
     response = await poller.get_initial_articles()
     
-    # Log the response format
-    logger.debug(f"Articles response: {json.dumps(response, indent=2)}")
-    
     if response.get("status") == "initializing":
         response_data = {
             "articles": [],
@@ -69,7 +234,7 @@ async def get_articles(request):
             "timestamp": datetime.utcnow().isoformat()
         }
         logger.info(f"Service initializing - Buffer: {len(poller.article_buffer)}/{ARTICLES_BUFFER_SIZE}")
-        return web.json_response(response_data, status=503)  # Service Unavailable
+        return ResponseSnapshot(response_data, status=503)  # Service Unavailable
     
     if len(response["articles"]) < ARTICLES_BUFFER_SIZE:
         response_data = {
@@ -78,18 +243,80 @@ async def get_articles(request):
             "message": f"Service has only {len(response['articles'])} of {ARTICLES_BUFFER_SIZE} required articles",
             "required": ARTICLES_BUFFER_SIZE,
             "current": len(response["articles"]),
+            "next_cursor": _next_cursor(response["articles"], 1),
             "timestamp": datetime.utcnow().isoformat()
         }
         logger.info(f"Partial content - Buffer: {len(response['articles'])}/{ARTICLES_BUFFER_SIZE}")
-        return web.json_response(response_data, status=206)  # Partial Content
+        return ResponseSnapshot(response_data, status=206)  # Partial Content
     
     response_data = {
         **response,
         "status": "success",
+        "next_cursor": _next_cursor(response["articles"], 1),
         "timestamp": datetime.utcnow().isoformat()
     }
-    logger.info(f"Full content served - Buffer: {len(response['articles'])}/{ARTICLES_BUFFER_SIZE}")
-    return web.json_response(response_data)
+    logger.info(f"Full content snapshot - Buffer: {len(response['articles'])}/{ARTICLES_BUFFER_SIZE}")
+    return ResponseSnapshot(response_data)
+
+async def initial_event(app, subscription: Optional[Subscription] = None) -> Dict[str, Any]:
+    """The buffered articles (those matching the client's filter) as the `initial` event"""
+    initial_articles = await app['poller'].get_initial_articles()
+    if subscription is not None and not subscription.is_empty:
+        initial_articles = {
+            **initial_articles,
+            "articles": [
+                article for article in initial_articles["articles"]
+                if subscription.matches(EventAttributes.from_article(article))
+            ]
+        }
+    
+    # Add buffer status and timestamp to the response
+    return {
+        **initial_articles,
+        "buffer_status": {
+            "required": ARTICLES_BUFFER_SIZE,
+            "current": len(initial_articles["articles"])
+        },
+        "timestamp": datetime.utcnow().isoformat(),
+        "type": "initial"
+    }
+
+async def initial_frame(app, subscription: Optional[Subscription] = None) -> bytes:
+    """Encode the `initial` event as an SSE frame
+
+    The snapshot carries the latest event ID so a reconnect resumes from it
+    instead of resyncing.
+    """
+    return encode_event(await initial_event(app, subscription), app['hub'].last_event_id)
+
+async def replay_frames(app, subscriber, last_event_id: str,
+                        subscription: Optional[Subscription] = None) -> Optional[List[bytes]]:
+    """Frames a reconnecting client missed, or None if it needs a full snapshot"""
+    try:
+        parse_event_id(last_event_id)
+    except ValueError:
+        logger.warning(f"Ignoring malformed Last-Event-ID: {last_event_id}")
+        return None
+    
+    frames = app['hub'].replay_after(last_event_id, subscription)
+    
+    if frames is None:
+        # Not in this process's ring (e.g. after a deploy): replay from the Redis history
+        events = await app['poller'].redis_client.get_events_after(last_event_id, EVENT_REPLAY_LIMIT + 1)
+        if events is None or len(events) > EVENT_REPLAY_LIMIT:
+            # Filtering a truncated history would skip the matching events past the limit
+            return None
+        frames = [
+            format_frame(payload, event_id) for event_id, payload, attrs in events
+            if subscription is None or subscription.matches(EventAttributes.from_json(attrs) if attrs else None)
+        ]
+        if events:
+            # Anything published while reading the history is already in the ring
+            subscriber.skip_through(events[-1][0])
+    
+    if len(frames) > EVENT_REPLAY_LIMIT:
+        return None
+    return frames
 
 async def stream(request):
     """SSE endpoint for real-time updates"""
@@ -98,6 +325,11 @@ async def stream(request):
     client_id = str(uuid.uuid4())[:8]
     logger.info(f"New client connecting - ID: {client_id}, IP: {client_ip}")
 
+    try:
+        subscription = Subscription.from_query(request.query)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+
     response = web.StreamResponse()
     response.headers['Content-Type'] = 'text/event-stream'
     response.headers['Cache-Control'] = 'no-cache'
@@ -106,87 +338,198 @@ async def stream(request):
     
     await response.prepare(request)
     
-    # Create a queue for this client
-    queue = asyncio.Queue()
-    client = Client(id=client_id, queue=queue)
-    connected_clients[client_id] = client
+    hub = request.app['hub']
+    subscriber = hub.subscribe(client_id, subscription)
     
     buffer_size = len(request.app['poller'].article_buffer)
     logger.info(f"Client {client_id} initialized - Buffer has {buffer_size}/{ARTICLES_BUFFER_SIZE} articles")
     
+    async def write(data: bytes) -> None:
+        await subscriber.write(response.write(data), CLIENT_WRITE_TIMEOUT)
+    
     try:
-        # Send initial articles when client first connects
-        poller = request.app['poller']
-        initial_articles = await poller.get_initial_articles()
-        
-        # Add buffer status and timestamp to the response
-        initial_data = {
-            **initial_articles,
-            "buffer_status": {
-                "required": ARTICLES_BUFFER_SIZE,
-                "current": len(initial_articles["articles"])
-            },
-            "timestamp": datetime.utcnow().isoformat(),
-            "type": "initial"
-        }
-        
-        logger.debug(f"Sending initial data to client {client_id}: {json.dumps(initial_data, indent=2)}")
-        await response.write(f'data: {json.dumps(initial_data)}\n\n'.encode('utf-8'))
+        # Resume reconnecting clients from their last event, otherwise send the initial articles
+        last_event_id = request.headers.get('Last-Event-ID')
+        frames = (
+            await replay_frames(request.app, subscriber, last_event_id, subscription)
+            if last_event_id else None
+        )
+        if frames is None:
+            await write(await initial_frame(request.app, subscription))
+        else:
+            logger.info(f"Client {client_id} resumed after {last_event_id} - replaying {len(frames)} events")
+            if frames:
+                await write(b''.join(frames))
         
         while True:
             try:
-                data = await queue.get()
-                # Add current buffer size and timestamp to updates
-                update_data = {
-                    **data,
-                    "buffer_status": {
-                        "required": ARTICLES_BUFFER_SIZE,
-                        "current": len(poller.article_buffer)
-                    },
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                logger.debug(f"Sending update to client {client_id}: {json.dumps(update_data, indent=2)}")
-                await response.write(f'data: {json.dumps(update_data)}\n\n'.encode('utf-8'))
-            except ConnectionResetError:
-                logger.warning(f"Connection reset for client {client_id}")
+                events = await asyncio.wait_for(subscriber.next_events(), SSE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                await write(HEARTBEAT_FRAME)
+                continue
+            except SubscriberLagged as e:
+                # The ring overwrote events this client never read; resync it with a fresh snapshot
+                logger.warning(f"Client {client_id} lagged behind by {e.missed} events, resyncing")
+                await write(await initial_frame(request.app, subscription))
+                continue
+            
+            if not events:  # Hub closed
                 break
+            await write(b''.join(event.frame for event in events))
+            observe_fanout_lag(events, 'sse')
+    except asyncio.TimeoutError:
+        logger.warning(f"Write to client {client_id} timed out, dropping connection")
+    except ConnectionResetError:
+        logger.warning(f"Connection reset for client {client_id}")
     finally:
-        connected_clients.pop(client_id, None)
-        logger.info(f"Client {client_id} disconnected - {len(connected_clients)} clients remaining")
+        hub.unsubscribe(client_id)
+        logger.info(f"Client {client_id} disconnected - {hub.client_count} clients remaining")
     
     return response
 
+def observe_fanout_lag(events, transport: str) -> None:
+    """Record how long the oldest delivered event waited since it was published
+
+    Event IDs start with the publish time in milliseconds (Redis stream IDs
+    when the history is available), so this includes the relay between workers.
+    Transient events carry the ID of an earlier event, so they are not measured.
+    """
+    oldest = next((event for event in events if not event.transient), None)
+    if oldest is not None:
+        FANOUT_LAG_SECONDS.observe(max(0.0, time.time() - parse_event_id(oldest.id)[0] / 1000), transport=transport)
+
+def batch_payload(events) -> str:
+    """Join already serialized events into one batched WebSocket message"""
+    if len(events) == 1:
+        return events[0].payload
+    return '{"type": "batch", "events": [' + ', '.join(event.payload for event in events) + ']}'
+
+async def websocket_stream(request):
+    """WebSocket endpoint for real-time updates, compressed and coalesced under bursts"""
+    client_id = str(uuid.uuid4())[:8]
+    logger.info(f"New WebSocket client connecting - ID: {client_id}, IP: {request.remote}")
+
+    try:
+        subscription = Subscription.from_query(request.query)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+    # compress=True negotiates permessage-deflate when the client offers it; the
+    # heartbeat pings the client and closes the socket if no pong comes back
+    ws = web.WebSocketResponse(compress=True, heartbeat=SSE_HEARTBEAT_INTERVAL)
+    await ws.prepare(request)
+
+    hub = request.app['hub']
+    subscriber = hub.subscribe(client_id, subscription)
+    window = WS_COALESCE_WINDOW_MS / 1000
+
+    async def send(message: str) -> None:
+        await subscriber.write(ws.send_str(message), CLIENT_WRITE_TIMEOUT)
+
+    async def send_events():
+        last_sent = 0.0
+        try:
+            await send(json.dumps(await initial_event(request.app, subscription)))
+            while True:
+                try:
+                    events = await subscriber.next_events()
+                    if not events:  # Hub closed
+                        break
+                    if len(events) > 1 or time.monotonic() - last_sent < window:
+                        # Busy stream: give the rest of the burst a window to arrive and batch it;
+                        # a quiet stream sends the single event straight away
+                        await asyncio.sleep(window)
+                        events += subscriber.poll_events()
+                except SubscriberLagged as e:
+                    logger.warning(f"WebSocket client {client_id} lagged behind by {e.missed} events, resyncing")
+                    await send(json.dumps(await initial_event(request.app, subscription)))
+                    continue
+
+                for i in range(0, len(events), WS_MAX_BATCH):
+                    await send(batch_payload(events[i:i + WS_MAX_BATCH]))
+                observe_fanout_lag(events, 'ws')
+                last_sent = time.monotonic()
+        except asyncio.TimeoutError:
+            logger.warning(f"Write to WebSocket client {client_id} timed out, dropping connection")
+        finally:
+            # Ends the reader loop too, so the handler returns
+            await ws.close()
+
+    sender = asyncio.create_task(send_events())
+    try:
+        # Read client frames so pings and the close handshake are processed
+        async for _ in ws:
+            pass
+    finally:
+        sender.cancel()
+        try:
+            await sender
+        except (asyncio.CancelledError, ConnectionResetError):
+            pass
+        hub.unsubscribe(client_id)
+        logger.info(f"WebSocket client {client_id} disconnected - {hub.client_count} clients remaining")
+
+    return ws
+
+def register_state_gauges(app):
+    """Point the sampled gauges at this app's hub and poller"""
+    hub, poller = app['hub'], app['poller']
+    STREAM_CLIENTS.set_function(lambda: hub.client_count)
+    CLIENT_PENDING_EVENTS_MAX.set_function(lambda: max((s.pending for s in hub.subscribers()), default=0))
+    CLIENT_PENDING_BYTES_MAX.set_function(lambda: max((s.pending_bytes for s in hub.subscribers()), default=0))
+    ARTICLE_BUFFER_SIZE.set_function(lambda: len(poller.article_buffer))
+    RESIDENT_MEMORY.set_function(lambda: poller.memory_monitor.process.memory_info().rss)
+
 async def start_background_tasks(app):
-    """Start the feed polling in the background"""
-    poller = FeedPoller(send_to_clients)
+    """Start the event relay, and the feed polling while this worker is the leader"""
+    app['hub'] = BroadcastHub(BROADCAST_RING_SIZE)
+    app['articles_snapshot'] = SnapshotCache()
+    poller = FeedPoller(make_send_to_clients(app))
     await poller.setup()  # Initialize async components
     app['poller'] = poller
-    app['polling_task'] = asyncio.create_task(app['poller'].poll_feeds())
+    app['relay_task'] = asyncio.create_task(relay_events(app))
+    app['transient_relay_task'] = asyncio.create_task(relay_transient_events(app))
+    app['reaper_task'] = asyncio.create_task(
+        app['hub'].reap(CLIENT_REAP_INTERVAL, CLIENT_MAX_PENDING_BYTES, 2 * CLIENT_WRITE_TIMEOUT)
+    )
+    
+    app['loop_monitor_task'] = asyncio.create_task(monitor_event_loop())
+    register_state_gauges(app)
+    
+    # Only one worker polls; the others serve from the shared Redis state
+    app['leader'] = LeaderElection(poller.redis_client.redis, lease_ms=LEADER_LEASE_MS)
+    app['polling_task'] = asyncio.create_task(app['leader'].run(poller.run))
+
+async def close_client_streams(app):
+    """Tell streaming clients we are going away and end their handlers
+
+    Runs on shutdown, before the server waits for in-flight requests, so open
+    streams do not hold the process for the whole shutdown timeout.
+    """
+    hub = app['hub']
+    app['reaper_task'].cancel()
+    hub.publish(json.dumps({"type": "shutdown", "message": "Server shutting down"}))
+    hub.close()
+    await hub.drain(SHUTDOWN_DRAIN_TIMEOUT)
 
 async def cleanup_background_tasks(app):
     """Clean up the background tasks"""
     logger.info("Starting graceful shutdown...")
     
     try:
-        # Cancel polling task
-        app['polling_task'].cancel()
-        try:
-            await app['polling_task']
-        except asyncio.CancelledError:
-            logger.info("Polling task cancelled successfully")
+        # Cancel polling task (releasing the leader lease for a fast failover) and the relay
+        for task_name in ('polling_task', 'relay_task', 'transient_relay_task', 'loop_monitor_task'):
+            app[task_name].cancel()
+            try:
+                await app[task_name]
+            except asyncio.CancelledError:
+                logger.info(f"{task_name} cancelled successfully")
         
         # Close Redis connections
         if 'poller' in app:
             await app['poller'].redis_client.close()
             logger.info("Redis connections closed")
         
-        # Notify connected clients
-        for client in connected_clients.values():
-            try:
-                await client.queue.put({"type": "shutdown", "message": "Server shutting down"})
-            except:
-                pass
-        
         logger.info("Cleanup completed successfully")
         
     except Exception as e:
@@ -199,34 +542,42 @@ async def clear_cache(request):
     # Clear Redis
     await poller.redis_client.clear_cache()
     
-    # Clear article buffer
-    poller.article_buffer = []
-    poller.is_ready = False
+    # Clear article buffer here and, through the event relay, in every other worker
+    poller.reset_buffer()
+    await poller.send_to_clients({"type": "cache_cleared"})
     
     return web.json_response({
         "status": "success",
         "message": "Cache cleared successfully"
     })
 
-async def send_to_client(client_id, client, data, disconnected):
-    try:
-        await client.queue.put(data)
-    except Exception as e:
-        logger.error(f"Error sending to client {client_id}: {str(e)}")
-        disconnected.append(client_id)
-
 async def health_check(request):
     """Health check endpoint for monitoring"""
     poller = request.app['poller']
+    try:
+        analysis_backlog = await poller.analysis_queue.backlog()
+    except Exception as e:
+        logger.error(f"Error reading the analysis backlog: {str(e)}")
+        analysis_backlog = None
     
     return web.json_response({
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "buffer_size": len(poller.article_buffer),
-        "connected_clients": len(connected_clients),
+        "analysis_backlog": analysis_backlog,
+        "connected_clients": request.app['hub'].client_count,
+        "worker": request.app['leader'].worker_id,
+        "leader": request.app['leader'].is_leader,
         "uptime": time.time() - request.app.get('start_time', time.time())
     })
 
+async def metrics(request):
+    """Prometheus scrape endpoint for this worker"""
+    return web.Response(
+        text=REGISTRY.render(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
 async def get_article_analysis(request):
     """Endpoint to fetch analysis for a specific article"""
     article_id = request.match_info.get('article_id')
@@ -256,11 +607,50 @@ async def get_article_analysis(request):
             "error": "Internal server error"
         }, status=500)
 
-def main():
-    """Main entry point"""
-    logger.info(f"Starting RSS Polling Service")
-    logger.info(f"Redis Configuration - Host: {REDIS_HOST}, Port: {REDIS_PORT}, DB: {REDIS_DB}")
+async def get_article_labels(request):
+    """Endpoint to fetch the local NLP labels (summary and sentiment) of an article"""
+    article_id = request.match_info['article_id']
+    try:
+        labels = await request.app['poller'].redis_client.get_labels(article_id)
+    except Exception as e:
+        logger.error(f"Error fetching labels for article {article_id}: {str(e)}")
+        return web.json_response({"error": "Internal server error"}, status=500)
+
+    if not labels:
+        return web.json_response({"articleId": article_id, "error": "Labels not found"}, status=404)
+    return web.json_response({"articleId": article_id, "labels": labels})
+
+async def get_article_analyses(request):
+    """Endpoint to fetch the analyses of several articles: /analysis?ids=a,b,c"""
+    # Deduplicate while keeping the requested order
+    article_ids = list(dict.fromkeys(
+        article_id.strip() for article_id in request.query.get('ids', '').split(',') if article_id.strip()
+    ))
+    if not article_ids:
+        return web.json_response({"error": "Missing ids parameter"}, status=400)
+    if len(article_ids) > MAX_ANALYSIS_IDS:
+        return web.json_response({"error": f"At most {MAX_ANALYSIS_IDS} ids per request"}, status=400)
+
+    try:
+        analyses = await request.app['poller'].redis_client.get_analyses(article_ids)
+    except Exception as e:
+        logger.error(f"Error fetching analyses for {len(article_ids)} articles: {str(e)}")
+        return web.json_response({"error": "Internal server error"}, status=500)
 
+    # Stitch the stored JSON into the response rather than decoding and re-encoding it
+    found = [f'{json.dumps(article_id)}: {value}' for article_id, value in analyses.items() if value]
+    missing = [article_id for article_id, value in analyses.items() if not value]
+    body = '{"analyses": {' + ', '.join(found) + '}, "missing": ' + json.dumps(missing) + '}'
+    return web.Response(text=body, content_type='application/json')
+
+def create_app() -> web.Application:
+    """Build the application; also the entry point for multi-worker deployments
+
+    Run several workers with `gunicorn -c src/gunicorn.conf.py`: each one
+    serves every endpoint, and a Redis lease elects the single worker that
+    polls feeds.
+    """
+    configure_logging()
     app = web.Application(middlewares=[cors_middleware])
     
     # Store start time for uptime tracking
@@ -269,12 +659,25 @@ def main():
     # Add routes
     app.router.add_get('/articles', get_articles)
     app.router.add_get('/stream', stream)
+    app.router.add_get('/ws', websocket_stream)
     app.router.add_post('/clear-cache', clear_cache)
     app.router.add_get('/health', health_check)  # Add health check endpoint
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/analysis', get_article_analyses)
     app.router.add_get('/analysis/{article_id}', get_article_analysis)  # Add new route
+    app.router.add_get('/labels/{article_id}', get_article_labels)
 
     app.on_startup.append(start_background_tasks)
+    app.on_shutdown.append(close_client_streams)
     app.on_cleanup.append(cleanup_background_tasks)
+    return app
+
+def main():
+    """Main entry point (single worker)"""
+    logger.info(f"Starting RSS Polling Service")
+    logger.info(f"Redis Configuration - Host: {REDIS_HOST}, Port: {REDIS_PORT}, DB: {REDIS_DB}")
+
+    app = create_app()
     
     # Try different ports if 8000 is taken
     ports = [8000, 8001, 8002, 8003]
@@ -289,4 +692,4 @@ def main():
             continue
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,261 @@
+import asyncio
+import bisect
+import functools
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond Redis calls to slow feed fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """Base for metrics keyed by label values; updates are plain dict operations"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if len(labels) != len(self.labelnames) or not all(name in labels for name in self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """A gauge that is either set directly or sampled from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Sample an unlabelled gauge from `function` on every scrape"""
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum, count
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound) if bound == float("inf") else bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def timed(metric: Histogram, **labels: str):
+    """Decorator observing the duration of every call to a coroutine function"""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with metric.time(**labels):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Metrics shared across modules
+FEED_FETCH_SECONDS = histogram("feed_fetch_seconds", "Feed HTTP fetch latency", ["host"])
+FEED_FETCHES = counter("feed_fetches_total", "Feed fetches by host and HTTP status (or 'error')", ["host", "status"])
+FEED_PARSE_SECONDS = histogram("feed_parse_seconds", "Feed parsing time", ["host"])
+ARTICLES_SEEN = counter("articles_seen_total", "Feed entries checked against the cache, by result", ["result"])
+ANALYZER_SECONDS = histogram("analyzer_seconds", "Article analysis latency", ["backend", "outcome"])
+ANALYZER_FIRST_TOKEN_SECONDS = histogram(
+    "analyzer_first_token_seconds", "Time from starting a streamed analysis to its first text", ["backend"]
+)
+ANALYZER_IN_FLIGHT = gauge("analyzer_in_flight", "Analyses currently running", ["backend"])
+ANALYZER_ROUTED = counter("analyzer_routed_total", "Analyzer calls sent by the router, by backend", ["backend"])
+ANALYZER_HEDGES = counter(
+    "analyzer_hedges_total", "Slow analyzer calls hedged to a second backend, by whether the hedge answered first",
+    ["result"]
+)
+ANALYZER_LATENCY_EWMA_SECONDS = gauge(
+    "analyzer_latency_ewma_seconds", "Moving average of analyzer call latency seen by the router", ["backend"]
+)
+ANALYZER_ERROR_EWMA = gauge("analyzer_error_ewma", "Moving average of the router's analyzer call failure rate", ["backend"])
+ANALYSIS_QUEUE_DEPTH = gauge("analysis_queue_depth", "Articles waiting in the analysis queue")
+ANALYSES = counter("analyses_total", "Finished analysis attempts by outcome", ["outcome"])
+ANALYSES_SHED = counter(
+    "analyses_shed_total", "Queued analyses dropped (overflow, expired) or downgraded past their deadline", ["reason"]
+)
+ANALYSIS_BACKLOG_AGE_SECONDS = gauge("analysis_backlog_age_seconds", "Time the oldest queued analysis has been waiting")
+ANALYSIS_QUEUE_WAIT_SECONDS = histogram(
+    "analysis_queue_wait_seconds", "Time from queueing an analysis to a worker claiming it",
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+ANALYZER_BUDGET_SPENT = counter("analyzer_budget_spent_total", "Cost units spent on analyses", ["backend"])
+REDIS_OP_SECONDS = histogram("redis_op_seconds", "Redis operation latency", ["op"])
+FANOUT_LAG_SECONDS = histogram(
+    "stream_fanout_lag_seconds", "Time from an event being published to its delivery to a client", ["transport"]
+)
+EVENTS_PUBLISHED = counter("events_published_total", "Events published to this worker's stream clients")
+EVENT_LOOP_LAG_SECONDS = histogram(
+    "event_loop_lag_seconds", "Delay of a timer callback past its due time",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+
+async def monitor_event_loop(interval: float = 0.5) -> None:
+    """Measure how late the loop runs a sleeping task, i.e. how long callbacks block it"""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - due))
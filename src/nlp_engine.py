@@ -0,0 +1,124 @@
+"""Cheap local labels for every article: a short summary and a market sentiment
+
+Two small CPU models (a summarizer and a financial-news sentiment
+classifier) label articles in batches on a thread pool, so the event loop
+never waits on them, while the LLM analysis handles only the articles that
+pass triage. Any callables taking a list of texts can stand in for the
+models, e.g. tiny stubs in tests:
+
+    engine = NLPEngine(summarize=lambda texts: texts, classify=lambda texts: [...])
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from batching import MicroBatcher
+from config import (
+    NLP_BATCH_SIZE, NLP_BATCH_WINDOW_MS, NLP_SENTIMENT_MODEL, NLP_SUMMARY_MODEL, NLP_THREADS
+)
+from metrics import counter, histogram
+
+# Texts in, one result per text out
+Model = Callable[[List[str]], List[Any]]
+
+NLP_BATCH_SECONDS = histogram("nlp_batch_seconds", "Time to label a batch of articles with the local models")
+ARTICLES_LABELED = counter("articles_labeled_total", "Articles labeled by the local models, by outcome", ["outcome"])
+
+
+def article_text(article: Dict[str, Any]) -> str:
+    return f"{article.get('title', '')}. {article.get('content', '')}".strip(" .")
+
+
+def load_pipelines(
+    summary_model: str = NLP_SUMMARY_MODEL,
+    sentiment_model: str = NLP_SENTIMENT_MODEL,
+    batch_size: int = NLP_BATCH_SIZE
+):
+    """The summarization and sentiment models as batch callables, on the CPU"""
+    from transformers import pipeline  # Heavy import, only needed where articles are labeled
+
+    summarizer = pipeline("summarization", model=summary_model, device=-1)
+    classifier = pipeline("text-classification", model=sentiment_model, device=-1)
+
+    def summarize(texts: List[str]) -> List[str]:
+        results = summarizer(texts, max_length=60, min_length=10, do_sample=False, truncation=True, batch_size=batch_size)
+        return [result["summary_text"] for result in results]
+
+    def classify(texts: List[str]) -> List[Dict[str, Any]]:
+        return classifier(texts, truncation=True, batch_size=batch_size)
+
+    return summarize, classify
+
+
+class NLPEngine:
+    """Labels articles with the local models, batching concurrent requests
+
+    Models are loaded on first use, in the pool, unless given. The summarizer
+    and the classifier run side by side on each batch; `label` returns the
+    labels or None when the models failed.
+    """
+
+    def __init__(
+        self,
+        summarize: Optional[Model] = None,
+        classify: Optional[Model] = None,
+        batch_size: int = NLP_BATCH_SIZE,
+        batch_window_ms: float = NLP_BATCH_WINDOW_MS,
+        threads: int = NLP_THREADS
+    ):
+        self.summarize = summarize
+        self.classify = classify
+        # At least two threads, so both models of a batch run at once
+        self.executor = ThreadPoolExecutor(max_workers=max(threads, 2), thread_name_prefix="nlp")
+        self.batcher = MicroBatcher(self._label_batch, batch_size, batch_window_ms)
+        self._load_lock = asyncio.Lock()
+
+    async def load(self) -> None:
+        async with self._load_lock:
+            if self.summarize is None or self.classify is None:
+                started = time.time()
+                loop = asyncio.get_running_loop()
+                self.summarize, self.classify = await loop.run_in_executor(self.executor, load_pipelines)
+                logger.info(f"NLP models loaded in {time.time() - started:.1f}s")
+
+    async def label(self, article: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Summary and sentiment of an article"""
+        try:
+            labels = await self.batcher.submit(article)
+            ARTICLES_LABELED.inc(outcome="ok")
+            return labels
+        except Exception as e:
+            ARTICLES_LABELED.inc(outcome="error")
+            logger.error(f"Labeling article {article.get('id')} failed: {str(e)}")
+            return None
+
+    async def label_many(self, articles: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Labels by article ID, leaving out articles that failed"""
+        results = await asyncio.gather(*(self.label(article) for article in articles))
+        return {article["id"]: labels for article, labels in zip(articles, results) if labels}
+
+    async def _label_batch(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        await self.load()
+        texts = [article_text(article) for article in articles]
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        summaries, sentiments = await asyncio.gather(
+            loop.run_in_executor(self.executor, self.summarize, texts),
+            loop.run_in_executor(self.executor, self.classify, texts)
+        )
+        NLP_BATCH_SECONDS.observe(time.perf_counter() - started)
+        return [
+            {
+                "summary": summary,
+                "sentiment": sentiment["label"].lower(),
+                "sentiment_score": round(float(sentiment["score"]), 4),
+                "labeled_at": time.time(),
+            }
+            for summary, sentiment in zip(summaries, sentiments)
+        ]
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,24 @@
+from typing import Any, Dict
+
+# Bump whenever the prompt text changes, so results from different prompts can be told apart
+PROMPT_VERSION = "1"
+
+ANALYSIS_SECTIONS = ("Summary", "Market Impact", "Trading Ideas", "Key Assets", "Risk Level")
+
+
+def build_prompt(article: Dict[str, Any]) -> str:
+    """Analysis prompt for an article, for backends that take raw prompts"""
+    return f"""Analyze this financial article briefly:
+
+Title: {article.get('title', '')}
+Source: {article.get('source', '')}
+Content: {article.get('content', '')}
+
+Provide a concise analysis:
+1. Summary: Key points in 2-3 sentences
+2. Market Impact: Main effects on markets
+3. Trading Ideas: 1-2 specific trading opportunities
+4. Key Assets: Key instruments mentioned
+5. Risk Level: Low/Medium/High with brief reason
+
+Keep responses short and focused."""
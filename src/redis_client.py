@@ -1,8 +1,74 @@
 import redis.asyncio as aioredis
 from loguru import logger
-from config import REDIS_HOST, REDIS_PORT, REDIS_DB
+from broadcast import parse_event_id
+from config import REDIS_HOST, REDIS_PORT, REDIS_DB, EVENT_HISTORY_SIZE
+from metrics import REDIS_OP_SECONDS, timed
+import base64
 import json
-from typing import List, Dict, Any, Optional
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+
+ARTICLE_TTL = 86400  # 24 hours
+
+# Time-ordered secondary indexes (ZSETs scored by publication time) holding
+# the article link of every stored article, so filtered reads can be
+# resolved with ZINTERSTORE inside Redis.
+INDEX_ALL_KEY = "idx:articles"
+INDEX_SOURCE_KEY = "idx:source:{}"
+INDEX_CATEGORY_KEY = "idx:category:{}"
+INDEX_ASSET_KEY = "idx:asset:{}"
+
+# When each indexed article expires, scored by expiry time; members are JSON
+# [link, index keys], so expired articles can be removed from their indexes.
+# Publication time can't be used for this: old news is stored for a full TTL.
+INDEX_EXPIRY_KEY = "idx:expiry"
+
+# Bounded stream of serialized SSE events; its entry IDs are the event IDs
+# clients send back in Last-Event-ID.
+EVENT_HISTORY_KEY = "events:history"
+
+# Pub/sub channel for transient events (analysis deltas): every worker relays
+# them to its clients, but they are not kept in the history
+TRANSIENT_EVENTS_CHANNEL = "events:transient"
+
+
+def article_score(article: Dict[str, Any]) -> float:
+    """Index score for an article: its publication time as epoch seconds"""
+    try:
+        return datetime.fromisoformat(article["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+def encode_cursor(article: Dict[str, Any]) -> str:
+    """Opaque pagination cursor positioned just after an article in the time index"""
+    raw = json.dumps([article_score(article), article.get("url", "")]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        score, member = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(score), str(member)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def article_index_keys(article: Dict[str, Any]) -> List[str]:
+    """All secondary index keys an article belongs to"""
+    keys = [INDEX_ALL_KEY]
+    if article.get("source"):
+        keys.append(INDEX_SOURCE_KEY.format(article["source"].lower()))
+    for category in article.get("categories") or []:
+        term = category.get("term") if isinstance(category, dict) else category
+        if term:
+            keys.append(INDEX_CATEGORY_KEY.format(term.strip().lower()))
+    for asset in article.get("assets") or []:
+        keys.append(INDEX_ASSET_KEY.format(asset.upper()))
+    return keys
 
 class RedisClient:
     def __init__(self):
@@ -24,6 +90,7 @@ class RedisClient:
         if self.redis:
             await self.redis.close()
 
+    @timed(REDIS_OP_SECONDS, op="is_article_exists")
     async def is_article_exists(self, article_link: str) -> bool:
         """Check if article link hash exists in Redis"""
         try:
@@ -33,62 +100,169 @@ class RedisClient:
             logger.error(f"Redis error while checking article: {str(e)}")
             return False
 
+    @timed(REDIS_OP_SECONDS, op="save_article")
     async def save_article(self, article_link: str, data: dict) -> None:
         """Save article and analysis separately"""
+        article = data['article']
         article_key = f"article:{article_link}"
-        analysis_key = f"analysis:{data['article']['id']}"
-        
-        # Save article data
-        await self.redis.set(
-            article_key,
-            json.dumps(data['article']),
-            ex=86400  # 24 hours
-        )
-        
-        # Save analysis if available
-        if data.get('analysis'):
-            await self.redis.set(
-                analysis_key,
-                json.dumps(data['analysis']),
-                ex=86400  # 24 hours
-            )
+        analysis_key = f"analysis:{article['id']}"
+        score = article_score(article)
+        index_keys = article_index_keys(article)
+        now = time.time()
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            # Save article data
+            pipe.set(article_key, json.dumps(article), ex=ARTICLE_TTL)
+
+            # Save analysis if available
+            if data.get('analysis'):
+                pipe.set(analysis_key, json.dumps(data['analysis']), ex=ARTICLE_TTL)
+
+            # Maintain secondary indexes, and collect entries whose article key has expired
+            for index_key in index_keys:
+                pipe.zadd(index_key, {article_link: score})
+                pipe.expire(index_key, ARTICLE_TTL)
+            pipe.zadd(INDEX_EXPIRY_KEY, {json.dumps([article_link, index_keys]): now + ARTICLE_TTL})
+            pipe.zrangebyscore(INDEX_EXPIRY_KEY, "-inf", now)
+            pipe.zremrangebyscore(INDEX_EXPIRY_KEY, "-inf", now)
+            pipe.expire(INDEX_EXPIRY_KEY, ARTICLE_TTL)
+
+            expired = (await pipe.execute())[-3]
+
+        if expired:
+            await self._unindex(expired)
+
+    async def _unindex(self, expired: List[str]) -> None:
+        """Remove expired articles (INDEX_EXPIRY_KEY members) from their indexes"""
+        removals: Dict[str, List[str]] = {}
+        for member in expired:
+            try:
+                link, index_keys = json.loads(member)
+            except (TypeError, ValueError):
+                continue
+            for index_key in index_keys:
+                removals.setdefault(index_key, []).append(link)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for index_key, links in removals.items():
+                pipe.zrem(index_key, *links)
+            await pipe.execute()
+
+    @timed(REDIS_OP_SECONDS, op="query_articles")
+    async def query_articles(
+        self,
+        source: Optional[str] = None,
+        category: Optional[str] = None,
+        asset: Optional[str] = None,
+        since: Optional[float] = None,
+        limit: int = 15
+    ) -> List[Dict[str, Any]]:
+        """Get the newest articles matching all given filters, intersecting indexes in Redis"""
+        index_keys = []
+        if source:
+            index_keys.append(INDEX_SOURCE_KEY.format(source.lower()))
+        if category:
+            index_keys.append(INDEX_CATEGORY_KEY.format(category.strip().lower()))
+        if asset:
+            index_keys.append(INDEX_ASSET_KEY.format(asset.upper()))
+        if not index_keys:
+            index_keys.append(INDEX_ALL_KEY)
+
+        min_score = since if since is not None else "-inf"
+
+        try:
+            if len(index_keys) == 1:
+                links = await self.redis.zrevrangebyscore(
+                    index_keys[0], "+inf", min_score, start=0, num=limit
+                )
+            else:
+                # Intersect into a short-lived key and read it back in one round trip
+                tmp_key = f"idx:tmp:{uuid.uuid4().hex}"
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.zinterstore(tmp_key, index_keys, aggregate="MAX")
+                    pipe.zrevrangebyscore(tmp_key, "+inf", min_score, start=0, num=limit)
+                    pipe.delete(tmp_key)
+                    _, links, _ = await pipe.execute()
+
+            return await self._load_indexed_articles(links, index_keys)
+
+        except Exception as e:
+            logger.error(f"Redis error while querying articles: {str(e)}")
+            return []
+
+    @timed(REDIS_OP_SECONDS, op="get_articles_page")
+    async def get_articles_page(self, before: Optional[Tuple[float, str]], limit: int) -> List[Dict[str, Any]]:
+        """Get `limit` articles older than the cursor position, newest first
+
+        Seeks by score in the time index, so every page costs the same
+        regardless of depth. Members sharing the cursor's score are ordered by
+        member, matching Redis' own ordering for ties.
+        """
+        try:
+            if before is None:
+                links = await self.redis.zrevrangebyscore(INDEX_ALL_KEY, "+inf", "-inf", start=0, num=limit)
+            else:
+                score, member = before
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.zrevrangebyscore(INDEX_ALL_KEY, score, score)
+                    pipe.zrevrangebyscore(INDEX_ALL_KEY, f"({score}", "-inf", start=0, num=limit)
+                    ties, older = await pipe.execute()
+                links = [link for link in ties if link.encode() < member.encode()] + older
+                links = links[:limit]
 
+            return await self._load_indexed_articles(links, [INDEX_ALL_KEY])
+
+        except Exception as e:
+            logger.error(f"Redis error while paging articles: {str(e)}")
+            return []
+
+    async def _load_indexed_articles(self, links: List[str], index_keys: List[str]) -> List[Dict[str, Any]]:
+        """Fetch article bodies for index members in index order, dropping expired entries"""
+        if not links:
+            return []
+
+        values = await self.redis.mget([f"article:{link}" for link in links])
+        articles = []
+        stale = []
+        for link, value in zip(links, values):
+            if value is None:
+                stale.append(link)
+                continue
+            try:
+                articles.append(json.loads(value))
+            except json.JSONDecodeError:
+                continue
+
+        if stale:
+            # Articles expired before the indexes were trimmed; drop them from the queried indexes
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for index_key in index_keys:
+                    pipe.zrem(index_key, *stale)
+                await pipe.execute()
+
+        return articles
+
+    @timed(REDIS_OP_SECONDS, op="get_recent_articles")
     async def get_recent_articles(self, count: int = 15) -> List[Dict[str, Any]]:
-        """Get recent articles from Redis"""
+        """Get recent articles from Redis, newest first, via the time index"""
         try:
-            # Get all article keys
-            keys = await self.redis.keys("article:*")
-            articles = []
-            
-            for key in keys:
-                value = await self.redis.get(key)
-                try:
-                    # Try to parse as JSON (for full article data)
-                    article_data = json.loads(value)
-                    articles.append(article_data)
-                except json.JSONDecodeError:
-                    # Skip articles that only have link stored
-                    continue
-            
-            # Sort by timestamp and return most recent
-            articles.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            return articles[:count]
-            
+            return await self.query_articles(limit=count)
         except Exception as e:
             logger.error(f"Redis error while getting recent articles: {str(e)}")
             return []
 
+    @timed(REDIS_OP_SECONDS, op="clear_cache")
     async def clear_cache(self):
         """Clear all articles from Redis"""
         try:
-            # Delete all article keys
-            keys = await self.redis.keys("article:*")
+            # Delete all article keys and their secondary indexes
+            keys = await self.redis.keys("article:*") + await self.redis.keys("idx:*")
             if keys:
                 await self.redis.delete(*keys)
             logger.info("Redis cache cleared successfully")
         except Exception as e:
             logger.error(f"Redis error while clearing cache: {str(e)}")
 
+    @timed(REDIS_OP_SECONDS, op="get_analysis")
     async def get_analysis(self, article_id: str) -> Optional[Dict]:
         """Get analysis for specific article"""
         analysis_key = f"analysis:{article_id}"
@@ -100,4 +274,110 @@ class RedisClient:
             except json.JSONDecodeError:
                 logger.error(f"Error decoding analysis data for article {article_id}")
                 return None
-        return None 
\ No newline at end of file
+        return None
+
+    @timed(REDIS_OP_SECONDS, op="save_analysis")
+    async def save_analysis(self, article_id: str, analysis: Dict[str, Any]) -> None:
+        """Store the analysis of an already saved article"""
+        await self.redis.set(f"analysis:{article_id}", json.dumps(analysis), ex=ARTICLE_TTL)
+
+    @timed(REDIS_OP_SECONDS, op="save_labels")
+    async def save_labels(self, labels: Dict[str, Dict[str, Any]]) -> None:
+        """Store the local NLP labels of several articles, by article ID, in one round trip"""
+        if not labels:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for article_id, article_labels in labels.items():
+                pipe.set(f"labels:{article_id}", json.dumps(article_labels), ex=ARTICLE_TTL)
+            await pipe.execute()
+
+    @timed(REDIS_OP_SECONDS, op="get_labels")
+    async def get_labels(self, article_id: str) -> Optional[Dict[str, Any]]:
+        """Local NLP labels of an article, if it was labeled"""
+        value = await self.redis.get(f"labels:{article_id}")
+        return json.loads(value) if value else None
+
+    @timed(REDIS_OP_SECONDS, op="get_analyses")
+    async def get_analyses(self, article_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Get the serialized analyses of several articles with one MGET
+
+        Values are the stored JSON strings, so callers can embed them without
+        decoding; articles without an analysis map to None.
+        """
+        if not article_ids:
+            return {}
+        values = await self.redis.mget([f"analysis:{article_id}" for article_id in article_ids])
+        return dict(zip(article_ids, values))
+
+    @timed(REDIS_OP_SECONDS, op="append_event")
+    async def append_event(self, payload: str, attrs: Optional[str] = None) -> Optional[str]:
+        """Append a serialized event (and its filter attributes) to the bounded history and return its event ID"""
+        fields = {"data": payload}
+        if attrs is not None:
+            fields["attrs"] = attrs
+        try:
+            return await self.redis.xadd(
+                EVENT_HISTORY_KEY,
+                fields,
+                maxlen=EVENT_HISTORY_SIZE,
+                approximate=True
+            )
+        except Exception as e:
+            logger.error(f"Redis error while appending event: {str(e)}")
+            return None
+
+    @timed(REDIS_OP_SECONDS, op="get_events_after")
+    async def get_events_after(self, event_id: str, count: int) -> Optional[List[Tuple[str, str, Optional[str]]]]:
+        """Get up to `count` (event ID, payload, attributes) entries published after event_id
+
+        Returns None when the history has been trimmed past event_id, i.e. the
+        client missed events that can no longer be replayed.
+        """
+        try:
+            oldest = await self.redis.xrange(EVENT_HISTORY_KEY, "-", "+", count=1)
+            if not oldest or parse_event_id(oldest[0][0]) > parse_event_id(event_id):
+                return None
+
+            entries = await self.redis.xrange(EVENT_HISTORY_KEY, f"({event_id}", "+", count=count)
+            return [(entry_id, fields["data"], fields.get("attrs")) for entry_id, fields in entries]
+        except Exception as e:
+            logger.error(f"Redis error while reading event history: {str(e)}")
+            return None
+
+    @timed(REDIS_OP_SECONDS, op="get_latest_event_id")
+    async def get_latest_event_id(self) -> str:
+        """ID of the newest event in the history ("0-0" when it is empty)"""
+        entries = await self.redis.xrevrange(EVENT_HISTORY_KEY, "+", "-", count=1)
+        return entries[0][0] if entries else "0-0"
+
+    @timed(REDIS_OP_SECONDS, op="publish_transient_event")
+    async def publish_transient_event(self, payload: str, attrs: Optional[str] = None) -> bool:
+        """Publish a serialized transient event to every worker; False if Redis is unavailable"""
+        try:
+            await self.redis.publish(TRANSIENT_EVENTS_CHANNEL, json.dumps({"data": payload, "attrs": attrs}))
+            return True
+        except Exception as e:
+            logger.error(f"Redis error while publishing transient event: {str(e)}")
+            return False
+
+    async def transient_events(self) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """Yield (payload, attributes) of transient events published by any worker"""
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(TRANSIENT_EVENTS_CHANNEL)
+        try:
+            while True:
+                message = await pubsub.get_message(timeout=5)
+                if message is not None:
+                    event = json.loads(message["data"])
+                    yield event["data"], event.get("attrs")
+        finally:
+            await pubsub.aclose()
+
+    async def read_events(self, after_id: str, block_ms: int = 5000) -> List[Tuple[str, str, Optional[str]]]:
+        """Block until events newer than after_id are appended to the history and return them"""
+        streams = await self.redis.xread({EVENT_HISTORY_KEY: after_id}, block=block_ms, count=100)
+        return [
+            (entry_id, fields["data"], fields.get("attrs"))
+            for _, entries in streams or []
+            for entry_id, fields in entries
+        ]
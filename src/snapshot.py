@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiohttp import web
+from loguru import logger
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; clients fall back to gzip
+    brotli = None
+
+
+def _accepted_encodings(header: str) -> set:
+    """Content codings the client accepts (ignoring those sent with q=0)"""
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class ResponseSnapshot:
+    """A JSON response encoded once, with precompressed variants and a strong ETag"""
+
+    def __init__(self, data: Dict[str, Any], status: int = 200):
+        self.status = status
+        self.body = json.dumps(data).encode("utf-8")
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+        self.variants = {"gzip": gzip.compress(self.body, compresslevel=6)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(self.body)
+
+    def response(self, request: web.Request) -> web.Response:
+        headers = {
+            "ETag": self.etag,
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache",
+        }
+
+        if self.status < 300 and self.etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+
+        body = self.body
+        accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        for coding in ("br", "gzip"):
+            if coding in accepted and coding in self.variants:
+                body = self.variants[coding]
+                headers["Content-Encoding"] = coding
+                break
+
+        return web.Response(
+            body=body,
+            status=self.status,
+            headers=headers,
+            content_type="application/json"
+        )
+
+
+class SnapshotCache:
+    """Holds the current snapshot and rebuilds it only when its key changes"""
+
+    def __init__(self):
+        self._key: Optional[Hashable] = None
+        self._snapshot: Optional[ResponseSnapshot] = None
+
+    async def get(self, key: Hashable, build: Callable[[], Awaitable[ResponseSnapshot]]) -> ResponseSnapshot:
+        if self._snapshot is None or key != self._key:
+            self._snapshot = await build()
+            self._key = key
+            logger.debug(f"Rebuilt response snapshot for {key} ({len(self._snapshot.body)} bytes)")
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        self._snapshot = None
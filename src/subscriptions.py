@@ -0,0 +1,199 @@
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Set
+
+from analysis_parser import RiskLevel
+
+# Ordered risk levels accepted by `min_risk`
+RISK_LEVELS = {level.name.lower(): int(level) for level in RiskLevel}
+
+# Subscription dimensions matched by set membership
+DIMENSIONS = ("sources", "categories", "assets")
+
+
+def _split(value: Optional[str]) -> Iterable[str]:
+    return (item.strip() for item in (value or "").split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class EventAttributes:
+    """Filterable attributes of a published event, normalized like subscriptions"""
+    sources: FrozenSet[str] = frozenset()
+    categories: FrozenSet[str] = frozenset()
+    assets: FrozenSet[str] = frozenset()
+    risk: Optional[int] = None
+
+    @classmethod
+    def from_article(cls, article: Mapping[str, Any], risk: Optional[int] = None) -> "EventAttributes":
+        categories = (
+            c.get("term") if isinstance(c, dict) else c
+            for c in article.get("categories") or []
+        )
+        return cls(
+            sources=frozenset([article["source"].lower()] if article.get("source") else []),
+            categories=frozenset(c.strip().lower() for c in categories if c),
+            assets=frozenset(a.upper() for a in article.get("assets") or []),
+            risk=risk,
+        )
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "sources": sorted(self.sources),
+            "categories": sorted(self.categories),
+            "assets": sorted(self.assets),
+            "risk": self.risk,
+        })
+
+    @classmethod
+    def from_json(cls, value: str) -> "EventAttributes":
+        data = json.loads(value)
+        return cls(
+            sources=frozenset(data.get("sources", [])),
+            categories=frozenset(data.get("categories", [])),
+            assets=frozenset(data.get("assets", [])),
+            risk=data.get("risk"),
+        )
+
+
+@dataclass(frozen=True)
+class Subscription:
+    """Server-side `/stream` filter: values within a dimension are ORed, dimensions are ANDed
+
+    `min_risk` only constrains events that carry a risk level (analyses);
+    articles matching the other dimensions are always delivered.
+    """
+    sources: FrozenSet[str] = frozenset()
+    categories: FrozenSet[str] = frozenset()
+    assets: FrozenSet[str] = frozenset()
+    min_risk: Optional[int] = None
+
+    @classmethod
+    def from_query(cls, query: Mapping[str, str]) -> "Subscription":
+        """Build a subscription from query parameters; raises ValueError for an unknown min_risk"""
+        min_risk = query.get("min_risk")
+        if min_risk and min_risk.lower() not in RISK_LEVELS:
+            raise ValueError(f"min_risk must be one of {', '.join(RISK_LEVELS)}")
+        return cls(
+            sources=frozenset(s.lower() for s in _split(query.get("sources"))),
+            categories=frozenset(c.lower() for c in _split(query.get("categories"))),
+            assets=frozenset(a.upper() for a in _split(query.get("assets"))),
+            min_risk=RISK_LEVELS[min_risk.lower()] if min_risk else None,
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.sources or self.categories or self.assets or self.min_risk)
+
+    def matches(self, attrs: Optional[EventAttributes]) -> bool:
+        """Direct predicate check, used where no index is available (e.g. replay)"""
+        if attrs is None:
+            return True
+        for dimension in DIMENSIONS:
+            wanted = getattr(self, dimension)
+            if wanted and not wanted & getattr(attrs, dimension):
+                return False
+        return self.min_risk is None or attrs.risk is None or attrs.risk >= self.min_risk
+
+
+class SubscriptionIndex:
+    """Inverted index from attribute value to the subscribers filtering on it
+
+    A subscriber matches an event when every dimension it filters on is hit,
+    so matching counts hits per subscriber over the posting lists of the
+    event's own attribute values; the cost follows the number of subscribers
+    interested in those values rather than the number of connected clients.
+    """
+
+    def __init__(self, article_cache_size: int = 1024):
+        self._postings: Dict[str, Dict[Any, Set[str]]] = {d: {} for d in DIMENSIONS + ("risk",)}
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._required_hits: Dict[str, int] = {}  # Filtered set-dimensions per subscriber
+        self._risk_only: Set[str] = set()  # Subscribers filtering on min_risk alone
+        # Attributes of recent articles, so analyses inherit their article's source/categories/assets
+        self._recent_articles: "OrderedDict[str, EventAttributes]" = OrderedDict()
+        self._article_cache_size = article_cache_size
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def add(self, client_id: str, subscription: Subscription) -> None:
+        self._subscriptions[client_id] = subscription
+        hits = 0
+        for dimension in DIMENSIONS:
+            values = getattr(subscription, dimension)
+            for value in values:
+                self._postings[dimension].setdefault(value, set()).add(client_id)
+            hits += bool(values)
+        self._required_hits[client_id] = hits
+        if subscription.min_risk is not None:
+            for level in RISK_LEVELS.values():
+                if level >= subscription.min_risk:
+                    self._postings["risk"].setdefault(level, set()).add(client_id)
+            if hits == 0:
+                self._risk_only.add(client_id)
+
+    def remove(self, client_id: str) -> None:
+        subscription = self._subscriptions.pop(client_id, None)
+        if subscription is None:
+            return
+        self._required_hits.pop(client_id, None)
+        self._risk_only.discard(client_id)
+        for dimension in DIMENSIONS:
+            self._discard(dimension, getattr(subscription, dimension), client_id)
+        if subscription.min_risk is not None:
+            self._discard("risk", RISK_LEVELS.values(), client_id)
+
+    def _discard(self, dimension: str, values: Iterable[Any], client_id: str) -> None:
+        postings = self._postings[dimension]
+        for value in values:
+            clients = postings.get(value)
+            if clients is not None:
+                clients.discard(client_id)
+                if not clients:
+                    del postings[value]
+
+    def match(self, attrs: Optional[EventAttributes]) -> Set[str]:
+        """Subscribers whose filters accept an event with these attributes"""
+        if attrs is None:
+            return set(self._subscriptions)
+
+        counts: Dict[str, int] = {}
+        for dimension in DIMENSIONS:
+            postings = self._postings[dimension]
+            hit: Set[str] = set()
+            for value in getattr(attrs, dimension):
+                hit |= postings.get(value, set())
+            for client_id in hit:
+                counts[client_id] = counts.get(client_id, 0) + 1
+
+        matched = {c for c, n in counts.items() if n == self._required_hits[c]}
+        if attrs.risk is None:
+            return matched | self._risk_only
+
+        # Risk-filtered subscribers must also accept this risk level
+        accepting = self._postings["risk"].get(attrs.risk, set())
+        unrestricted = {c for c in matched if self._subscriptions[c].min_risk is None}
+        return unrestricted | (matched & accepting) | (self._risk_only & accepting)
+
+    def attributes_for(self, data: Mapping[str, Any]) -> Optional[EventAttributes]:
+        """Attributes of an outgoing event, or None for events every client receives"""
+        event_type = data.get("type")
+        if event_type == "article":
+            article = data.get("data") or {}
+            attrs = EventAttributes.from_article(article)
+            if article.get("id"):
+                self._recent_articles[article["id"]] = attrs
+                while len(self._recent_articles) > self._article_cache_size:
+                    self._recent_articles.popitem(last=False)
+            return attrs
+        if event_type in ("analysis", "analysis_delta", "labels"):
+            article_attrs = self._recent_articles.get(data.get("articleId"), EventAttributes())
+            return EventAttributes(
+                sources=article_attrs.sources,
+                categories=article_attrs.categories,
+                assets=article_attrs.assets,
+                # Partial text and labels have no risk level
+                risk=RiskLevel.of(data.get("data")) if event_type == "analysis" else None,
+            )
+        return None
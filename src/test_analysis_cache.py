@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from analysis_cache import CACHE_LOOKUPS, AnalysisCache, content_key
+from analyzer_backends import StubBackend
+from article_analyzer import ArticleAnalyzer
+
+fakeredis = pytest.importorskip("fakeredis")
+
+ARTICLE = {
+    "id": "id-1",
+    "title": "Bitcoin Surges Past $50,000",
+    "content": "<p>Bitcoin's price surged above $50,000.</p>",
+    "source": "a.com",
+    "timestamp": "2024-01-01T00:00:00",
+}
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        super().__init__(latency_ms=0)
+        self.calls = 0
+
+    async def analyze(self, article):
+        self.calls += 1
+        return await super().analyze(article)
+
+
+def test_key_ignores_markup_spacing_and_identity_but_not_model_or_prompt():
+    same_text = dict(ARTICLE, id="id-2", source="b.com", title="  bitcoin surges\npast $50,000 ",
+                     content="Bitcoin's price surged above $50,000.")
+    key = content_key(ARTICLE, "vllm:m1")
+    assert content_key(same_text, "vllm:m1") == key
+    assert content_key(ARTICLE, "vllm:m2") != key
+    assert content_key(ARTICLE, "vllm:m1", prompt_version="2") != key
+    assert content_key(dict(ARTICLE, content="Ether fell."), "vllm:m1") != key
+
+
+def test_repeated_content_is_analyzed_once():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        backend = CountingBackend()
+        analyzer = ArticleAnalyzer(backend, batch_size=1, cache=AnalysisCache(redis, backend.model_id, ttl=60))
+        hits = CACHE_LOOKUPS.value(result="hit")
+
+        first = await analyzer.analyze_article(ARTICLE)
+        repost = dict(ARTICLE, id="id-2", source="b.com", timestamp="2024-01-02T00:00:00")
+        second = await analyzer.analyze_article(repost)
+
+        assert backend.calls == 1
+        assert CACHE_LOOKUPS.value(result="hit") == hits + 1
+        assert second["summary"] == first["summary"] and second["cached"]
+        assert second["article_id"] == "id-2" and second["timestamp"] == "2024-01-02T00:00:00"
+
+        # A hit renews the entry's TTL
+        key = analyzer.cache.key(ARTICLE)
+        await redis.expire(key, 5)
+        await analyzer.analyze_article(ARTICLE)
+        assert await redis.ttl(key) > 5
+
+        # Another model does not see the old entry
+        analyzer.cache = AnalysisCache(redis, "stub:other", ttl=60)
+        await analyzer.analyze_article(ARTICLE)
+        assert backend.calls == 2
+
+    asyncio.run(run())
+
+
+def test_concurrent_articles_with_the_same_content_share_one_analysis():
+    async def run():
+        backend = CountingBackend()
+        cache = AnalysisCache(fakeredis.FakeAsyncRedis(decode_responses=True), backend.model_id, ttl=60)
+        analyzer = ArticleAnalyzer(backend, batch_size=1, cache=cache)
+
+        results = await asyncio.gather(*(
+            analyzer.analyze_article(dict(ARTICLE, id=f"id-{i}")) for i in range(3)
+        ))
+
+        assert backend.calls == 1
+        assert [result["article_id"] for result in results] == ["id-0", "id-1", "id-2"]
+        assert not analyzer._in_flight
+
+    asyncio.run(run())
@@ -0,0 +1,48 @@
+import pytest
+
+from analysis_model import AnalyzerModel, create_prompt
+
+pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+ARTICLES = [
+    {"id": "test-1", "title": "Bitcoin Surges", "content": "BTC rose.", "timestamp": "2024-01-01T00:00:00"},
+    {"id": "test-2", "title": "Fed Holds Rates Steady Again", "content": "Rates unchanged.", "timestamp": "2024-01-01T00:00:00"},
+]
+
+
+def test_prompt_contains_article():
+    prompt = create_prompt(ARTICLES[0])
+    assert "Title: Bitcoin Surges" in prompt and "5. Risk Level" in prompt
+
+
+@pytest.fixture
+def tiny_model(tmp_path) -> str:
+    """A randomly initialized two-layer GPT-2 with a word-level tokenizer, saved locally"""
+    words = sorted(set(create_prompt(ARTICLES[0]).split() + create_prompt(ARTICLES[1]).split()))
+    vocab = {"[UNK]": 0, "[EOS]": 1, **{word: i + 2 for i, word in enumerate(words)}}
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.WhitespaceSplit()
+    transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="[UNK]", eos_token="[EOS]"
+    ).save_pretrained(tmp_path)
+
+    config = transformers.GPT2Config(vocab_size=len(vocab), n_positions=128, n_embd=16, n_layer=2, n_head=2)
+    transformers.GPT2LMHeadModel(config).save_pretrained(tmp_path)
+    return str(tmp_path)
+
+
+def test_model_loads_once_and_serves_batches(tiny_model):
+    model = AnalyzerModel(tiny_model, max_length=64, max_new_tokens=4, device_map=None, torch_dtype="float32")
+    model.load()
+    weights = model.model
+    model.load()
+    assert model.model is weights
+
+    results = model.analyze_batch(ARTICLES)
+    assert [r["article_id"] for r in results] == ["test-1", "test-2"]
+    assert all(isinstance(r["analysis"], str) and r["model"] == tiny_model for r in results)
+    assert all(len(r["analysis"].split()) <= 4 for r in results)  # Generated text only, no echoed prompt
+    assert model.analyze_article(ARTICLES[0])["article_id"] == "test-1"
+    assert model.model is weights
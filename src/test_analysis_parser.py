@@ -0,0 +1,54 @@
+from analysis_model import create_prompt
+from analysis_parser import RiskLevel, parse_analysis, structure_analysis
+from prompts import build_prompt
+
+ARTICLE = {"id": "1", "title": "Bitcoin ETF inflows", "content": "Summary of the week", "source": "a.com"}
+
+ANALYSIS = """1. **Summary**: Spot bitcoin ETFs took in $1B this week.
+Flows were led by the largest issuers.
+2. Market Impact - Supportive for BTC in the short term.
+3. Trading Ideas (1-2 specific): Buy BTC dips above $60k; watch ETH/BTC.
+4. Key Assets: BTC, ETH and S&P 500.
+5. Risk Level: Moderate - regulatory headlines could reverse flows."""
+
+
+def test_sections_are_parsed_after_an_echoed_prompt():
+    for prompt in (create_prompt(ARTICLE), build_prompt(ARTICLE)):
+        parsed = parse_analysis(f"{prompt}\n{ANALYSIS}</s>")
+        assert parsed == {
+            "summary": "Spot bitcoin ETFs took in $1B this week. Flows were led by the largest issuers.",
+            "market_impact": "Supportive for BTC in the short term.",
+            "trading_ideas": "Buy BTC dips above $60k; watch ETH/BTC.",
+            "assets": ["BTC", "ETH", "S&P 500"],
+            "risk": "medium",
+            "risk_reason": "regulatory headlines could reverse flows.",
+        }
+
+
+def test_kaggle_server_headings_are_parsed():
+    parsed = parse_analysis("1. Summary: Calm.\n4. Assets: ETH\n5. Risk: Low, little news\nRisk appetite - fine")
+    assert parsed["assets"] == ["ETH"] and parsed["risk"] == "low"
+    assert parsed["risk_reason"] == "little news Risk appetite - fine"  # Not a heading: no separator after "Risk"
+
+
+def test_loose_text_is_kept_as_summary():
+    parsed = parse_analysis("Bitcoin looks calm.\nETH too, risk: high given leverage.")
+    assert parsed["summary"] == "Bitcoin looks calm. ETH too, risk: high given leverage."
+    assert parsed["risk"] == "high" and parsed["assets"] == []
+    assert parse_analysis("Key Assets: None identified\nRisk Level: unclear")["risk"] is None
+
+
+def test_results_are_structured_once():
+    result = {"article_id": "1", "analysis": ANALYSIS, "model": "m"}
+    structured = structure_analysis(result)
+    assert "analysis" not in structured and structured["model"] == "m"
+    assert structure_analysis(structured) == structured
+    assert len(str(structured)) < len(str(dict(result, analysis=create_prompt(ARTICLE) + ANALYSIS)))
+
+
+def test_risk_level_of_structured_and_legacy_analyses():
+    assert RiskLevel.of({"risk": "high"}) is RiskLevel.HIGH
+    assert RiskLevel.of({"risk": None}) is None
+    assert RiskLevel.of({"analysis": "Risk: Medium - volatile"}) is RiskLevel.MEDIUM
+    assert RiskLevel.of("Risk: Low") is None
+    assert RiskLevel.LOW < RiskLevel.HIGH
@@ -0,0 +1,178 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from analysis_queue import AnalysisBudget, AnalysisQueue, AnalysisWorkerPool
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_queue(**options) -> AnalysisQueue:
+    return AnalysisQueue(fakeredis.FakeAsyncRedis(decode_responses=True), **options)
+
+
+def article(i: int, minutes_ago: float = 0, **fields) -> dict:
+    published = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    return {"id": f"id-{i}", "title": f"Article {i}", "timestamp": published.isoformat(), **fields}
+
+
+async def claim_all(queue: AnalysisQueue) -> list:
+    ids = []
+    while (claimed := await queue.claim(timeout=0.05)) is not None:
+        ids.append(claimed[0])
+        await queue.ack(claimed[0])
+    return ids
+
+
+async def stored_count(queue: AnalysisQueue) -> int:
+    return await queue.redis.hlen(queue.items_key)
+
+
+def test_workers_analyze_concurrently_and_ack():
+    async def run():
+        queue = make_queue()
+        for i in range(4):
+            await queue.enqueue(article(i))
+        results = {}
+        started, all_started, all_done = [], asyncio.Event(), asyncio.Event()
+
+        async def analyze(item):
+            # Each analysis waits for all four to start, so they must run in parallel
+            started.append(item["id"])
+            if len(started) == 4:
+                all_started.set()
+            await all_started.wait()
+            return {"analysis": f"done {item['id']}"}
+
+        async def on_result(item, analysis):
+            results[item["id"]] = analysis
+            if len(results) == 4:
+                all_done.set()
+
+        async def acked():
+            while await stored_count(queue):
+                await asyncio.sleep(0.01)
+
+        pool = AnalysisWorkerPool(queue, analyze, on_result, concurrency=4, timeout=1)
+        task = asyncio.create_task(pool.run())
+        await asyncio.wait_for(all_done.wait(), 2)
+        await asyncio.wait_for(acked(), 2)
+        task.cancel()
+
+        assert sorted(results) == ["id-0", "id-1", "id-2", "id-3"]
+        assert await queue.depth() == 0
+        assert await stored_count(queue) == 0
+
+    asyncio.run(run())
+
+
+def test_timed_out_analysis_is_retried_then_dropped():
+    async def run():
+        queue = make_queue()
+        await queue.enqueue(article(0))
+        calls = []
+
+        async def analyze(item):
+            calls.append(item["id"])
+            await asyncio.sleep(1)
+
+        async def on_result(item, analysis):
+            raise AssertionError("no analysis expected")
+
+        pool = AnalysisWorkerPool(queue, analyze, on_result, timeout=0.01, max_attempts=2)
+        for _ in range(2):
+            await pool.process(*await queue.claim(timeout=0.1))
+        assert calls == ["id-0", "id-0"]
+        assert await queue.depth() == 0
+        assert await stored_count(queue) == 0
+
+    asyncio.run(run())
+
+
+def test_unfinished_analyses_are_recovered():
+    async def run():
+        queue = make_queue()
+        await queue.enqueue(article(0, minutes_ago=5))
+        await queue.enqueue(article(1, minutes_ago=10))
+        await queue.claim(timeout=0.1)  # Claimed by a worker that then died
+        # Left in a list by the previous version of the queue
+        await queue.redis.lpush("analysis:processing", json.dumps({"article": article(2, minutes_ago=1)}))
+
+        assert await queue.recover() == 2
+        assert await claim_all(queue) == ["id-2", "id-0", "id-1"]
+
+    asyncio.run(run())
+
+
+def test_newest_and_prioritized_articles_are_claimed_first():
+    async def run():
+        queue = make_queue(priorities={"CoinDesk.com": 600, "etf": 1200})
+        await queue.enqueue(article(0, minutes_ago=1, source="a.com"))
+        await queue.enqueue(article(1, minutes_ago=30, source="a.com"))
+        await queue.enqueue(article(2, minutes_ago=15, source="coindesk.com"))
+        await queue.enqueue(article(3, minutes_ago=15, source="a.com", categories=[{"term": "ETF"}]))
+        # Ranked as published: id-3 in 5 minutes, id-0 1 minute ago, id-2 5 minutes ago, id-1 30 minutes ago
+        assert await claim_all(queue) == ["id-3", "id-0", "id-2", "id-1"]
+
+    asyncio.run(run())
+
+
+def test_articles_past_their_deadline_are_downgraded_or_dropped():
+    async def run():
+        queue = make_queue(deadline=600)
+        await queue.enqueue(article(0, minutes_ago=60))
+        await queue.enqueue(article(1, minutes_ago=20))
+        await queue.enqueue(article(2, minutes_ago=1))
+        # Stale articles are still analyzed, oldest news last
+        assert await claim_all(queue) == ["id-2", "id-1", "id-0"]
+
+        queue = make_queue(deadline=600, deadline_action="drop")
+        await queue.enqueue(article(0, minutes_ago=60))
+        await queue.enqueue(article(1, minutes_ago=1))
+        assert await claim_all(queue) == ["id-1"]
+        assert await stored_count(queue) == 0
+
+    asyncio.run(run())
+
+
+def test_backlog_is_bounded_and_reports_its_age():
+    async def run():
+        queue = make_queue(max_backlog=2)
+        for i in range(4):
+            await queue.enqueue(article(i, minutes_ago=i))
+        assert await queue.depth() == 2
+        assert await stored_count(queue) == 2
+
+        await asyncio.sleep(0.05)
+        backlog = await queue.backlog()
+        assert backlog["depth"] == 2 and backlog["oldest_age_seconds"] >= 0.05
+        assert await claim_all(queue) == ["id-0", "id-1"]
+        assert (await queue.backlog())["oldest_age_seconds"] == 0
+
+    asyncio.run(run())
+
+
+def test_budget_holds_workers_back_once_spent():
+    async def run():
+        budget = AnalysisBudget("stub", hourly_budget=2, cost=1)
+        # Waiting reserves, so of four concurrent workers only two get through
+        waits = [asyncio.create_task(budget.wait()) for _ in range(4)]
+        done, pending = await asyncio.wait(waits, timeout=0.1)
+        assert len(done) == 2 and len(pending) == 2
+        for task in pending:
+            task.cancel()
+        assert budget.spent == 2
+
+        budget.refund()  # A worker found nothing to analyze
+        await asyncio.wait_for(budget.wait(), 0.1)
+        assert budget.spent == 2
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(budget.wait(), 0.1)
+
+        budget._spent[0] = (budget._spent[0][0] - AnalysisBudget.WINDOW, 1)  # An hour has passed
+        await asyncio.wait_for(budget.wait(), 0.1)
+        assert budget.spent == 2
+
+    asyncio.run(run())
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from analysis_queue import AnalysisBudget
+from analyzer_backends import AnalyzerBackend, KaggleBackend, RouterBackend, StubBackend, VLLMBackend, create_backend
+from prompts import PROMPT_VERSION
+
+ARTICLE = {
+    "id": "id-1",
+    "title": "Bitcoin Surges Past $50,000",
+    "content": "Bitcoin's price surged above $50,000 driven by ETF approvals.",
+    "source": "test.com",
+    "timestamp": "2024-01-01T00:00:00",
+    "assets": ["BTC"],
+}
+
+
+def test_stub_is_deterministic_with_configured_latency():
+    async def run():
+        backend = StubBackend(latency_ms=20)
+        started = time.perf_counter()
+        first = await backend.analyze(ARTICLE)
+        assert time.perf_counter() - started >= 0.02
+        second = await backend.analyze(ARTICLE)
+        assert first["analysis"] == second["analysis"]
+        assert "4. Key Assets: BTC" in first["analysis"]
+        assert first["backend"] == "stub" and first["prompt_version"] == PROMPT_VERSION
+
+    asyncio.run(run())
+
+
+def test_http_backends_against_local_servers():
+    requests = {}
+
+    async def completions(request):
+        requests["vllm"] = await request.json()
+        return web.json_response({"model": "finance-7b", "choices": [{"text": " Risk Level: Low "}]})
+
+    async def analyze(request):
+        requests["kaggle"] = await request.json()
+        return web.json_response({"article_id": "id-1", "analysis": "Risk: High", "model": "llama2"})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/completions", completions)
+        app.router.add_post("/analyze", analyze)
+        async with TestServer(app) as server:
+            base_url = str(server.make_url(""))
+            vllm = VLLMBackend(base_url, "finance-7b", max_tokens=64)
+            kaggle = KaggleBackend(base_url)
+            try:
+                vllm_result = await vllm.analyze(ARTICLE)
+                kaggle_result = await kaggle.analyze(ARTICLE)
+            finally:
+                await vllm.close()
+                await kaggle.close()
+
+        assert vllm_result["analysis"] == "Risk Level: Low"
+        assert vllm_result["model"] == "finance-7b"
+        assert ARTICLE["title"] in requests["vllm"]["prompt"]
+        assert requests["vllm"]["max_tokens"] == 64
+        assert kaggle_result["analysis"] == "Risk: High"
+        assert requests["kaggle"]["id"] == "id-1" and "assets" not in requests["kaggle"]
+
+    asyncio.run(run())
+
+
+def test_streamed_analyses_from_vllm_and_stub():
+    async def completions(request):
+        assert (await request.json())["stream"] is True
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for text in ["\n", "Risk ", "Level: ", "Low"]:
+            await response.write(f'data: {{"choices": [{{"index": 0, "text": {json.dumps(text)}}}]}}\n\n'.encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/completions", completions)
+        async with TestServer(app) as server:
+            vllm = VLLMBackend(str(server.make_url("")), "finance-7b")
+            pieces = []
+
+            async def on_text(text):
+                pieces.append(text)
+
+            try:
+                result = await vllm.analyze_streaming(ARTICLE, on_text)
+            finally:
+                await vllm.close()
+
+        assert pieces == ["Risk ", "Level: ", "Low"]
+        assert result["analysis"] == "Risk Level: Low" and result["model"] == "finance-7b"
+
+        stub = StubBackend(latency_ms=20)
+        streamed = [text async for text in stub.analyze_stream(ARTICLE)]
+        assert len(streamed) > 1
+        assert "".join(streamed) == (await stub.analyze(ARTICLE))["analysis"]
+
+    asyncio.run(run())
+
+
+def test_failed_kaggle_streams_raise():
+    async def analyze_stream(request):
+        body = await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b'data: {"text": "Risk "}\n\n')
+        if body["title"] == "error":
+            await response.write(b'data: {"error": "CUDA out of memory"}\n\n')
+        return response  # Neither ends with [DONE]
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/analyze_stream", analyze_stream)
+        async with TestServer(app) as server:
+            kaggle = KaggleBackend(str(server.make_url("")))
+            try:
+                for title, message in (("error", "CUDA out of memory"), ("aborted", "before \\[DONE\\]")):
+                    with pytest.raises(RuntimeError, match=message):
+                        [text async for text in kaggle.analyze_stream({**ARTICLE, "title": title})]
+            finally:
+                await kaggle.close()
+
+    asyncio.run(run())
+
+
+class PlainBackend(AnalyzerBackend):
+    """A backend without streaming"""
+    name = "plain"
+
+    async def analyze(self, article):
+        return {"article_id": article["id"], "analysis": "Risk Level: Low", "backend": self.name}
+
+
+def test_backends_without_streaming_stream_the_whole_analysis():
+    async def run():
+        backend = PlainBackend()
+        assert [text async for text in backend.analyze_stream(ARTICLE)] == ["Risk Level: Low"]
+        pieces = []
+
+        async def on_text(text):
+            pieces.append(text)
+
+        result = await backend.analyze_streaming(ARTICLE, on_text)
+        assert pieces == ["Risk Level: Low"]
+        assert result == await backend.analyze(ARTICLE)
+
+    asyncio.run(run())
+
+
+class FlakyBackend(StubBackend):
+    """A stub that fails while `failing` is set and notes cancelled calls"""
+
+    def __init__(self, latency_ms: float, failing: bool = False):
+        super().__init__(latency_ms=latency_ms)
+        self.failing = failing
+        self.calls = 0
+        self.cancelled = 0
+
+    async def analyze(self, article):
+        self.calls += 1
+        try:
+            result = await super().analyze(article)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.failing:
+            raise RuntimeError("backend down")
+        return dict(result, model=f"{self.latency_ms:.0f}ms")
+
+
+def test_router_prefers_the_faster_backend():
+    async def run():
+        slow, fast = FlakyBackend(60), FlakyBackend(5)
+        router = RouterBackend([slow, fast], hedge_delay_ms=1000)
+        for _ in range(6):
+            await router.analyze(ARTICLE)
+        # Each is tried once, then the faster one gets the traffic
+        assert slow.calls == 1 and fast.calls == 5
+        assert router.model == "stub:stub+stub:stub"
+
+    asyncio.run(run())
+
+
+def test_router_hedges_slow_calls_and_cancels_the_loser():
+    async def run():
+        slow, fast = FlakyBackend(300), FlakyBackend(5)
+        router = RouterBackend([slow, fast], hedge_delay_ms=30)
+        started = time.perf_counter()
+        result = await router.analyze(ARTICLE)
+        assert time.perf_counter() - started < 0.2
+        assert result["model"] == "5ms"
+        await asyncio.sleep(0)
+        assert slow.cancelled == 1 and router.hedge_ratio > 0
+
+        # With too many calls hedged lately, slow calls just wait
+        router = RouterBackend([FlakyBackend(100), fast], hedge_delay_ms=30, max_hedge_ratio=0)
+        assert (await router.analyze(ARTICLE))["model"] == "100ms"
+
+    asyncio.run(run())
+
+
+def test_router_fails_over_and_ranks_failing_backends_last():
+    async def run():
+        down, up = FlakyBackend(1, failing=True), FlakyBackend(20)
+        router = RouterBackend([down, up], hedge_delay_ms=1000)
+        assert (await router.analyze(ARTICLE))["model"] == "20ms"
+        assert router.ranked("single") == [up, down]
+        assert (await router.analyze_batch([ARTICLE]))[0]["article_id"] == ARTICLE["id"]
+
+        up.failing = True
+        with pytest.raises(RuntimeError):
+            await router.analyze(ARTICLE)
+
+    asyncio.run(run())
+
+
+class DownStreamingBackend(StubBackend):
+    """A streaming stub that fails before its first piece of text"""
+
+    async def analyze_stream(self, article):
+        raise RuntimeError("backend down")
+        yield
+
+
+def test_router_streams_fail_over_to_backends_without_streaming():
+    async def run():
+        down, plain = DownStreamingBackend(latency_ms=1), PlainBackend()
+        router = RouterBackend([plain, down], hedge_delay_ms=1000)
+        assert router.streams and router.ranked("stream", streaming=True) == [down, plain]
+        pieces = []
+
+        async def on_text(text):
+            pieces.append(text)
+
+        result = await router.analyze_streaming(ARTICLE, on_text)
+        assert pieces == ["Risk Level: Low"] and result["backend"] == "plain"
+        # The failed backend now ranks after the one that answered
+        assert router.ranked("stream", streaming=True) == [plain, down]
+        assert [text async for text in router.analyze_stream(ARTICLE)] == ["Risk Level: Low"]
+
+    asyncio.run(run())
+
+
+class SilentBackend(StubBackend):
+    """A streaming stub whose stream ends without any text"""
+
+    async def analyze_stream(self, article):
+        yield "  "
+
+
+def test_empty_streams_fail_over_instead_of_succeeding():
+    async def run():
+        async def on_text(text):
+            raise AssertionError("no text expected")
+
+        silent = SilentBackend(latency_ms=1)
+        assert await silent.analyze_streaming(ARTICLE, on_text) is None
+
+        router = RouterBackend([silent, PlainBackend()], hedge_delay_ms=1000)
+        pieces = []
+
+        async def collect(text):
+            pieces.append(text)
+
+        result = await router.analyze_streaming(ARTICLE, collect)
+        assert result["backend"] == "plain" and pieces == ["Risk Level: Low"]
+
+    asyncio.run(run())
+
+
+def test_router_applies_limits_per_backend():
+    async def run():
+        metered, spare = FlakyBackend(1), FlakyBackend(20)
+        metered.name, spare.name = "metered", "spare"
+        router = RouterBackend(
+            [metered, spare], hedge_delay_ms=1000,
+            concurrency={"metered": 1}, budgets={"metered": AnalysisBudget("metered", hourly_budget=3, cost=1)}
+        )
+        # The metered backend takes one call at a time; the others overflow to the spare
+        results = await asyncio.gather(*(router.analyze(ARTICLE) for _ in range(2)))
+        assert sorted(result["model"] for result in results) == ["1ms", "20ms"]
+        assert metered.calls == 1 and spare.calls == 1
+
+        # Once its budget is spent it is skipped
+        await router.analyze(ARTICLE)
+        await router.analyze(ARTICLE)
+        assert metered.calls == 3 and router.budgets["metered"].exhausted
+        await router.analyze(ARTICLE)
+        assert metered.calls == 3 and spare.calls == 2
+
+    asyncio.run(run())
+
+
+def test_create_backend_by_name():
+    assert isinstance(create_backend("STUB"), StubBackend)
+    router = create_backend("stub, stub")
+    assert isinstance(router, RouterBackend) and len(router.backends) == 2
+    with pytest.raises(ValueError):
+        create_backend("unknown")
@@ -0,0 +1,44 @@
+import json
+import os
+
+from assets import AssetTagger, _Automaton
+
+
+def test_names_and_tickers_are_tagged():
+    tagger = AssetTagger()
+    article = {
+        "title": "Bitcoin and Ether slip as $SOL rallies",
+        "content": "<p>Shiba Inu holders and XRP traders watched BTC closely.</p>"
+    }
+    assert tagger.tag(article) == ["BTC", "ETH", "SHIB", "SOL", "XRP"]
+
+
+def test_ambiguous_words_need_ticker_form():
+    tagger = AssetTagger()
+    assert tagger.tag_text("Click the link below to connect the dots, sol.") == []
+    assert tagger.tag_text("LINK and DOT outperformed; Chainlink led") == ["DOT", "LINK"]
+    assert tagger.tag_text("Methodology of the bitcoiners") == []  # Whole words only
+
+
+def test_overlapping_names_are_all_found():
+    automaton = _Automaton([(["bitcoin"], "BTC"), (["bitcoin", "cash"], "BCH"), (["cash", "app"], "SQ")])
+    assert automaton.search("the bitcoin cash app".split()) == {"BTC", "BCH", "SQ"}
+    assert automaton.search("bitcoin bitcoin cash".split()) == {"BTC", "BCH"}
+
+
+def test_dictionary_is_reloaded_when_changed(tmp_path):
+    path = tmp_path / "assets.json"
+    path.write_text(json.dumps({"BTC": ["bitcoin"]}))
+    tagger = AssetTagger(path=str(path))
+    assert tagger.tag_text("Bitcoin and Kaspa") == ["BTC"]
+    assert not tagger.reload()
+
+    path.write_text(json.dumps({"BTC": ["bitcoin"], "KAS": ["kaspa"]}))
+    os.utime(path, (0, 1))
+    assert tagger.reload()
+    assert tagger.tag_text("Bitcoin and Kaspa") == ["BTC", "KAS"]
+
+    path.write_text("not json")
+    os.utime(path, (0, 2))
+    assert not tagger.reload()
+    assert tagger.tag_text("Bitcoin and Kaspa") == ["BTC", "KAS"]  # Kept the last good dictionary
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from analyzer_backends import StubBackend
+from article_analyzer import ArticleAnalyzer
+from batching import MicroBatcher, TokenCoalescer
+
+
+class StubModel:
+    """Batch model recording the batches it was called with"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def process(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(0.01)
+        return [ValueError(item) if item == "bad" else item.upper() for item in items]
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    async def run():
+        model = StubModel()
+        batcher = MicroBatcher(model.process, max_batch=3, window_ms=10_000)
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(x) for x in "abc")), 1)
+        assert results == ["A", "B", "C"]
+        assert model.batches == [["a", "b", "c"]]
+
+    asyncio.run(run())
+
+
+def test_window_flushes_partial_batches_and_scatters_errors():
+    async def run():
+        model = StubModel()
+        batcher = MicroBatcher(model.process, max_batch=8, window_ms=20)
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("bad"), batcher.submit("c"), return_exceptions=True
+        )
+        assert results[0] == "A" and results[2] == "C"
+        assert isinstance(results[1], ValueError)
+        assert model.batches == [["a", "bad", "c"]]
+
+        # A later request starts a new batch
+        assert await batcher.submit("d") == "D"
+        assert model.batches[-1] == ["d"]
+
+    asyncio.run(run())
+
+
+def test_failed_batch_fails_every_caller():
+    async def run():
+        async def broken(items):
+            raise RuntimeError("model offline")
+
+        batcher = MicroBatcher(broken, max_batch=2, window_ms=10)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(run())
+
+
+def test_analyzer_batches_concurrent_articles():
+    async def run():
+        backend = StubBackend(latency_ms=50)
+        calls = []
+        analyze_batch = backend.analyze_batch
+
+        async def counting(articles):
+            calls.append(len(articles))
+            return await analyze_batch(articles)
+
+        backend.analyze_batch = counting
+        analyzer = ArticleAnalyzer(backend, batch_size=4, batch_window_ms=20)
+        articles = [{"id": f"id-{i}", "title": f"Article {i}"} for i in range(4)]
+        results = await asyncio.gather(*(analyzer.analyze_article(a) for a in articles))
+        assert [r["article_id"] for r in results] == ["id-0", "id-1", "id-2", "id-3"]
+        assert calls == [4]
+
+    asyncio.run(run())
+
+
+def test_coalescer_sends_first_token_at_once_then_merges_until_the_interval():
+    async def run():
+        deltas = []
+
+        async def emit(text, offset):
+            deltas.append((text, offset))
+
+        coalescer = TokenCoalescer(emit, interval_ms=50)
+        for token in ["Bit", "coin ", "rose ", "5%"]:
+            await coalescer.add(token)
+        assert deltas == [("Bit", 0)]
+
+        await asyncio.sleep(0.06)
+        await coalescer.add(" today")
+        await coalescer.flush()
+        assert deltas == [("Bit", 0), ("coin rose 5% today", 3)]
+
+    asyncio.run(run())
+
+
+def test_streaming_analyzer_sends_deltas_that_add_up_to_the_result():
+    async def run():
+        deltas = []
+
+        async def on_delta(text, offset):
+            deltas.append((text, offset))
+
+        analyzer = ArticleAnalyzer(StubBackend(latency_ms=40), batch_size=8, delta_interval_ms=15)
+        result = await analyzer.analyze_article({"id": "a", "title": "Ether upgrade ships"}, on_delta)
+
+        streamed = "".join(text for text, _ in deltas)
+        assert 1 < len(deltas) < len(streamed.split())
+        assert result["summary"] == "Ether upgrade ships" and streamed.startswith("1. Summary: Ether upgrade ships")
+        assert all(offset == sum(len(t) for t, _ in deltas[:i]) for i, (_, offset) in enumerate(deltas))
+
+    asyncio.run(run())
@@ -0,0 +1,260 @@
+import asyncio
+import json
+
+import pytest
+
+from broadcast import BroadcastHub, SubscriberLagged, parse_event_id
+from subscriptions import EventAttributes, Subscription
+
+
+def decode(frame: bytes) -> dict:
+    assert frame.startswith(b"id: ") and frame.endswith(b"\n\n")
+    return json.loads(frame.split(b"\ndata: ", 1)[1])
+
+
+def publish(hub: BroadcastHub, data: dict, event_id=None) -> str:
+    return hub.publish(json.dumps(data), event_id)
+
+
+def test_event_is_encoded_once_for_all_subscribers():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+        first, second = hub.subscribe("a"), hub.subscribe("b")
+        publish(hub, {"type": "article", "data": {"id": "1"}})
+
+        frames_a = await first.next_frames()
+        frames_b = await second.next_frames()
+        assert frames_a[0] is frames_b[0]
+        assert decode(frames_a[0])["data"]["id"] == "1"
+
+    asyncio.run(run())
+
+
+def test_subscriber_waits_for_publish():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+        subscriber = hub.subscribe("a")
+        reader = asyncio.create_task(subscriber.next_frames())
+        await asyncio.sleep(0)
+        assert not reader.done()
+
+        publish(hub, {"type": "article"})
+        publish(hub, {"type": "analysis"})
+        frames = await asyncio.wait_for(reader, 1)
+        assert [decode(f)["type"] for f in frames] == ["article", "analysis"]
+        assert subscriber.pending == 0
+
+    asyncio.run(run())
+
+
+def test_lagging_subscriber_is_resynced_to_head():
+    async def run():
+        hub = BroadcastHub(capacity=4)
+        subscriber = hub.subscribe("slow")
+        for i in range(10):
+            publish(hub, {"seq": i})
+
+        with pytest.raises(SubscriberLagged) as exc_info:
+            await subscriber.next_frames()
+        assert exc_info.value.missed == 6
+        assert subscriber.pending == 0
+
+        publish(hub, {"seq": 10})
+        frames = await subscriber.next_frames()
+        assert [decode(f)["seq"] for f in frames] == [10]
+
+    asyncio.run(run())
+
+
+def test_close_drains_then_stops():
+    async def run():
+        hub = BroadcastHub(capacity=4)
+        subscriber = hub.subscribe("a")
+        publish(hub, {"type": "shutdown"})
+        hub.close()
+        assert [decode(f)["type"] for f in await subscriber.next_frames()] == ["shutdown"]
+        assert await subscriber.next_frames() == []
+        hub.unsubscribe("a")
+        assert hub.client_count == 0
+
+    asyncio.run(run())
+
+
+def test_event_ids_are_monotonic():
+    hub = BroadcastHub(capacity=4)
+    ids = [publish(hub, {"seq": i}) for i in range(5)]
+    assert [parse_event_id(i) for i in ids] == sorted(parse_event_id(i) for i in ids)
+    assert len(set(ids)) == 5
+    assert hub.last_event_id == ids[-1]
+
+
+def test_replay_after_returns_missed_frames():
+    hub = BroadcastHub(capacity=4)
+    for i in range(6):
+        publish(hub, {"seq": i}, f"100-{i}")
+
+    assert [decode(f)["seq"] for f in hub.replay_after("100-3")] == [4, 5]
+    assert hub.replay_after("100-5") == []
+    # 100-1 has been overwritten, so the gap cannot be replayed from the ring
+    assert hub.replay_after("100-0") is None
+    with pytest.raises(ValueError):
+        hub.replay_after("not-an-id")
+
+
+def test_transient_events_are_streamed_but_not_replayed():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+        subscriber = hub.subscribe("c1")
+        publish(hub, {"seq": 0}, "100-0")
+        hub.publish(json.dumps({"type": "analysis_delta"}), transient=True)
+        publish(hub, {"seq": 1}, "100-1")
+
+        frames = await subscriber.next_frames()
+        assert frames[1] == b'data: {"type": "analysis_delta"}\n\n'
+        assert hub.last_event_id == "100-1"
+        assert [decode(f)["seq"] for f in hub.replay_after("100-0")] == [1]
+
+    asyncio.run(run())
+
+
+def test_transient_events_are_not_replayed_from_an_earlier_id():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+        publish(hub, {"seq": 0}, "100-0")
+        publish(hub, {"seq": 1}, "100-1")
+        for _ in range(3):
+            hub.publish(json.dumps({"type": "analysis_delta"}), transient=True)
+        publish(hub, {"seq": 2}, "100-2")
+
+        # The deltas carry 100-1, which is after the client's ID, but are still left out
+        assert [decode(f)["seq"] for f in hub.replay_after("100-0")] == [1, 2]
+        assert [decode(f)["seq"] for f in hub.replay_after("100-1")] == [2]
+
+    asyncio.run(run())
+
+
+def test_skip_through_drops_already_replayed_events():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+        subscriber = hub.subscribe("a")
+        for i in range(3):
+            publish(hub, {"seq": i}, f"200-{i}")
+        subscriber.skip_through("200-1")
+        assert [decode(f)["seq"] for f in await subscriber.next_frames()] == [2]
+
+    asyncio.run(run())
+
+
+def test_filtered_subscriber_receives_only_matching_events():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+        everyone = hub.subscribe("all")
+        btc = hub.subscribe("btc", Subscription(assets=frozenset(["BTC"])))
+
+        hub.publish(json.dumps({"seq": 0}), attrs=EventAttributes(assets=frozenset(["ETH"])))
+        hub.publish(json.dumps({"seq": 1}), attrs=EventAttributes(assets=frozenset(["BTC"])))
+        hub.publish(json.dumps({"seq": 2}))  # No attributes: delivered to everyone
+
+        assert [decode(f)["seq"] for f in await everyone.next_frames()] == [0, 1, 2]
+        assert [decode(f)["seq"] for f in await btc.next_frames()] == [1, 2]
+        assert [decode(f)["seq"] for f in hub.replay_after(hub.event_at(0).id, btc.subscription)] == [1, 2]
+
+        hub.unsubscribe("btc")
+        assert len(hub.subscriptions) == 0
+
+    asyncio.run(run())
+
+
+def test_filtered_subscriber_lags_past_capacity():
+    async def run():
+        hub = BroadcastHub(capacity=2)
+        btc = hub.subscribe("btc", Subscription(assets=frozenset(["BTC"])))
+        for i in range(3):
+            hub.publish(json.dumps({"seq": i}), attrs=EventAttributes(assets=frozenset(["BTC"])))
+        with pytest.raises(SubscriberLagged):
+            await btc.next_frames()
+        hub.close()
+        assert await btc.next_frames() == []
+
+    asyncio.run(run())
+
+
+def test_poll_events_returns_pending_without_waiting():
+    hub = BroadcastHub(capacity=8)
+    subscriber = hub.subscribe("a")
+    assert subscriber.poll_events() == []
+    publish(hub, {"seq": 0})
+    publish(hub, {"seq": 1})
+    events = subscriber.poll_events()
+    assert [json.loads(e.payload)["seq"] for e in events] == [0, 1]
+    assert events[0].frame.endswith(events[0].payload.encode() + b"\n\n")
+
+
+def test_pending_bytes_tracks_unread_frames():
+    async def run():
+        hub = BroadcastHub(capacity=4)
+        everyone = hub.subscribe("all")
+        btc = hub.subscribe("btc", Subscription(assets=frozenset(["BTC"])))
+        first = hub.publish(json.dumps({"seq": 0}), attrs=EventAttributes(assets=frozenset(["BTC"])))
+        hub.publish(json.dumps({"seq": 1}), attrs=EventAttributes(assets=frozenset(["ETH"])))
+
+        frames = [hub.event_at(i).frame for i in range(2)]
+        assert everyone.pending_bytes == len(frames[0]) + len(frames[1])
+        assert btc.pending_bytes == len(frames[0])
+        btc.skip_through(first)
+        assert btc.pending_bytes == 0
+        await everyone.next_frames()
+        assert everyone.pending_bytes == 0
+
+    asyncio.run(run())
+
+
+def test_reaper_cancels_stalled_clients():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+
+        async def stalled_client():
+            subscriber = hub.subscribe("stalled")
+            # A write the transport never completes
+            await subscriber.write(asyncio.Event().wait(), timeout=60)
+
+        async def reader():
+            subscriber = hub.subscribe("reader")
+            while await subscriber.next_frames():
+                pass
+
+        stalled = asyncio.create_task(stalled_client())
+        healthy = asyncio.create_task(reader())
+        await asyncio.sleep(0)
+        publish(hub, {"seq": 0})
+
+        reaper = asyncio.create_task(hub.reap(0.01, max_pending_bytes=1024, write_timeout=0.02))
+        await asyncio.sleep(0.1)
+        assert stalled.cancelled()
+        assert not healthy.done()
+        assert hub.client_count == 1
+        reaper.cancel()
+
+        hub.close()
+        await hub.drain(timeout=1)
+        assert healthy.done() and not healthy.cancelled()
+
+    asyncio.run(run())
+
+
+def test_drain_cancels_clients_that_do_not_finish():
+    async def run():
+        hub = BroadcastHub(capacity=8)
+
+        async def stuck_client():
+            hub.subscribe("stuck")
+            await asyncio.Event().wait()
+
+        stuck = asyncio.create_task(stuck_client())
+        await asyncio.sleep(0)
+        hub.close()
+        await hub.drain(timeout=0.01)
+        await asyncio.sleep(0)
+        assert stuck.cancelled()
+
+    asyncio.run(run())
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from leader import LeaderElection
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs it for EVAL
+
+
+def test_single_leader_and_release():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = LeaderElection(redis, lease_ms=1000, worker_id="a")
+        second = LeaderElection(redis, lease_ms=1000, worker_id="b")
+
+        assert await first.try_acquire()
+        assert not await second.try_acquire()
+        assert await first.try_acquire()  # Renewal keeps the lease
+
+        await first.release()
+        assert not first.is_leader
+        assert await second.try_acquire()
+
+    asyncio.run(run())
+
+
+def test_expired_lease_is_taken_over_and_not_renewed():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = LeaderElection(redis, lease_ms=1000, worker_id="a")
+        second = LeaderElection(redis, lease_ms=1000, worker_id="b")
+
+        assert await first.try_acquire()
+        await redis.delete("poller:leader")  # Lease expired
+        assert await second.try_acquire()
+        assert not await first.try_acquire()
+        assert await redis.get("poller:leader") == "b"
+
+    asyncio.run(run())
+
+
+def test_run_starts_and_stops_leader_task():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        election = LeaderElection(redis, lease_ms=150, worker_id="a")
+        started = asyncio.Event()
+        stopped = asyncio.Event()
+
+        async def lead():
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            finally:
+                stopped.set()
+
+        runner = asyncio.create_task(election.run(lead))
+        await asyncio.wait_for(started.wait(), 1)
+
+        # Another worker steals the lease: the leader task must stop
+        await redis.set("poller:leader", "b")
+        await asyncio.wait_for(stopped.wait(), 1)
+
+        runner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await runner
+        assert await redis.get("poller:leader") == "b"
+
+    asyncio.run(run())
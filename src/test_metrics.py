@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, Registry, timed
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    fetches = registry.register(Counter("fetches_total", "Fetches", ["host", "status"]))
+    clients = registry.register(Gauge("clients", "Clients"))
+    fetches.inc(host="a.com", status="200")
+    fetches.inc(2, host="a.com", status="200")
+    clients.set_function(lambda: 3)
+
+    text = registry.render()
+    assert "# TYPE fetches_total counter" in text
+    assert 'fetches_total{host="a.com",status="200"} 3' in text
+    assert "clients 3" in text
+    assert text.endswith("\n")
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram("latency_seconds", "Latency", ["op"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, op="get")
+
+    samples = latency.samples()
+    assert 'latency_seconds_bucket{op="get",le="0.1"} 1' in samples
+    assert 'latency_seconds_bucket{op="get",le="1"} 2' in samples
+    assert 'latency_seconds_bucket{op="get",le="+Inf"} 3' in samples
+    assert 'latency_seconds_count{op="get"} 3' in samples
+
+
+def test_timed_decorator_and_label_validation():
+    latency = Histogram("call_seconds", "Calls", ["op"])
+
+    @timed(latency, op="fetch")
+    async def fetch():
+        return 42
+
+    assert asyncio.run(fetch()) == 42
+    assert latency.count(op="fetch") == 1
+    with pytest.raises(ValueError):
+        latency.observe(1.0, other="x")
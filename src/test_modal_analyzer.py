@@ -13,8 +13,8 @@ async def test_analysis():
     logger.info("Starting Modal analyzer test...")
     
     try:
-        # Import the analyzer app
-        app = modal.App.from_name("financial-news-analyzer")
+        # Look up the deployed analyzer service
+        service = modal.Cls.from_name("financial-news-analyzer", "ModelService")()
         
         test_articles = [
             {
@@ -39,7 +39,7 @@ async def test_analysis():
             try:
                 # Call the Modal function with timeout
                 result = await asyncio.wait_for(
-                    app.analyze_article.remote.aio(article),
+                    service.analyze_article.remote.aio(article),
                     timeout=60
                 )
                 
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from nlp_engine import NLPEngine
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class StubModels:
+    """Tiny stand-ins for the summarizer and the sentiment classifier"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.batches = []
+        self.threads = set()
+        self.spans = {}  # (start, end) of each model's last call
+
+    def _run(self, model: str) -> None:
+        self.threads.add(threading.current_thread().name)
+        started = time.perf_counter()
+        time.sleep(self.delay)
+        self.spans[model] = (started, time.perf_counter())
+
+    def summarize(self, texts):
+        self.batches.append(len(texts))
+        self._run("summarize")
+        return [text.split(".")[0] for text in texts]
+
+    def classify(self, texts):
+        self._run("classify")
+        return [{"label": "Positive" if "rall" in text else "Negative", "score": 0.9} for text in texts]
+
+
+def article(i: int, title: str) -> dict:
+    return {"id": f"id-{i}", "title": title, "content": "More details."}
+
+
+def test_articles_are_labeled_in_batches_off_the_event_loop():
+    async def run():
+        models = StubModels()
+        engine = NLPEngine(models.summarize, models.classify, batch_size=8, batch_window_ms=20)
+        ticks = []
+
+        async def tick():
+            while True:
+                await asyncio.sleep(0.005)
+                ticks.append(time.perf_counter())
+
+        ticker = asyncio.create_task(tick())
+        labels = await engine.label_many([article(i, "Bitcoin rallies" if i % 2 else "Ether slides") for i in range(8)])
+        ticker.cancel()
+        engine.close()
+
+        assert models.batches == [8]
+        (summary_start, summary_end), (sentiment_start, sentiment_end) = models.spans["summarize"], models.spans["classify"]
+        # Both models of the batch ran at once, and the event loop kept running meanwhile
+        assert summary_start < sentiment_end and sentiment_start < summary_end
+        assert any(summary_start < t < summary_end for t in ticks)
+        assert len(models.threads) == 2 and all(name.startswith("nlp") for name in models.threads)
+        assert labels["id-1"]["summary"] == "Bitcoin rallies" and labels["id-1"]["sentiment"] == "positive"
+        assert labels["id-0"]["sentiment"] == "negative" and labels["id-0"]["sentiment_score"] == 0.9
+
+    asyncio.run(run())
+
+
+def test_failed_batches_are_left_unlabeled():
+    def broken(texts):
+        raise RuntimeError("model crashed")
+
+    async def run():
+        engine = NLPEngine(broken, StubModels().classify, batch_window_ms=1)
+        assert await engine.label(article(0, "Bitcoin")) is None
+        assert await engine.label_many([article(1, "Ether")]) == {}
+        engine.close()
+
+    asyncio.run(run())
+
+
+def test_labels_are_stored_per_article():
+    from redis_client import RedisClient
+
+    async def run():
+        client = RedisClient()
+        client.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        models = StubModels(delay=0)
+        engine = NLPEngine(models.summarize, models.classify, batch_window_ms=1)
+        await client.save_labels(await engine.label_many([article(0, "Bitcoin rallies"), article(1, "Ether slides")]))
+        engine.close()
+
+        assert (await client.get_labels("id-0"))["sentiment"] == "positive"
+        assert (await client.get_labels("id-1"))["summary"] == "Ether slides"
+        assert await client.get_labels("id-2") is None
+        assert 0 < await client.redis.ttl("labels:id-0") <= 86400
+
+    asyncio.run(run())
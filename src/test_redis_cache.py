@@ -0,0 +1,197 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from redis_client import RedisClient, decode_cursor, encode_cursor
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_client() -> RedisClient:
+    client = RedisClient()
+    client.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return client
+
+
+def make_article(i: int, minutes_ago: int, source: str, assets=None) -> dict:
+    return {
+        "id": f"id-{i}",
+        "title": f"Article {i}",
+        "content": "",
+        "source": source,
+        "timestamp": (datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)).isoformat(),
+        "url": f"https://{source}/{i}",
+        "categories": [{"term": "Bitcoin"}],
+        "assets": assets or [],
+    }
+
+
+async def seed(client: RedisClient) -> None:
+    articles = [
+        make_article(0, 0, "ambcrypto.com", ["BTC"]),
+        make_article(1, 1, "cointelegraph.com", ["ETH"]),
+        make_article(2, 2, "ambcrypto.com", ["BTC", "ETH"]),
+        make_article(3, 3, "ambcrypto.com"),
+    ]
+    for article in articles:
+        await client.save_article(article["url"], {"article": article, "analysis": None})
+
+
+def test_query_by_single_index():
+    async def run():
+        client = make_client()
+        await seed(client)
+        articles = await client.query_articles(source="ambcrypto.com")
+        assert [a["id"] for a in articles] == ["id-0", "id-2", "id-3"]
+
+    asyncio.run(run())
+
+
+def test_query_intersects_indexes():
+    async def run():
+        client = make_client()
+        await seed(client)
+        articles = await client.query_articles(source="AMBCRYPTO.com", asset="eth", category="bitcoin")
+        assert [a["id"] for a in articles] == ["id-2"]
+        # Temporary intersection keys are not left behind
+        assert not await client.redis.keys("idx:tmp:*")
+
+    asyncio.run(run())
+
+
+def test_query_since_and_limit():
+    async def run():
+        client = make_client()
+        await seed(client)
+        since = (datetime.now(timezone.utc) - timedelta(minutes=1, seconds=30)).timestamp()
+        articles = await client.query_articles(since=since)
+        assert [a["id"] for a in articles] == ["id-0", "id-1"]
+        articles = await client.query_articles(limit=1)
+        assert [a["id"] for a in articles] == ["id-0"]
+
+    asyncio.run(run())
+
+
+def test_expired_articles_are_dropped_from_index():
+    async def run():
+        client = make_client()
+        await seed(client)
+        await client.redis.delete("article:https://ambcrypto.com/0")
+        articles = await client.query_articles(source="ambcrypto.com")
+        assert [a["id"] for a in articles] == ["id-2", "id-3"]
+        assert await client.redis.zscore("idx:source:ambcrypto.com", "https://ambcrypto.com/0") is None
+
+    asyncio.run(run())
+
+
+def test_old_news_stays_indexed_until_it_expires():
+    async def run():
+        client = make_client()
+        old = make_article(0, 3 * 24 * 60, "ambcrypto.com")  # Published three days ago
+        await client.save_article(old["url"], {"article": old, "analysis": None})
+        assert [a["id"] for a in await client.query_articles()] == ["id-0"]
+        assert [a["id"] for a in await client.get_recent_articles()] == ["id-0"]
+
+        # Once its TTL has passed, the next save removes it from every index
+        member, = await client.redis.zrange("idx:expiry", 0, -1)
+        await client.redis.zadd("idx:expiry", {member: 1})
+        new = make_article(1, 0, "cointelegraph.com")
+        await client.save_article(new["url"], {"article": new, "analysis": None})
+        assert await client.redis.zscore("idx:articles", old["url"]) is None
+        assert await client.redis.zcard("idx:source:ambcrypto.com") == 0
+        assert await client.redis.zcard("idx:category:bitcoin") == 1  # Only the new article
+        assert await client.redis.zcard("idx:expiry") == 1
+
+    asyncio.run(run())
+
+
+def test_clear_cache_removes_indexes():
+    async def run():
+        client = make_client()
+        await seed(client)
+        await client.clear_cache()
+        assert not await client.redis.keys("idx:*")
+
+    asyncio.run(run())
+
+
+def test_event_history_replay():
+    async def run():
+        client = make_client()
+        ids = [await client.append_event(f'{{"seq": {i}}}') for i in range(2)]
+        ids.append(await client.append_event('{"seq": 2}', '{"risk": 3}'))
+        assert await client.get_events_after(ids[0], 10) == [
+            (ids[1], '{"seq": 1}', None),
+            (ids[2], '{"seq": 2}', '{"risk": 3}'),
+        ]
+        assert await client.get_events_after(ids[2], 10) == []
+        # IDs older than the retained history cannot be replayed
+        await client.redis.xtrim("events:history", maxlen=1, approximate=False)
+        assert await client.get_events_after(ids[0], 10) is None
+
+    asyncio.run(run())
+
+
+def test_cursor_pagination_walks_history():
+    async def run():
+        client = make_client()
+        await seed(client)
+        # Two articles sharing a timestamp must not be skipped or repeated across pages
+        twin = {**make_article(4, 0, "decrypt.co"), "timestamp": (await client.query_articles(limit=1))[0]["timestamp"]}
+        await client.save_article(twin["url"], {"article": twin, "analysis": None})
+
+        seen, cursor = [], None
+        while True:
+            page = await client.get_articles_page(cursor, 2)
+            seen += [a["id"] for a in page]
+            if len(page) < 2:
+                break
+            cursor = decode_cursor(encode_cursor(page[-1]))
+        assert sorted(seen) == ["id-0", "id-1", "id-2", "id-3", "id-4"]
+        assert len(seen) == 5
+        assert seen[-3:] == ["id-1", "id-2", "id-3"]
+
+    asyncio.run(run())
+
+
+def test_decode_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_read_events_tails_history():
+    async def run():
+        client = make_client()
+        assert await client.get_latest_event_id() == "0-0"
+        first = await client.append_event('{"seq": 0}')
+        assert await client.get_latest_event_id() == first
+        second = await client.append_event('{"seq": 1}', '{"risk": 1}')
+        assert await client.read_events(first, block_ms=10) == [(second, '{"seq": 1}', '{"risk": 1}')]
+        assert await client.read_events(second, block_ms=10) == []
+
+    asyncio.run(run())
+
+
+def test_get_analyses_reports_misses():
+    async def run():
+        client = make_client()
+        article = make_article(0, 0, "ambcrypto.com")
+        await client.save_article(article["url"], {"article": article, "analysis": {"analysis": "Risk Level: low"}})
+        analyses = await client.get_analyses(["id-0", "id-missing"])
+        assert json.loads(analyses["id-0"]) == {"analysis": "Risk Level: low"}
+        assert analyses["id-missing"] is None
+        assert await client.get_analyses([]) == {}
+
+    asyncio.run(run())
+
+
+def test_recent_articles_come_from_the_time_index():
+    async def run():
+        client = make_client()
+        await seed(client)
+        articles = await client.get_recent_articles(3)
+        assert [a["id"] for a in articles] == ["id-0", "id-1", "id-2"]
+
+    asyncio.run(run())
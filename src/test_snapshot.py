@@ -0,0 +1,59 @@
+import asyncio
+import gzip
+import json
+
+from aiohttp.test_utils import make_mocked_request
+
+from snapshot import ResponseSnapshot, SnapshotCache, brotli
+
+
+def request(**headers):
+    return make_mocked_request("GET", "/articles", headers=headers)
+
+
+def test_snapshot_negotiates_encoding():
+    snapshot = ResponseSnapshot({"articles": [{"id": "1"}] * 20, "status": "success"})
+
+    plain = snapshot.response(request())
+    assert "Content-Encoding" not in plain.headers
+    assert json.loads(plain.body)["status"] == "success"
+
+    gzipped = snapshot.response(request(**{"Accept-Encoding": "gzip, br;q=0"}))
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzipped.body) == snapshot.body
+    assert gzipped.headers["Vary"] == "Accept-Encoding"
+
+    if brotli is not None:
+        compressed = snapshot.response(request(**{"Accept-Encoding": "gzip, deflate, br"}))
+        assert compressed.headers["Content-Encoding"] == "br"
+        assert brotli.decompress(compressed.body) == snapshot.body
+
+
+def test_snapshot_honours_if_none_match():
+    snapshot = ResponseSnapshot({"articles": []}, status=206)
+    not_modified = snapshot.response(request(**{"If-None-Match": snapshot.etag}))
+    assert not_modified.status == 304
+    assert not_modified.headers["ETag"] == snapshot.etag
+    assert snapshot.response(request(**{"If-None-Match": '"stale"'})).status == 206
+
+    unavailable = ResponseSnapshot({"status": "initializing"}, status=503)
+    assert unavailable.response(request(**{"If-None-Match": unavailable.etag})).status == 503
+
+
+def test_cache_rebuilds_only_when_key_changes():
+    async def run():
+        cache = SnapshotCache()
+        builds = []
+
+        async def build():
+            builds.append(1)
+            return ResponseSnapshot({"n": len(builds)})
+
+        first = await cache.get((1, True), build)
+        assert await cache.get((1, True), build) is first
+        assert await cache.get((2, True), build) is not first
+        cache.invalidate()
+        await cache.get((2, True), build)
+        assert len(builds) == 3
+
+    asyncio.run(run())
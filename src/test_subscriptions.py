@@ -0,0 +1,84 @@
+import pytest
+
+from subscriptions import (
+    EventAttributes,
+    Subscription,
+    SubscriptionIndex,
+)
+
+
+def sub(**query) -> Subscription:
+    return Subscription.from_query(query)
+
+
+def attrs(sources=(), categories=(), assets=(), risk=None) -> EventAttributes:
+    return EventAttributes(frozenset(sources), frozenset(categories), frozenset(assets), risk)
+
+
+def test_from_query_normalizes_values():
+    subscription = sub(sources="AMBCrypto.com, decrypt.co", assets="btc,eth", min_risk="Medium")
+    assert subscription.sources == {"ambcrypto.com", "decrypt.co"}
+    assert subscription.assets == {"BTC", "ETH"}
+    assert subscription.min_risk == 2
+    assert sub().is_empty
+    with pytest.raises(ValueError):
+        sub(min_risk="extreme")
+
+
+def test_index_matches_like_predicate():
+    subscriptions = {
+        "btc": sub(assets="BTC"),
+        "btc-amb": sub(assets="BTC", sources="ambcrypto.com"),
+        "defi": sub(categories="defi"),
+        "high": sub(min_risk="high"),
+        "eth-medium": sub(assets="ETH", min_risk="medium"),
+    }
+    index = SubscriptionIndex()
+    for client_id, subscription in subscriptions.items():
+        index.add(client_id, subscription)
+
+    events = [
+        attrs(sources=["ambcrypto.com"], assets=["BTC"]),
+        attrs(sources=["decrypt.co"], assets=["BTC", "ETH"], categories=["defi"]),
+        attrs(sources=["decrypt.co"], assets=["ETH"], risk=1),
+        attrs(sources=["ambcrypto.com"], assets=["BTC"], risk=3),
+        attrs(),
+        None,
+    ]
+    for event in events:
+        expected = {c for c, s in subscriptions.items() if s.matches(event)}
+        assert index.match(event) == expected, event
+
+
+def test_remove_clears_postings():
+    index = SubscriptionIndex()
+    index.add("a", sub(assets="BTC", min_risk="low"))
+    index.remove("a")
+    assert len(index) == 0
+    assert index.match(attrs(assets=["BTC"], risk=3)) == set()
+
+
+def test_analysis_inherits_article_attributes():
+    index = SubscriptionIndex()
+    article = {"id": "1", "source": "AMBCrypto.com", "categories": [{"term": "DeFi"}], "assets": ["btc"]}
+    assert index.attributes_for({"type": "article", "data": article}) == attrs(
+        sources=["ambcrypto.com"], categories=["defi"], assets=["BTC"]
+    )
+    analysis = {"type": "analysis", "articleId": "1", "data": {"analysis": "5. Risk Level: High"}}
+    assert index.attributes_for(analysis) == attrs(
+        sources=["ambcrypto.com"], categories=["defi"], assets=["BTC"], risk=3
+    )
+    labels = {"type": "labels", "articleId": "1", "data": {"summary": "Risk is high", "sentiment": "negative"}}
+    assert index.attributes_for(labels) == attrs(sources=["ambcrypto.com"], categories=["defi"], assets=["BTC"])
+    assert index.attributes_for({"type": "shutdown"}) is None
+
+
+def test_structured_analysis_risk_is_used():
+    index = SubscriptionIndex()
+    analysis = {"type": "analysis", "articleId": "1", "data": {"summary": "Risk: low", "risk": "medium"}}
+    assert index.attributes_for(analysis).risk == 2
+
+
+def test_attributes_json_round_trip():
+    event = attrs(sources=["a.com"], categories=["defi"], assets=["BTC"], risk=2)
+    assert EventAttributes.from_json(event.to_json()) == event
@@ -0,0 +1,47 @@
+from triage import Triage, TriageModel, load_model
+
+MARKET_NEWS = {
+    "title": "Bitcoin price rallies as ETF inflows surge",
+    "content": "<p>BTC traders cheered record spot ETF inflows on Monday.</p>"
+}
+OFF_TOPIC = {
+    "title": "Looking for a logo designer",
+    "content": "Hiring someone to redo the logo of my bakery, send your resume."
+}
+
+
+def test_market_news_passes_and_off_topic_posts_do_not():
+    triage = Triage(TriageModel.from_keywords(), {"default": 0.5})
+    score, relevant = triage.evaluate(MARKET_NEWS, "default")
+    assert relevant and score > 0.9
+    score, relevant = triage.evaluate(OFF_TOPIC, "default")
+    assert not relevant and score < 0.1
+
+
+def test_thresholds_are_per_topic():
+    article = {"title": "Shares slip", "content": "The group reported a weaker quarter."}
+    triage = Triage(TriageModel.from_keywords(), {"crypto": 0.3, "default": 0.9})
+    assert triage.evaluate(article, "crypto")[1]
+    assert not triage.evaluate(article, "cdd")[1]  # Falls back to the default threshold
+
+
+def test_training_learns_new_relevant_terms():
+    model = TriageModel.from_keywords()
+    article = {"title": "Container backlog at Long Beach grows", "content": "Port congestion worsens."}
+    before = model.score(article)
+    examples = [
+        ({"title": "Port congestion delays containers", "content": ""}, 1),
+        ({"title": "Container backlog at Rotterdam", "content": "Port congestion"}, 1),
+        ({"title": "My cat photos", "content": "Cute cat"}, 0),
+    ] * 5
+    model.fit(examples)
+    assert model.score(article) > max(before, 0.5)
+    assert model.score({"title": "Cute cat photos", "content": ""}) < 0.5
+
+
+def test_trained_model_roundtrips_and_bad_paths_fall_back(tmp_path):
+    path = str(tmp_path / "model.json")
+    model = TriageModel.from_keywords().fit([(OFF_TOPIC, 0)])
+    model.save(path)
+    assert load_model(path).score(OFF_TOPIC) == model.score(OFF_TOPIC)
+    assert load_model(str(tmp_path / "missing.json")).score(MARKET_NEWS) == TriageModel.from_keywords().score(MARKET_NEWS)
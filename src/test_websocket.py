@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import main
+from broadcast import BroadcastHub
+from config import WS_COALESCE_WINDOW_MS
+from metrics import FANOUT_LAG_SECONDS
+from main import observe_fanout_lag, replay_frames, websocket_stream
+from redis_client import RedisClient
+from subscriptions import EventAttributes, Subscription
+
+
+class BufferOnlyPoller:
+    """Serves the initial event; the WebSocket handler needs nothing else from the poller"""
+
+    async def get_initial_articles(self):
+        return {"articles": [], "status": "ready"}
+
+
+def make_app() -> web.Application:
+    app = web.Application()
+    app['hub'] = BroadcastHub(64)
+    app['poller'] = BufferOnlyPoller()
+    app.router.add_get('/ws', websocket_stream)
+    return app
+
+
+def article_event(i: int) -> str:
+    return json.dumps({"type": "article", "data": {"id": f"id-{i}"}})
+
+
+def test_bursts_are_batched_and_quiet_events_sent_alone():
+    async def run():
+        app = make_app()
+        async with TestClient(TestServer(app)) as client:
+            ws = await client.ws_connect('/ws', compress=15)
+            assert ws.compress == 15  # permessage-deflate was negotiated
+            assert json.loads((await ws.receive()).data)["type"] == "initial"
+
+            # A burst published at once arrives as one batched frame
+            for i in range(5):
+                app['hub'].publish(article_event(i))
+            batch = json.loads((await asyncio.wait_for(ws.receive(), 1)).data)
+            assert batch["type"] == "batch"
+            assert [event["data"]["id"] for event in batch["events"]] == [f"id-{i}" for i in range(5)]
+
+            # After a quiet period, a single event is sent straight away, unwrapped
+            await asyncio.sleep(2 * WS_COALESCE_WINDOW_MS / 1000)
+            app['hub'].publish(article_event(5))
+            single = json.loads((await asyncio.wait_for(ws.receive(), WS_COALESCE_WINDOW_MS / 2000)).data)
+            assert single == {"type": "article", "data": {"id": "id-5"}}
+
+            await ws.close()
+
+            # Clients that don't offer compression are served uncompressed
+            plain = await client.ws_connect('/ws')
+            assert not plain.compress
+            assert json.loads((await plain.receive()).data)["type"] == "initial"
+            await plain.close()
+
+    asyncio.run(run())
+
+
+def test_filtered_resume_past_the_replay_limit_needs_a_snapshot(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(main, "EVENT_REPLAY_LIMIT", 5)
+
+    class HistoryPoller:
+        """The Redis history, where replays go once the ring no longer covers a gap"""
+
+        def __init__(self):
+            self.redis_client = RedisClient()
+            self.redis_client.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def run():
+        poller = HistoryPoller()
+        ids = []
+        for i in range(20):
+            attrs = EventAttributes(assets=frozenset(["BTC" if i % 4 == 0 else "ETH"]))
+            ids.append(await poller.redis_client.append_event(json.dumps({"seq": i}), attrs.to_json()))
+        app = {'hub': BroadcastHub(8), 'poller': poller}
+        subscriber = app['hub'].subscribe("c1")
+        btc = Subscription.from_query({"assets": "btc"})
+
+        # 19 events were missed: BTC ones lie beyond the first 5, so the gap can't be replayed
+        assert await replay_frames(app, subscriber, ids[0], btc) is None
+        # A gap within the limit is replayed, filtered
+        frames = await replay_frames(app, subscriber, ids[14], btc)
+        assert [json.loads(frame.split(b"data: ", 1)[1])["seq"] for frame in frames] == [16]
+
+    asyncio.run(run())
+
+
+def test_fanout_lag_ignores_transient_events():
+    hub = BroadcastHub(8)
+    delta = json.dumps({"type": "analysis_delta"})
+    hub.publish(delta, transient=True)  # Carries "0-0", published before any event
+    observe_fanout_lag(hub.events_since(0), "test")
+    assert FANOUT_LAG_SECONDS.count(transport="test") == 0
+
+    # A batch led by a delta is measured from the first real event
+    hub.publish(article_event(0))
+    hub.publish(delta, transient=True)
+    hub.publish(article_event(1))
+    observe_fanout_lag(hub.events_since(2), "test")
+    assert FANOUT_LAG_SECONDS.count(transport="test") == 1
+    lag = FANOUT_LAG_SECONDS._series[FANOUT_LAG_SECONDS._key({"transport": "test"})][1]
+    assert lag < 60
@@ -0,0 +1,179 @@
+"""Cheap relevance triage of new articles before the LLM analysis
+
+A logistic model over hashed word and word-pair features scores how relevant
+an article is to markets; only articles scoring at least their topic's
+threshold are queued for analysis. Without a trained model, the weights come
+from the keyword and asset lexicon below. Train one from labeled articles:
+
+    python triage.py train labeled.jsonl triage_model.json
+
+where each line is {"title": ..., "content": ..., "relevant": 0 or 1}, and
+point TRIAGE_MODEL_PATH at the result.
+"""
+import json
+import math
+import re
+import sys
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from metrics import counter, histogram
+
+# Number of hashed feature buckets
+FEATURE_DIM = 2 ** 18
+
+# Log-odds of relevance with no feature present
+DEFAULT_BIAS = -2.0
+
+# Keyword (or two-word phrase) weights in log-odds: assets and market terms
+# count for relevance, giveaway and help-wanted noise against it
+KEYWORDS: Dict[str, float] = {
+    **dict.fromkeys([
+        "bitcoin", "btc", "ethereum", "eth", "ether", "crypto", "cryptocurrency", "solana", "sol", "xrp",
+        "ripple", "dogecoin", "doge", "cardano", "ada", "bnb", "tether", "usdt", "usdc", "stablecoin",
+        "stablecoins", "altcoin", "altcoins", "defi", "blockchain", "binance", "coinbase", "etf", "etfs"
+    ], 2.5),
+    **dict.fromkeys([
+        "price", "prices", "market", "markets", "trading", "traders", "rally", "surge", "surges", "crash",
+        "selloff", "bullish", "bearish", "liquidation", "liquidations", "sec", "fed", "inflation",
+        "interest rate", "interest rates", "earnings", "stocks", "shares", "nasdaq", "tariff", "tariffs",
+        "futures", "options", "hedge", "volatility", "exchange", "token", "tokens", "mining", "halving",
+        "freight rates", "shipping rates", "commodity", "commodities", "oil", "gold"
+    ], 1.5),
+    **dict.fromkeys([
+        "investor", "investors", "fund", "funds", "regulation", "regulators", "billion", "million",
+        "supply", "demand", "outflows", "inflows", "whale", "whales", "wallet", "wallets"
+    ], 0.75),
+    **dict.fromkeys(["giveaway", "airdrop scam", "hiring", "resume", "for hire", "meme", "rant"], -1.5),
+}
+
+_WORDS = re.compile(r"[a-z0-9$]+")
+
+ARTICLES_TRIAGED = counter("articles_triaged_total", "Articles triaged before analysis, by topic and result", ["topic", "result"])
+TRIAGE_SCORE = histogram(
+    "triage_score", "Relevance scores of triaged articles", ["topic"],
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORDS.findall(re.sub(r"<[^>]+>", " ", text or "").lower())
+
+
+def extract_features(article: Dict[str, Any]) -> List[str]:
+    """Distinct words, adjacent word pairs and tagged assets of an article"""
+    tokens = tokenize(f"{article.get('title', '')} {article.get('content', '')}")
+    features = set(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    features.update(asset.lower() for asset in article.get("assets") or [])
+    return list(features)
+
+
+def feature_index(feature: str, dim: int = FEATURE_DIM) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+
+class TriageModel:
+    """Logistic regression over hashed features, with sparse weights"""
+
+    def __init__(self, weights: Optional[Dict[int, float]] = None, bias: float = DEFAULT_BIAS, dim: int = FEATURE_DIM):
+        self.weights = weights or {}
+        self.bias = bias
+        self.dim = dim
+
+    @classmethod
+    def from_keywords(cls, keywords: Dict[str, float] = KEYWORDS, bias: float = DEFAULT_BIAS) -> "TriageModel":
+        model = cls(bias=bias)
+        for keyword, weight in keywords.items():
+            model.weights[feature_index(keyword, model.dim)] = weight
+        return model
+
+    @classmethod
+    def load(cls, path: str) -> "TriageModel":
+        with open(path) as f:
+            data = json.load(f)
+        return cls({int(i): w for i, w in data["weights"].items()}, data["bias"], data["dim"])
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"dim": self.dim, "bias": self.bias, "weights": self.weights}, f)
+
+    def _indices(self, article: Dict[str, Any]) -> List[int]:
+        return [feature_index(feature, self.dim) for feature in extract_features(article)]
+
+    def _probability(self, indices: Iterable[int]) -> float:
+        logit = self.bias + sum(self.weights.get(i, 0.0) for i in indices)
+        return 1 / (1 + math.exp(-max(min(logit, 30), -30)))
+
+    def score(self, article: Dict[str, Any]) -> float:
+        """Probability that the article is relevant"""
+        return self._probability(self._indices(article))
+
+    def fit(
+        self,
+        examples: Sequence[Tuple[Dict[str, Any], int]],
+        epochs: int = 5,
+        learning_rate: float = 0.2,
+        l2: float = 1e-4
+    ) -> "TriageModel":
+        """Refine the weights with SGD on (article, 0 or 1) examples"""
+        encoded = [(self._indices(article), label) for article, label in examples]
+        for _ in range(epochs):
+            for indices, label in encoded:
+                gradient = self._probability(indices) - label
+                self.bias -= learning_rate * gradient
+                for i in indices:
+                    weight = self.weights.get(i, 0.0)
+                    self.weights[i] = weight - learning_rate * (gradient + l2 * weight)
+        return self
+
+
+class Triage:
+    """Decides which articles are worth a full analysis
+
+    Each feed belongs to a topic set with its own threshold; topics without
+    one use the "default" threshold.
+    """
+
+    def __init__(self, model: TriageModel, thresholds: Dict[str, float]):
+        self.model = model
+        self.thresholds = thresholds
+
+    def threshold(self, topic: str) -> float:
+        return self.thresholds.get(topic, self.thresholds.get("default", 0.5))
+
+    def evaluate(self, article: Dict[str, Any], topic: str) -> Tuple[float, bool]:
+        """(relevance score, whether to analyze) for an article of this topic"""
+        score = self.model.score(article)
+        passed = score >= self.threshold(topic)
+        TRIAGE_SCORE.observe(score, topic=topic)
+        ARTICLES_TRIAGED.inc(topic=topic, result="analyzed" if passed else "skipped")
+        return score, passed
+
+
+def load_model(path: str = "") -> TriageModel:
+    """The trained model at path, or the keyword model if there is none"""
+    if path:
+        try:
+            return TriageModel.load(path)
+        except Exception as e:
+            logger.error(f"Could not load triage model from {path}, using keyword weights: {str(e)}")
+    return TriageModel.from_keywords()
+
+
+def main(argv: List[str]) -> None:
+    if len(argv) != 4 or argv[1] != "train":
+        print("Usage: python triage.py train labeled.jsonl triage_model.json")
+        sys.exit(1)
+    with open(argv[2]) as f:
+        examples = [(row, int(row["relevant"])) for row in (json.loads(line) for line in f if line.strip())]
+    model = TriageModel.from_keywords().fit(examples)
+    model.save(argv[3])
+    correct = sum((model.score(article) >= 0.5) == bool(label) for article, label in examples)
+    print(f"Trained on {len(examples)} articles, training accuracy {correct / max(len(examples), 1):.1%}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)